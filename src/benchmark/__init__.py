@@ -0,0 +1,169 @@
+"""Benchmarks of the main operations over synthetic objects
+
+Run them with `python -m benchmark` from the src directory, or with
+`make bench`. Every operation is timed over trees of several shapes, and the
+results are compared with a stored baseline to catch regressions.
+"""
+from .corpus import CorpusGenerator, makeRegistry
+from openmath.parser import parseBinary, parseXML, parseJSON
+from openmath.validator import ValidationMemo, check, validate
+import gc
+import time
+import tracemalloc
+
+# name -> (depth, fanout)
+PROFILES = {
+    "balanced": (6, 4),
+    "wide": (2, 64),
+    "deep": (2000, 1),  # beyond the recursion limit, see util.jsonLoads
+}
+
+
+class Case:
+    """Operation to be timed
+
+    Arguments:
+        name -- name of the operation
+        prepare -- function that gets the input of an iteration from the
+            tree, which isn't timed
+        run -- function that is timed with that input
+        size -- function that gets the number of bytes processed from the
+            tree, for operations on encodings (default=None)
+    """
+
+    def __init__(self, name, prepare, run, size=None):
+        self.name = name
+        self.prepare = prepare
+        self.run = run
+        self.size = size
+
+
+def makeTree(depth, fanout, seed=0):
+    """Build the complete tree of a profile, see CorpusGenerator"""
+    return CorpusGenerator(seed, depth, fanout, complete=True, ids=0.1).generate()
+
+
+def countNodes(obj) -> int:
+    """Get the number of nodes of an object"""
+    return sum(1 for _ in obj.iterNodes())
+
+
+def _ids(tree):
+    return [x.id for x in tree.iterNodes() if x.id is not None]
+
+
+def _memoized(tree):
+    """Parse a tree again, with a memo that has validated it before"""
+    registry = makeRegistry()
+    memo = ValidationMemo()
+    data = tree.toBinary()
+    check(parseBinary(data, hashed=True), registry, memo)
+    return parseBinary(data, hashed=True), registry, memo
+
+
+_encoded = lambda f: lambda tree: len(f(tree).encode("utf8"))
+
+CASES = [
+    Case("parseXML", lambda tree: tree.toXML(), parseXML, _encoded(lambda x: x.toXML())),
+    Case("parseJSON", lambda tree: tree.toJSON(), parseJSON, _encoded(lambda x: x.toJSON())),
+    Case("toXML", lambda tree: tree, lambda x: x.toXML(), _encoded(lambda x: x.toXML())),
+    Case("toJSON", lambda tree: tree, lambda x: x.toJSON(), _encoded(lambda x: x.toJSON())),
+    Case("apply", lambda tree: tree, lambda x: x.apply(lambda node: None)),
+    Case("clone", lambda tree: tree, lambda x: x.clone()),
+    Case("__eq__", lambda tree: (tree, tree.clone()), lambda x: x[0] == x[1]),
+    Case("getByID", lambda tree: (tree.clone(), _ids(tree)), lambda x: [x[0].getByID(i) for i in x[1]]),
+    Case("dereference", lambda tree: tree.clone(), lambda x: x.dereference()),
+    Case("validate", lambda tree: (tree, makeRegistry()), lambda x: validate(*x)),
+    Case("validateMemo", _memoized, lambda x: validate(*x)),
+]
+
+
+def measure(case, tree, nodes, repeat=5, minTime=0.2):
+    """Time an operation over a tree
+
+    The operation is repeated at least repeat times and for minTime seconds,
+    with the garbage collector disabled, and the best time is kept. The peak
+    memory is measured in an extra run, as tracing the allocations slows it
+    down. Return a dictionary with the seconds, the nodes per second, the MB
+    per second for the operations on encodings and the peak memory in KiB.
+    """
+    best = None
+    total = 0
+    runs = 0
+    while runs < repeat or (total < minTime and runs < 1000):
+        runs += 1
+        arg = case.prepare(tree)
+        gc.collect()
+        gc.disable()  # as timeit, so that collections don't add noise
+        try:
+            start = time.perf_counter()
+            case.run(arg)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+
+    arg = case.prepare(tree)
+    tracemalloc.start()
+    try:
+        case.run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "seconds": best,
+        "nodesPerSecond": nodes / best if best else None,
+        "peakKiB": peak / 1024,
+    }
+    if case.size is not None:
+        result["MBPerSecond"] = case.size(tree) / 1e6 / best if best else None
+    return result
+
+
+def run(profiles=None, cases=None, repeat=5, seed=0, log=None, minTime=0.2):
+    """Run the benchmarks
+
+    Return a dictionary from "profile/operation" to the results of measure.
+
+    Arguments:
+        profiles -- names of the profiles, from PROFILES (default=all)
+        cases -- names of the operations, from CASES (default=all)
+        repeat -- repetitions of every operation (default=5)
+        seed -- seed of the trees (default=0)
+        log -- function called with every key and result (default=None)
+        minTime -- minimum seconds spent in every operation (default=0.2)
+    """
+    results = {}
+    for profile in profiles or PROFILES:
+        depth, fanout = PROFILES[profile]
+        tree = makeTree(depth, fanout, seed)
+        nodes = countNodes(tree)
+        for case in CASES:
+            if cases and case.name not in cases:
+                continue
+            key = "%s/%s" % (profile, case.name)
+            results[key] = measure(case, tree, nodes, repeat, minTime)
+            results[key]["nodes"] = nodes
+            if log is not None:
+                log(key, results[key])
+    return results
+
+
+def compare(results, baseline, tolerance=0.5):
+    """Compare results with a baseline
+
+    Return (key, ratio) pairs of the operations that are slower than in the
+    baseline by more than the tolerance, where ratio is the new time over
+    the old one. Operations missing in any of them are ignored.
+    """
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None or not old["seconds"]:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append((key, ratio))
+    return regressions
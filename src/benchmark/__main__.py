@@ -0,0 +1,66 @@
+from . import PROFILES, CASES, run, compare
+import argparse
+import json
+import os
+import platform
+import sys
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmark",
+        description="Time the main operations over synthetic objects",
+    )
+    parser.add_argument("--profile", action="append", choices=list(PROFILES),
+                        help="shape of the trees, repeatable (default=all)")
+    parser.add_argument("--case", action="append", choices=[x.name for x in CASES],
+                        help="operation, repeatable (default=all)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="repetitions of every operation, the best is kept (default=5)")
+    parser.add_argument("--baseline", default=BASELINE,
+                        help="JSON file with the results to compare with (default=%(default)s)")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="slowdown over the baseline that is a regression, timings of"
+                        " a busy machine easily vary by a third (default=0.5)")
+    parser.add_argument("--save", metavar="FILE",
+                        help="write the results as a new baseline")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)["results"]
+
+    print("%-22s %8s %10s %12s %8s %10s %7s" % (
+        "benchmark", "nodes", "ms", "nodes/s", "MB/s", "peak KiB", "ratio"
+    ))
+
+    def log(key, result):
+        old = baseline.get(key)
+        ratio = "%.2f" % (result["seconds"] / old["seconds"]) if old else "-"
+        mbs = result.get("MBPerSecond")
+        print("%-22s %8d %10.2f %12.0f %8s %10.0f %7s" % (
+            key, result["nodes"], result["seconds"] * 1000, result["nodesPerSecond"],
+            "-" if mbs is None else "%.1f" % mbs, result["peakKiB"], ratio,
+        ))
+
+    results = run(args.profile, args.case, args.repeat, log=log)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, fh, indent=1, sort_keys=True)
+            fh.write("\n")
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, ratio in regressions:
+        print("REGRESSION %s is %.2f times slower than the baseline" % (key, ratio))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
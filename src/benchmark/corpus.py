@@ -0,0 +1,313 @@
+"""Seeded generator of synthetic corpora of mathematical objects
+
+The same seed and options always give the same objects. A corpus can be
+written to a file and read back with
+
+    python -m benchmark.corpus corpus.jsonl --count 1000 --depth 8
+    for obj in readCorpus("corpus.jsonl"): ...
+"""
+from openmath import *
+from openmath.cd import CDRegistry, ContentDictionary, SymbolDefinition
+from openmath.parser import iterparseJSON, iterparseXML, parseBinary
+from collections import deque
+from random import Random
+from struct import pack, unpack
+import argparse
+import string
+
+# (cd, name, role, weight) of symbols of the official content dictionaries,
+# weighted roughly by how often they are used
+SYMBOLS = [
+    ("arith1", "plus", "application", 20),
+    ("arith1", "times", "application", 16),
+    ("arith1", "minus", "application", 8),
+    ("arith1", "divide", "application", 6),
+    ("arith1", "power", "application", 8),
+    ("arith1", "unary_minus", "application", 4),
+    ("arith1", "root", "application", 2),
+    ("arith1", "abs", "application", 1),
+    ("transc1", "sin", "application", 3),
+    ("transc1", "cos", "application", 3),
+    ("transc1", "exp", "application", 2),
+    ("transc1", "ln", "application", 2),
+    ("relation1", "eq", "application", 5),
+    ("relation1", "lt", "application", 2),
+    ("relation1", "leq", "application", 1),
+    ("logic1", "and", "application", 2),
+    ("logic1", "or", "application", 1),
+    ("logic1", "not", "application", 1),
+    ("set1", "in", "application", 1),
+    ("calculus1", "diff", "application", 1),
+    ("fns1", "lambda", "binder", 3),
+    ("quant1", "forall", "binder", 1),
+    ("quant1", "exists", "binder", 1),
+    ("nums1", "pi", "constant", 2),
+    ("nums1", "e", "constant", 1),
+    ("nums1", "i", "constant", 1),
+    ("logic1", "true", "constant", 1),
+    ("logic1", "false", "constant", 1),
+    ("altenc", "LaTeX_encoding", "attribution", 1),
+]
+
+VARIABLES = ("x", "y", "z", "t", "n", "a", "b")
+
+ENCODINGS = {".xml": "xml", ".json": "json", ".jsonl": "json", ".bin": "binary"}
+
+
+def symbolsFromCDs(cds):
+    """Get the symbols of some content dictionaries, all with the same weight
+
+    Arguments:
+        cds -- iterable of ContentDictionary, such as a CDRegistry
+    """
+    return [
+        (cd.name, d.name, d.role or "constant", 1)
+        for cd in cds for d in cd.definitions
+    ]
+
+
+def makeRegistry(symbols=SYMBOLS):
+    """Get a CDRegistry with official content dictionaries of some symbols"""
+    cds = {}
+    for cd, name, role, _ in symbols:
+        if cd not in cds:
+            cds[cd] = ContentDictionary(name=cd, status="official")
+        cds[cd].definitions.append(SymbolDefinition(name=name, role=role))
+    return CDRegistry(cds.values())
+
+
+class CorpusGenerator:
+    """Seeded generator of synthetic objects
+
+    Every compound node is an application, or now and then a binding or an
+    attribution, and the leaves are basic objects of every kind. The trees
+    are built without recursion, so any depth is possible.
+
+    Arguments:
+        seed -- seed of the random choices (default=0)
+        depth -- maximum number of levels of compound nodes, the root is
+            always one unless it is 0 (default=6)
+        fanout -- number of arguments of the applications: exactly that in
+            complete trees, on average otherwise (default=4)
+        complete -- build complete trees of the given depth, instead of
+            trees with random shapes, where every argument is a leaf with
+            probability 1/fanout (default=False)
+        symbols -- (cd, name, role, weight) of the symbols to use, see
+            symbolsFromCDs (default=SYMBOLS)
+        ids -- proportion of nodes with an ID (default=0.05)
+        sharing -- proportion of leaves that are internal references to
+            previous subtrees (default=0.02)
+        bytesSize -- length of the byte arrays (default=16)
+        integerDigits -- number of digits of the integers (default=6)
+        stringSize -- length of the strings (default=8)
+    """
+
+    def __init__(self, seed=0, depth=6, fanout=4, complete=False, symbols=None,
+                 ids=0.05, sharing=0.02, bytesSize=16, integerDigits=6, stringSize=8):
+        self.seed = seed
+        self.depth = depth
+        self.fanout = fanout
+        self.complete = complete
+        self.ids = ids
+        self.sharing = sharing
+        self.bytesSize = bytesSize
+        self.integerDigits = integerDigits
+        self.stringSize = stringSize
+        self._rng = Random(seed)
+
+        self._roles = {}  # role -> ([(cd, name)], [cumulative weight])
+        for cd, name, role, weight in symbols if symbols is not None else SYMBOLS:
+            names, weights = self._roles.setdefault(role, ([], []))
+            names.append((cd, name))
+            weights.append(weight + (weights[-1] if weights else 0))
+        if "application" not in self._roles:
+            raise ValueError("There are no application symbols")
+
+    def generate(self) -> OMObject:
+        """Generate an object"""
+        self._counter = 0
+        self._targets = deque(maxlen=64)  # recent subtrees without references
+        if self.depth == 0:
+            return OMObject(self._leaf()[0])
+
+        frames = [self._frame(0)]  # [level, arity, children, has references]
+        while True:
+            level, arity, children, hasReferences = frame = frames[-1]
+            if len(children) < arity:
+                if self._isLeaf(level + 1):
+                    child, isReference = self._leaf()
+                    children.append(child)
+                    frame[3] = hasReferences or isReference
+                else:
+                    frames.append(self._frame(level + 1))
+                continue
+
+            frames.pop()
+            node = self._identify(self._compound(children))
+            if not hasReferences:
+                self._targets.append(node)
+            if not frames:
+                return OMObject(node)
+            frames[-1][2].append(node)
+            frames[-1][3] = frames[-1][3] or hasReferences
+
+    def generateMany(self, count):
+        """Generate several objects"""
+        for _ in range(count):
+            yield self.generate()
+
+    def write(self, file, count, encoding="xml"):
+        """Write objects to a binary file
+
+        The XML objects are written inside a corpus element, the JSON ones
+        one per line, and the binary ones after their length, in four bytes.
+        See readCorpus.
+
+        Arguments:
+            file -- binary file object
+            count -- number of objects
+            encoding -- "xml", "json" or "binary" (default="xml")
+        """
+        if encoding not in ("xml", "json", "binary"):
+            raise ValueError("Unknown encoding " + encoding)
+        if encoding == "xml":
+            file.write(b"<corpus>\n")
+        for obj in self.generateMany(count):
+            if encoding == "xml":
+                obj.writeXML(file)
+                file.write(b"\n")
+            elif encoding == "json":
+                obj.writeJSON(file)
+                file.write(b"\n")
+            else:
+                data = obj.toBinary()
+                file.write(pack(">I", len(data)))
+                file.write(data)
+        if encoding == "xml":
+            file.write(b"</corpus>\n")
+
+    def _isLeaf(self, level):
+        if level >= self.depth:
+            return True
+        return not self.complete and self._rng.random() * self.fanout < 1
+
+    def _frame(self, level):
+        arity = self.fanout if self.complete else self._rng.randint(1, 2 * self.fanout - 1)
+        return [level, arity, [], False]
+
+    def _symbol(self, role):
+        names, weights = self._roles[role]
+        cd, name = self._rng.choices(names, cum_weights=weights)[0]
+        return OMSymbol(name, cd)
+
+    def _identify(self, node):
+        if self._rng.random() < self.ids:
+            self._counter += 1
+            node.id = "n%d" % self._counter
+        return node
+
+    def _compound(self, children):
+        rng = self._rng
+        application = OMApplication(self._symbol("application"), children)
+        r = rng.random()
+        if r < 0.05 and "binder" in self._roles:
+            return OMBinding(
+                self._symbol("binder"), [OMVariable(rng.choice(VARIABLES))], application
+            )
+        if r < 0.1 and "attribution" in self._roles:
+            return OMAttribution(
+                [(self._symbol("attribution"), OMString(self._string()))], application
+            )
+        return application
+
+    def _leaf(self):
+        """Get a leaf, and whether it is a reference"""
+        rng = self._rng
+        if self._targets and rng.random() < self.sharing:
+            target = rng.choice(self._targets)
+            if target.id is None:
+                self._counter += 1
+                target.id = "n%d" % self._counter
+            return OMReference("#" + target.id), True
+
+        r = rng.randrange(20)
+        if r < 6:
+            digits = self.integerDigits
+            obj = OMInteger(rng.randrange(10 ** (digits - 1), 10 ** digits) * rng.choice((1, -1)))
+        elif r < 12:
+            obj = OMVariable(rng.choice(VARIABLES))
+        elif r < 15:
+            obj = OMFloat(rng.uniform(-1e6, 1e6))
+        elif r < 17 and "constant" in self._roles:
+            obj = self._symbol("constant")
+        elif r < 19:
+            obj = OMString(self._string())
+        else:
+            obj = OMBytearray(rng.randbytes(self.bytesSize))
+        obj = self._identify(obj)
+        self._targets.append(obj)
+        return obj, False
+
+    def _string(self):
+        return "".join(self._rng.choices(string.ascii_letters, k=self.stringSize))
+
+
+def readCorpus(path, encoding=None):
+    """Read the objects of a corpus file, one by one
+
+    Arguments:
+        path -- name of the file
+        encoding -- "xml", "json" or "binary" (default=by the extension)
+    """
+    if encoding is None:
+        encoding = ENCODINGS.get(path[path.rfind("."):].lower(), "xml")
+    with open(path, "rb") as fh:
+        if encoding == "xml":
+            yield from iterparseXML(fh)
+        elif encoding == "json":
+            yield from iterparseJSON(fh)
+        elif encoding == "binary":
+            while header := fh.read(4):
+                yield parseBinary(fh.read(unpack(">I", header)[0]))
+        else:
+            raise ValueError("Unknown encoding " + encoding)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmark.corpus",
+        description="Write a corpus of synthetic objects to a file",
+    )
+    parser.add_argument("output", help="file name, whose extension gives the default encoding")
+    parser.add_argument("--count", type=int, default=1000, help="number of objects (default=1000)")
+    parser.add_argument("--encoding", choices=("xml", "json", "binary"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--complete", action="store_true", help="build complete trees")
+    parser.add_argument("--ids", type=float, default=0.05, help="proportion of nodes with an ID")
+    parser.add_argument("--sharing", type=float, default=0.02,
+                        help="proportion of leaves that are references")
+    parser.add_argument("--bytes", type=int, default=16, help="length of the byte arrays")
+    parser.add_argument("--digits", type=int, default=6, help="digits of the integers")
+    parser.add_argument("--cd-dir", help="take the symbols from the .ocd files of a directory")
+    args = parser.parse_args(argv)
+
+    symbols = None
+    if args.cd_dir:
+        from openmath.cd.cache import loadDirectory
+        registry = CDRegistry()
+        loadDirectory(args.cd_dir, registry)
+        symbols = symbolsFromCDs(registry)
+
+    generator = CorpusGenerator(
+        args.seed, args.depth, args.fanout, args.complete, symbols,
+        args.ids, args.sharing, args.bytes, args.digits,
+    )
+    encoding = args.encoding or ENCODINGS.get(args.output[args.output.rfind("."):].lower(), "xml")
+    with open(args.output, "wb") as fh:
+        generator.write(fh, args.count, encoding)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Constants and helpers of the OpenMath binary encoding
+
+Every token starts with one byte: the token identifier in the lower six
+bits and two flags in the upper ones. The long flag (128) makes every length
+field and every fixed size integer take four bytes instead of one, and the
+ID flag (64) means that the token carries an id: its length comes after the
+other lengths and the id itself after the content. All multi-byte numbers,
+floats included, are in network byte order (big endian).
+
+    OMI       1  value                           (1 byte, 4 with long flag)
+              2  {n} sign base [k] digits [id]   (sign is "+" or "-", base
+                                                  is 0 for 10 and 64 for 16)
+    OMF       3  [k] 8 bytes of IEEE 754 [id]
+    OMB       4  {n} [k] bytes [id]
+    OMV       5  {n} [k] name [id]
+    OMSTR     6  {n} [k] ISO-8859-1 chars [id]
+              7  {n} [k] UTF-16 chars [id]       (n is the size in bytes)
+    OMS       8  {n} {m} [k] cd name [id]
+    cdbase    9  {n} uri                         (applies to the next object)
+    OMFOREIGN 12 {n} {m} [k] encoding foreign [id]
+    OMA       16 [k] [id] ... 17
+    OMATTR    18 [k] [id] ... 19
+    OMATP     20 ... 21
+    OME       22 [k] [id] ... 23
+    OMOBJ     24 [major minor] ... 25           (version if the ID flag is set)
+    OMBIND    26 [k] [id] ... 27
+    OMBVAR    28 ... 29
+    OMR       30 index                           (index of an earlier id, in
+                                                  order of appearance)
+              31 {n} [k] href [id]
+
+Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_binary
+"""
+
+from struct import pack
+
+TOKEN_INTEGER = 1
+TOKEN_BIGINTEGER = 2
+TOKEN_FLOAT = 3
+TOKEN_BYTEARRAY = 4
+TOKEN_VARIABLE = 5
+TOKEN_STRING = 6
+TOKEN_STRING_UTF16 = 7
+TOKEN_SYMBOL = 8
+TOKEN_CDBASE = 9
+TOKEN_FOREIGN = 12
+TOKEN_APPLICATION = 16
+TOKEN_APPLICATION_END = 17
+TOKEN_ATTRIBUTION = 18
+TOKEN_ATTRIBUTION_END = 19
+TOKEN_ATTRIBUTEPAIRS = 20
+TOKEN_ATTRIBUTEPAIRS_END = 21
+TOKEN_ERROR = 22
+TOKEN_ERROR_END = 23
+TOKEN_OBJECT = 24
+TOKEN_OBJECT_END = 25
+TOKEN_BINDING = 26
+TOKEN_BINDING_END = 27
+TOKEN_VARIABLES = 28
+TOKEN_VARIABLES_END = 29
+TOKEN_REFERENCE_INTERNAL = 30
+TOKEN_REFERENCE_EXTERNAL = 31
+
+FLAG_LONG = 128
+FLAG_ID = 64
+TOKEN_MASK = 63
+
+BASE_10 = 0
+BASE_16 = 64
+
+
+def writeToken(out, ids, token, fields=(), id=None):
+    """Write a token whose fields are preceded by their lengths
+
+    Arguments:
+        out -- bytearray to write to
+        ids -- dictionary with the index of every id already written
+        token -- token identifier
+        fields -- byte strings of the content
+        id -- id of the object, if any
+    """
+    if id is not None:
+        id = id.encode("utf8")
+        ids.setdefault(id, len(ids))
+        fields = (*fields, id)
+        token |= FLAG_ID
+    if any(len(x) > 255 for x in fields):
+        out.append(token | FLAG_LONG)
+        for x in fields:
+            out += pack(">I", len(x))
+    else:
+        out.append(token)
+        out += bytes(len(x) for x in fields)
+    if id is not None:
+        # the length of the id goes last, but the id goes after the content
+        for x in fields[:-1]:
+            out += x
+        out += id
+    else:
+        for x in fields:
+            out += x
+
+
+def writeFixed(out, ids, token, payload, id=None):
+    """Write a token whose content has a fixed size, such as a float"""
+    if id is None:
+        out.append(token)
+    else:
+        id = id.encode("utf8")
+        ids.setdefault(id, len(ids))
+        if len(id) > 255:
+            out.append(token | FLAG_ID | FLAG_LONG)
+            out += pack(">I", len(id))
+        else:
+            out.append(token | FLAG_ID)
+            out.append(len(id))
+    out += payload
+    if id is not None:
+        out += id
+
+
+def writeBegin(out, ids, token, id=None, cdbase=None):
+    """Write the begin token of a compound object"""
+    if cdbase is not None:
+        writeToken(out, ids, TOKEN_CDBASE, (cdbase.encode("utf8"),))
+    writeToken(out, ids, token, (), id)
+
+
+def writeInteger(out, ids, integer, id=None):
+    """Write an integer in the shortest format that holds it"""
+    flags = 0
+    idbytes = b""
+    if id is not None:
+        idbytes = id.encode("utf8")
+        ids.setdefault(idbytes, len(ids))
+        flags = FLAG_ID
+
+    if -128 <= integer < 128 and len(idbytes) < 256:
+        out.append(TOKEN_INTEGER | flags)
+        if flags:
+            out.append(len(idbytes))
+        out += pack(">b", integer)
+    elif -(1 << 31) <= integer < (1 << 31):
+        out.append(TOKEN_INTEGER | FLAG_LONG | flags)
+        if flags:
+            out += pack(">I", len(idbytes))
+        out += pack(">i", integer)
+    else:
+        digits = format(abs(integer), "x").encode("ascii")
+        sign = b"-" if integer < 0 else b"+"
+        if len(digits) < 256 and len(idbytes) < 256:
+            out.append(TOKEN_BIGINTEGER | flags)
+            out.append(len(digits))
+            out += sign
+            out.append(BASE_16)
+            if flags:
+                out.append(len(idbytes))
+        else:
+            out.append(TOKEN_BIGINTEGER | FLAG_LONG | flags)
+            out += pack(">I", len(digits))
+            out += sign
+            out.append(BASE_16)
+            if flags:
+                out += pack(">I", len(idbytes))
+        out += digits
+    out += idbytes
@@ -0,0 +1,256 @@
+from .parser import parse, parseBinary, parseJSON, parseXML
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+import os
+import threading
+import time
+import urllib.request, urllib.error
+
+class DocumentCache:
+    """Cache of the external documents referenced by OMReference
+
+    Documents are parsed once and shared by all the references pointing into
+    them, so they are frozen: resolve splices copies of the targets into the
+    trees, and editing a document raises AttributeError. Entries are evicted
+    in least recently used order when there are more than maxEntries or
+    their sources add up to more than maxSize bytes.
+
+    Local files are revalidated by modification time and size, and HTTP
+    documents with conditional requests (ETag and Last-Modified); those
+    without either header are kept until invalidated; a modified document is
+    read from the response to the conditional request. Entries validated less
+    than maxAge seconds ago are used without revalidation, and so are those
+    validated since the start of the current walk (see walk).
+
+    The cache can be shared by several threads. Documents are read and parsed
+    outside the lock, so prefetch can fetch several of them at once.
+    """
+
+    def __init__(self, maxEntries=64, maxSize=64 << 20, maxAge=0, timeout=30):
+        self.maxEntries = maxEntries
+        self.maxSize = maxSize
+        self.maxAge = maxAge
+        self.timeout = timeout  # seconds to wait for a server
+        self._entries = OrderedDict()  # url -> _Entry
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()  # start of the walk of each thread
+
+    def get(self, url):
+        """Get the parsed and frozen document of a URL or a local path"""
+        return self._getEntry(url).document
+
+    def getTarget(self, url, id=None):
+        """Get the object with an ID in the document of a URL or a local path
+
+        Return it with the cdbase it inherits from its ancestors in the
+        document, which it doesn't know since it is frozen, or None and None
+        if there is no such object. Without id, return the whole document.
+        """
+        entry = self._getEntry(url)
+        if not id:
+            return entry.document, None
+        return entry.document.getByID(id), entry.bases.get(id)
+
+    def _getEntry(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+        fetched = None  # (data, validator) got while revalidating
+        if entry is not None:
+            since = getattr(self._local, "since", None)
+            fresh = (
+                since is not None and entry.checked >= since
+                or time.monotonic() - entry.checked < self.maxAge
+            )
+            if not fresh:
+                fresh, fetched = self._revalidate(url, entry)
+            with self._lock:
+                if fresh:
+                    entry.checked = time.monotonic()
+                    if url in self._entries:
+                        self._entries.move_to_end(url)
+                    self.hits += 1
+                    return entry
+                if self._entries.get(url) is entry:
+                    self._discard(url)
+
+        data, validator = self._fetch(url) if fetched is None else fetched
+        entry = _Entry(_parse(url, data), validator, len(data))
+        entry.freeze()
+        with self._lock:
+            self.misses += 1
+            if url in self._entries:
+                self._discard(url)
+            self._entries[url] = entry
+            self._size += entry.size
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.maxEntries or self._size > self.maxSize
+            ):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def prefetch(self, urls, workers=8):
+        """Read several documents concurrently
+
+        Documents that cannot be read are skipped: the error is raised again
+        when they are requested with get.
+
+        Arguments:
+            urls -- URLs or local paths of the documents
+            workers -- maximum number of simultaneous reads
+        """
+        urls = list(dict.fromkeys(urls))
+        if len(urls) <= 1 or workers <= 1:
+            for url in urls:
+                self._prefetch(url)
+            return
+        with ThreadPoolExecutor(min(workers, len(urls))) as executor:
+            list(executor.map(self._prefetch, urls))
+
+    @contextmanager
+    def walk(self):
+        """Use the documents validated during the block without revalidating them
+
+        A walk reads a consistent snapshot of the documents, such as those
+        fetched by prefetch, without asking the servers again for each
+        reference. It only applies to the current thread, and nested walks
+        belong to the outermost one.
+        """
+        if getattr(self._local, "since", None) is not None:
+            yield self
+            return
+        self._local.since = time.monotonic()
+        try:
+            yield self
+        finally:
+            self._local.since = None
+
+    def _prefetch(self, url):
+        try:
+            self.get(url)
+        except (RuntimeError, ValueError, SyntaxError):
+            pass
+
+    def invalidate(self, url=None):
+        """Drop the document of a URL, or every document if it is None"""
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+                self._size = 0
+            elif url in self._entries:
+                self._discard(url)
+
+    def stats(self) -> dict:
+        """Get the counters of the cache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size": self._size,
+        }
+
+    def __contains__(self, url):
+        return url in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, url):
+        self._size -= self._entries.pop(url).size
+
+    def _fetch(self, url):
+        """Read a document, returning its bytes and its validator"""
+        if _isRemote(url):
+            try:
+                with urllib.request.urlopen(url, timeout=self.timeout) as urlh:
+                    return urlh.read(), _httpValidator(urlh.headers)
+            except (urllib.error.URLError, TimeoutError) as e:
+                raise RuntimeError("Could not resolve %s (%s)" % (url, e))
+
+        try:
+            with open(url, "rb") as fh:
+                st = os.fstat(fh.fileno())
+                return fh.read(), (st.st_mtime_ns, st.st_size)
+        except (FileNotFoundError, IsADirectoryError) as e:
+            raise RuntimeError("Could not resolve %s (%s)" % (url, e))
+
+    def _revalidate(self, url, entry):
+        """Check whether a cached document is still up to date
+
+        Return whether it is, and the bytes and the validator of the new
+        version if the server sent it, or None.
+        """
+        if not _isRemote(url):
+            try:
+                st = os.stat(url)
+            except OSError:
+                return False, None
+            return entry.validator == (st.st_mtime_ns, st.st_size), None
+
+        etag, modified = entry.validator
+        if etag is None and modified is None:
+            return True, None  # it cannot be revalidated
+        request = urllib.request.Request(url)
+        if etag is not None:
+            request.add_header("If-None-Match", etag)
+        if modified is not None:
+            request.add_header("If-Modified-Since", formatdate(modified, usegmt=True))
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as urlh:
+                return False, (urlh.read(), _httpValidator(urlh.headers))
+        except urllib.error.HTTPError as e:
+            return e.code == 304, None
+        except (urllib.error.URLError, TimeoutError):
+            return False, None
+
+
+class _Entry:
+    __slots__ = ("document", "validator", "size", "checked", "bases")
+
+    def __init__(self, document, validator, size):
+        self.document = document
+        self.validator = validator
+        self.size = size
+        self.checked = time.monotonic()
+        self.bases = {}  # id -> cdbase inherited by the object
+
+    def freeze(self):
+        """Freeze the document, keeping the cdbases that its objects inherit"""
+        for id, nodes in self.document._getIndex().items():
+            if nodes[0].parent is not None:
+                cdbase = nodes[0].parent.getCDBase()
+                if cdbase is not None:
+                    self.bases[id] = cdbase
+        self.document.freeze()
+
+
+def _isRemote(url):
+    return url.startswith("http:") or url.startswith("https:")
+
+def _httpValidator(headers):
+    modified = headers.get("Last-Modified")
+    if modified is not None:
+        try:
+            modified = parsedate_to_datetime(modified).timestamp()
+        except (TypeError, ValueError):
+            modified = None
+    return headers.get("ETag"), modified
+
+def _parse(url, data):
+    path = url.split("?")[0]
+    if path.endswith(".om") or path.endswith(".xml"):
+        return parseXML(data.decode("utf8"))
+    elif path.endswith(".json"):
+        return parseJSON(data.decode("utf8"))
+    elif path.endswith(".bin"):
+        return parseBinary(data)
+    return parse(data.decode("utf8"))
+
+documentCache = DocumentCache()
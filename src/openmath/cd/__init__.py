@@ -1,4 +1,5 @@
+CDBASEOFFICIAL = "http://www.openmath.org/cd"
+
 from .contentdictionary import ContentDictionary
 from .symboldefinition import SymbolDefinition
-
-CDBASEOFFICIAL = "http://www.openmath.org/cd"
\ No newline at end of file
+from .registry import CDRegistry
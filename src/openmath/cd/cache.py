@@ -0,0 +1,136 @@
+from .parser import compileTree, fromCompiled
+import xml.etree.ElementTree as ET
+import json
+import os
+
+CACHE_NAME = ".ocdcache"
+CACHE_FORMAT = 1
+
+def loadDirectory(directory, registry, cache=True):
+    """Add the content dictionaries of a directory to a registry
+
+    The .ocd files are compiled once into a cache file in the same
+    directory, which is updated when they change, by modification time and
+    size. Dictionaries found in the cache are added lazily, so each one is
+    only read when one of its symbols is first looked up. Return the number
+    of content dictionaries.
+
+    The cache file has a line with the JSON index, followed by the JSON of
+    every compiled dictionary. The index has the modification time, size,
+    name, cdbase, offset and length of each .ocd file.
+
+    Arguments:
+        directory -- path of the directory
+        registry -- CDRegistry to add the dictionaries to
+        cache -- whether to use and update the cache file
+    """
+    cachePath = os.path.join(directory, CACHE_NAME)
+    index, start = _readIndex(cachePath) if cache else ({}, 0)
+
+    files = {}
+    for entry in os.scandir(directory):
+        if entry.name.lower().endswith(".ocd") and entry.is_file():
+            st = entry.stat()
+            files[entry.name] = (st.st_mtime_ns, st.st_size)
+
+    compiled = {}  # compiled dictionaries of the new or modified files
+    for filename, (mtime, size) in sorted(files.items()):
+        info = index.get(filename)
+        if info is None or (info["mtime"], info["size"]) != (mtime, size):
+            compiled[filename] = _compileFile(os.path.join(directory, filename))
+
+    if cache and (compiled or set(index) != set(files)):
+        try:
+            index, start = _writeCache(cachePath, start, index, files, compiled)
+        except OSError:  # such as a read-only directory
+            pass
+
+    for filename in sorted(files):
+        if filename in compiled:
+            registry.add(fromCompiled(compiled[filename]))
+        else:
+            info = index[filename]
+            path = os.path.join(directory, filename)
+            registry.addLazy(info["name"], info["base"], _Loader(cachePath, start, info, path))
+    return len(files)
+
+
+def _compileFile(path):
+    with open(path, "rb") as fh:
+        return compileTree(ET.parse(fh))
+
+
+class _Loader:
+    """Loader of a dictionary from the cache
+
+    It parses the .ocd file instead if the cache has been rewritten since.
+    It is a class, not a closure, so that registries can be pickled.
+    """
+
+    def __init__(self, cachePath, start, info, path):
+        self.cachePath = cachePath
+        self.start = start
+        self.info = info
+        self.path = path
+
+    def __call__(self):
+        info = self.info
+        try:
+            with open(self.cachePath, "rb") as fh:
+                fh.seek(self.start + info["offset"])
+                compiled = json.loads(fh.read(info["length"]))
+            if compiled["name"] == info["name"] and compiled["base"] == info["base"]:
+                return fromCompiled(compiled)
+        except (OSError, ValueError, KeyError):
+            pass
+        return fromCompiled(_compileFile(self.path))
+
+
+def _readIndex(cachePath):
+    """Read the index of a cache file and the position of its first blob"""
+    try:
+        with open(cachePath, "rb") as fh:
+            line = fh.readline()
+        index = json.loads(line)
+        if index.get("format") == CACHE_FORMAT:
+            return index["files"], len(line)
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return {}, 0
+
+
+def _writeCache(cachePath, start, index, files, compiled):
+    """Write the cache file, reusing the blobs of the unchanged files
+
+    Return the new index and the position of the first blob.
+    """
+    old = b""
+    if len(compiled) < len(files):
+        with open(cachePath, "rb") as fh:
+            old = fh.read()[start:]
+
+    blobs = []
+    newIndex = {}
+    offset = 0
+    for filename, (mtime, size) in sorted(files.items()):
+        if filename in compiled:
+            cd = compiled[filename]
+            blob = json.dumps(cd, separators=(",", ":")).encode("utf8")
+            info = {"name": cd["name"], "base": cd["base"]}
+        else:
+            info = index[filename]
+            blob = old[info["offset"]:info["offset"] + info["length"]]
+            info = {"name": info["name"], "base": info["base"]}
+        info.update(mtime=mtime, size=size, offset=offset, length=len(blob))
+        newIndex[filename] = info
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({"format": CACHE_FORMAT, "files": newIndex}).encode("utf8")
+    temporary = cachePath + ".%d.tmp" % os.getpid()
+    with open(temporary, "wb") as fh:
+        fh.write(header + b"\n")
+        for blob in blobs:
+            fh.write(blob)
+    os.replace(temporary, cachePath)
+    return newIndex, len(header) + 1
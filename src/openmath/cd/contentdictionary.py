@@ -1,6 +1,7 @@
 from dataclasses import dataclass, field
 
-from ..OMSymbol import OMSymbol
+from ..om.omsymbol import OMSymbol
+from . import CDBASEOFFICIAL
 
 @dataclass
 class ContentDictionary:
@@ -14,20 +15,29 @@ class ContentDictionary:
     url: str = None
     comment: str = field(default=None, repr=False)
     definitions: list = field(default_factory=list)
+    _index: dict = field(default=None, init=False, repr=False, compare=False)
+
+    def _definitions(self) -> dict:
+        """Get the definitions by name
+
+        The index is rebuilt when definitions are added or removed, but not
+        when they are renamed or replaced in place.
+        """
+        if self._index is None or len(self._index) != len(self.definitions):
+            self._index = {d.name: d for d in self.definitions}
+        return self._index
 
     def __getitem__(self, key):
         if type(key) == int:
             return self.definitions[key]
 
         if type(key) == str:
-            for d in self.definitions:
-                if d.name == key:
-                    return d
-            raise KeyError(key)
+            return self._definitions()[key]
 
         if isinstance(key, OMSymbol):
-            if key.getCDBase != self.cdbase or k.cd != self.name:
+            if not self._isBaseOf(key) or key.cd != self.name:
                 raise KeyError(key)
+            return self[key.name]
 
         raise TypeError(
             "ContentDictionary indices must be integers, strings or openmath.OMSymbol"
@@ -35,19 +45,20 @@ class ContentDictionary:
 
     def __contains__(self, key):
         if type(key) == str:
-            for d in self.definitions:
-                if key == d.name:
-                    return True
-            return False
+            return key in self._definitions()
 
         if isinstance(key, OMSymbol):
             return (
-                key.getCDBase() == self.base
+                self._isBaseOf(key)
                 and key.cd == self.name
                 and key.name in self
             )
 
-        return key in definitions
+        return key in self.definitions
+
+    def _isBaseOf(self, symbol):
+        # A missing cdbase means the official one
+        return (symbol.getCDBase() or CDBASEOFFICIAL) == (self.base or CDBASEOFFICIAL)
 
     def symbol(self, key, alsobase=False):
         if key not in self:
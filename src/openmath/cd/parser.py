@@ -15,7 +15,17 @@ def fromTree(tree):
 
     Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#cha_cd
     """
-    root = tree.getroot()
+    return fromCompiled(compileTree(tree, serialize=False))
+
+
+def compileTree(tree, serialize=True):
+    """Get the fields of a Content Dictionary from a xml.etree.Element
+
+    The result only has strings, lists and dictionaries, so it can be stored
+    as JSON. The mathematical objects are kept as XML strings, or as their
+    elements without serialize.
+    """
+    root = tree.getroot() if isinstance(tree, ET.ElementTree) else tree
     # handle xml namespaces
     if root.tag[0] == "{":
         [ns, tag] = root.tag[1:].split("}")
@@ -26,10 +36,19 @@ def fromTree(tree):
     def qname(t):
         return t if ns is None else ("{%s}%s" % (ns, t))
 
+    def text(element, t):
+        child = element.find(qname(t))
+        return None if child is None or child.text is None else child.text.strip()
+
+    def objects(element):
+        if not serialize:
+            return list(element)
+        return [ET.tostring(x, encoding="unicode") for x in element]
+
     if tag != "CD":
         raise ValueError("Root tag must be CD, not " + tag)
 
-    cd = ContentDictionary()
+    cd = {}
     strfields = [
         ("CDName", "name"),
         ("Description", "description"),
@@ -41,24 +60,37 @@ def fromTree(tree):
         ("CDURL", "url"),
         ("CDComment", "comment"),
     ]
-    for tag, field in strfields:
-        setattr(cd, field, root.find(qname(tag)).text.strip())
+    for t, field in strfields:
+        cd[field] = text(root, t)
 
+    cd["definitions"] = []
     for element in root.findall(qname("CDDefinition")):
-        symboldef = SymbolDefinition()
+        symboldef = {}
         strfields = [
             ("Name", "name"),
             ("Description", "description"),
             ("Role", "role"),
         ]
-        for tag, field in strfields:
-            setattr(symboldef, field, element.find(qname(tag)).text.strip())
-        symboldef.cmp = [x.text for x in element.findall(qname("CMP"))]
-        symboldef.fmp = [x.text for x in element.findall(qname("FMP"))]
-        symboldef.examples = [
-            (x.text, [om.fromElement(c) for c in x])
-            for x in element.findall(qname("Example"))
+        for t, field in strfields:
+            symboldef[field] = text(element, t)
+        symboldef["cmp"] = [x.text for x in element.findall(qname("CMP"))]
+        symboldef["fmp"] = [y for x in element.findall(qname("FMP")) for y in objects(x)]
+        symboldef["examples"] = [
+            [x.text, objects(x)] for x in element.findall(qname("Example"))
         ]
-        cd.definitions.append(symboldef)
+        cd["definitions"].append(symboldef)
+
+    return cd
 
+
+def fromCompiled(compiled):
+    """Build a Content Dictionary from the result of compileTree"""
+    fields = dict(compiled)
+    definitions = fields.pop("definitions")
+    cd = ContentDictionary(**fields)
+    for d in definitions:
+        symboldef = SymbolDefinition(name=d["name"], description=d["description"], role=d["role"])
+        symboldef.cmp = list(d["cmp"])
+        symboldef.setSources(d["fmp"], d["examples"])  # parsed on first use
+        cd.definitions.append(symboldef)
     return cd
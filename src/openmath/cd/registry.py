@@ -0,0 +1,144 @@
+from . import CDBASEOFFICIAL
+
+class CDRegistry:
+    """Index of content dictionaries and their symbol definitions
+
+    Symbols are looked up by their effective cdbase, CD name and name in a
+    single dictionary. A missing cdbase means the official one, both in the
+    symbols and in the content dictionaries.
+
+    Content dictionaries are indexed when they are added, so a dictionary
+    modified afterwards must be added again. They can also be added lazily,
+    with a function that loads them the first time one of their symbols is
+    looked up. The version increases every time the registry changes, so
+    that results computed from it can be invalidated.
+
+    Arguments:
+        cds -- content dictionaries to add (default=())
+    """
+
+    def __init__(self, cds=()):
+        self._cds = {}  # (cdbase, cd) -> ContentDictionary
+        self._symbols = {}  # (cdbase, cd, name) -> (ContentDictionary, SymbolDefinition)
+        self._lazy = {}  # (cdbase, cd) -> function returning the ContentDictionary
+        self.version = 0
+        self.lookups = 0
+        self.misses = 0
+        self.load(cds)
+
+    def add(self, cd):
+        """Add a content dictionary, replacing any other with its cdbase and name"""
+        self._add(cd)
+        self.version += 1
+
+    def addLazy(self, name, cdbase, loader):
+        """Add a content dictionary to be loaded on first use
+
+        Arguments:
+            name -- name of the content dictionary
+            cdbase -- its cdbase, None for the official one
+            loader -- function without arguments that returns it
+        """
+        key = (cdbase or CDBASEOFFICIAL, name)
+        if key in self._cds:
+            self._discard(key)
+        self._lazy[key] = loader
+        self.version += 1
+
+    def load(self, cds):
+        """Add several content dictionaries at once"""
+        count = 0
+        for cd in cds:
+            self._add(cd)
+            count += 1
+        if count:
+            self.version += 1
+
+    def remove(self, cd):
+        """Remove a content dictionary, given by itself or by its name"""
+        key = (
+            (CDBASEOFFICIAL, cd) if type(cd) is str else (cd.base or CDBASEOFFICIAL, cd.name)
+        )
+        if self._lazy.pop(key, None) is None:
+            self._discard(key)
+        self.version += 1
+
+    def clear(self):
+        """Remove all the content dictionaries"""
+        self._cds.clear()
+        self._symbols.clear()
+        self._lazy.clear()
+        self.version += 1
+
+    def _discard(self, key):
+        for d in self._cds.pop(key).definitions:
+            self._symbols.pop((*key, d.name), None)
+
+    def _add(self, cd):
+        key = (cd.base or CDBASEOFFICIAL, cd.name)
+        self._lazy.pop(key, None)
+        if key in self._cds:
+            self._discard(key)
+        self._cds[key] = cd
+        for d in cd.definitions:
+            self._symbols[(*key, d.name)] = (cd, d)
+
+    def lookup(self, symbol):
+        """Get the content dictionary and the definition of a symbol
+
+        Return (None, None) if the symbol isn't defined.
+        """
+        return self.find(symbol.getCDBase(), symbol.cd, symbol.name)
+
+    def find(self, cdbase, cd, name):
+        """Get the content dictionary and the definition of a symbol by its
+        effective cdbase, CD name and name
+
+        Return (None, None) if the symbol isn't defined.
+        """
+        self.lookups += 1
+        key = (cdbase or CDBASEOFFICIAL, cd, name)
+        found = self._symbols.get(key)
+        if found is None and key[:2] in self._lazy:
+            self._loadLazy(key[:2])
+            found = self._symbols.get(key)
+        if found is None:
+            self.misses += 1
+            return None, None
+        return found
+
+    def getCD(self, name, cdbase=None):
+        """Get a content dictionary by its name and cdbase, or None"""
+        key = (cdbase or CDBASEOFFICIAL, name)
+        if key in self._lazy:
+            self._loadLazy(key)
+        return self._cds.get(key)
+
+    def _loadLazy(self, key):
+        # It doesn't change the content, so the version stays the same
+        loader = self._lazy.pop(key)
+        self._add(loader())
+
+    def stats(self) -> dict:
+        """Get the counters of the registry"""
+        return {
+            "cds": len(self),
+            "loaded": len(self._cds),
+            "symbols": len(self._symbols),
+            "version": self.version,
+            "lookups": self.lookups,
+            "hits": self.lookups - self.misses,
+            "misses": self.misses,
+        }
+
+    def __contains__(self, symbol):
+        return self.lookup(symbol)[1] is not None
+
+    def __iter__(self):
+        """Iterate over the content dictionaries, loading the lazy ones"""
+        for key in list(self._lazy):
+            self._loadLazy(key)
+        return iter(list(self._cds.values()))
+
+    def __len__(self):
+        return len(self._cds) + len(self._lazy)
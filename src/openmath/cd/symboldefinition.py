@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
 
 from ..om.ombase import OMBase
+from ..parser import fromElement, parseXML
+import xml.etree.ElementTree as ET
 
 @dataclass
 class SymbolDefinition:
@@ -8,5 +10,50 @@ class SymbolDefinition:
     description: str = None
     role: str = None
     cmp: list[str] = field(default_factory=list)
-    fmp: list[OMBase] = field(default_factory=list)
-    examples: list = field(default_factory=list)
\ No newline at end of file
+    # Left out of repr and eq, which would parse them
+    fmp: list[OMBase] = field(default_factory=list, repr=False, compare=False)
+    examples: list = field(default_factory=list, repr=False, compare=False)
+
+    def setSources(self, fmp=(), examples=()):
+        """Set the formal properties and the examples as XML
+
+        They are parsed the first time fmp or examples are read.
+
+        Arguments:
+            fmp -- XML string or element of the object of every formal property
+            examples -- (text, XML of every object) pair of every example
+        """
+        self._fmp = None
+        self._fmpSource = list(fmp)
+        self._examples = None
+        self._examplesSource = list(examples)
+
+
+def _parse(source):
+    return fromElement(source) if isinstance(source, ET.Element) else parseXML(source)
+
+def _getFMP(self):
+    if self._fmpSource is not None:
+        self._fmp = [_parse(x) for x in self._fmpSource]
+        self._fmpSource = None
+    return self._fmp
+
+def _setFMP(self, value):
+    self._fmp = value
+    self._fmpSource = None
+
+def _getExamples(self):
+    if self._examplesSource is not None:
+        self._examples = [
+            (text, [_parse(x) for x in objects]) for text, objects in self._examplesSource
+        ]
+        self._examplesSource = None
+    return self._examples
+
+def _setExamples(self, value):
+    self._examples = value
+    self._examplesSource = None
+
+# Defined after the dataclass, which would take them as default values
+SymbolDefinition.fmp = property(_getFMP, _setFMP)
+SymbolDefinition.examples = property(_getExamples, _setExamples)
@@ -0,0 +1,93 @@
+from .util import assertOM
+
+class Cursor:
+    """Position in a tree of frozen objects
+
+    Frozen objects keep no parent, so the cursor holds the path from the
+    root instead. Cursors are immutable: moving returns a new cursor, and
+    replacing the object at a position returns a cursor into a new tree,
+    which shares everything but the path to the root with the old one.
+
+    Arguments:
+        node -- object at the position, which is frozen if it isn't yet
+        parent -- cursor of the parent (default=None, for the root)
+        index -- position of the object among the children of the parent
+    """
+
+    __slots__ = ("node", "parent", "index")
+
+    def __init__(self, node, parent=None, index=None):
+        assertOM(node)
+        self.node = node.freeze()
+        self.parent = parent
+        self.index = index
+
+    def down(self, index=0):
+        """Get the cursor of a child, by its position in _children order"""
+        return Cursor(self.node._children()[index], self, index)
+
+    def up(self):
+        """Get the cursor of the parent, or None at the root"""
+        return self.parent
+
+    def children(self):
+        """Get the cursors of the children"""
+        return [Cursor(x, self, i) for i, x in enumerate(self.node._children())]
+
+    def root(self):
+        """Get the cursor of the root"""
+        cursor = self
+        while cursor.parent is not None:
+            cursor = cursor.parent
+        return cursor
+
+    def depth(self) -> int:
+        """Get the number of ancestors"""
+        depth = 0
+        cursor = self.parent
+        while cursor is not None:
+            depth += 1
+            cursor = cursor.parent
+        return depth
+
+    def getCDBase(self) -> str:
+        """Get the cdbase of the object, inherited from its ancestors"""
+        cursor = self
+        while cursor is not None:
+            cdbase = getattr(cursor.node, "cdbase", None)
+            if cdbase is not None:
+                return cdbase
+            cursor = cursor.parent
+        return None
+
+    def replace(self, node):
+        """Get the cursor of the same position in a tree with another object
+
+        Only the ancestors are copied: the rest of the tree is shared.
+        """
+        node = Cursor(node).node
+        path = []
+        cursor = self
+        while cursor.parent is not None:
+            path.append(cursor)
+            cursor = cursor.parent
+
+        # Copy the ancestors bottom-up, then rebuild the cursors top-down
+        nodes = [node]
+        for cursor in path:
+            nodes.append(cursor.parent.node._withChild(cursor.index, nodes[-1]))
+        result = Cursor(nodes.pop())
+        for cursor in reversed(path):
+            result = Cursor(nodes.pop(), result, cursor.index)
+        return result
+
+    def walk(self):
+        """Generate the cursors of the object and its descendants, in pre-order"""
+        pending = [self]
+        while pending:
+            cursor = pending.pop()
+            yield cursor
+            pending.extend(reversed(cursor.children()))
+
+    def __repr__(self):
+        return "Cursor(%r, depth=%d)" % (self.node, self.depth())
@@ -0,0 +1,367 @@
+from .om.ombase import OMBase
+from collections import OrderedDict
+from functools import reduce
+import builtins
+import cmath
+import math
+import operator
+import threading
+
+def _fold(f, start):
+    return lambda *args: reduce(f, args, start)
+
+
+def _root(x, n):
+    return -((-x) ** (1 / n)) if x < 0 and n % 2 == 1 else x ** (1 / n)
+
+
+# (cd, name) -> implementation: a function for the applications and the
+# binders, a value for the constants
+SYMBOLS = {
+    ("arith1", "plus"): _fold(operator.add, 0),
+    ("arith1", "times"): _fold(operator.mul, 1),
+    ("arith1", "minus"): operator.sub,
+    ("arith1", "divide"): operator.truediv,
+    ("arith1", "power"): operator.pow,
+    ("arith1", "unary_minus"): operator.neg,
+    ("arith1", "abs"): abs,
+    ("arith1", "root"): _root,
+    ("arith1", "gcd"): math.gcd,
+    ("arith1", "lcm"): math.lcm,
+    ("arith1", "sum"): lambda interval, f: sum(f(x) for x in interval),
+    ("arith1", "product"): lambda interval, f: math.prod(f(x) for x in interval),
+    ("transc1", "sin"): math.sin,
+    ("transc1", "cos"): math.cos,
+    ("transc1", "tan"): math.tan,
+    ("transc1", "arcsin"): math.asin,
+    ("transc1", "arccos"): math.acos,
+    ("transc1", "arctan"): math.atan,
+    ("transc1", "sinh"): math.sinh,
+    ("transc1", "cosh"): math.cosh,
+    ("transc1", "tanh"): math.tanh,
+    ("transc1", "exp"): math.exp,
+    ("transc1", "ln"): math.log,
+    ("transc1", "log"): lambda base, x: math.log(x, base),
+    ("relation1", "eq"): operator.eq,
+    ("relation1", "neq"): operator.ne,
+    ("relation1", "lt"): operator.lt,
+    ("relation1", "gt"): operator.gt,
+    ("relation1", "leq"): operator.le,
+    ("relation1", "geq"): operator.ge,
+    ("relation1", "approx"): lambda x, y: math.isclose(x, y),
+    ("logic1", "and"): lambda *args: all(args),
+    ("logic1", "or"): lambda *args: any(args),
+    ("logic1", "xor"): lambda *args: sum(map(bool, args)) % 2 == 1,
+    ("logic1", "not"): operator.not_,
+    ("logic1", "implies"): lambda x, y: not x or y,
+    ("logic1", "equivalent"): lambda x, y: bool(x) == bool(y),
+    ("logic1", "true"): True,
+    ("logic1", "false"): False,
+    ("nums1", "pi"): math.pi,
+    ("nums1", "e"): math.e,
+    ("nums1", "i"): 1j,
+    ("nums1", "infinity"): math.inf,
+    ("nums1", "NaN"): math.nan,
+    ("interval1", "integer_interval"): lambda a, b: range(a, b + 1),
+    ("fns1", "lambda"): lambda f: f,
+    ("complex1", "complex_cartesian"): complex,
+    ("complex1", "complex_polar"): cmath.rect,
+}
+
+# Applications of these symbols are written as Python operators, as long as
+# they keep their implementation of SYMBOLS: (cd, name) -> (number of
+# arguments or None for any, format or separator)
+_OPERATORS = {
+    ("arith1", "plus"): (None, " + "),
+    ("arith1", "times"): (None, " * "),
+    ("arith1", "minus"): (2, "{0} - {1}"),
+    ("arith1", "divide"): (2, "{0} / {1}"),
+    ("arith1", "power"): (2, "{0} ** {1}"),
+    ("arith1", "unary_minus"): (1, "-{0}"),
+    ("relation1", "eq"): (2, "{0} == {1}"),
+    ("relation1", "neq"): (2, "{0} != {1}"),
+    ("relation1", "lt"): (2, "{0} < {1}"),
+    ("relation1", "gt"): (2, "{0} > {1}"),
+    ("relation1", "leq"): (2, "{0} <= {1}"),
+    ("relation1", "geq"): (2, "{0} >= {1}"),
+    ("logic1", "and"): (None, " and "),
+    ("logic1", "or"): (None, " or "),
+    ("logic1", "not"): (1, "not {0}"),
+}
+
+_CHAIN = 64  # maximum number of operands of an expression
+
+
+class Compiler:
+    """Compiler of mathematical objects to Python functions
+
+    Every application becomes an assignment to a new local variable of the
+    function, so the code is flat whatever the depth of the object, and the
+    common arithmetic, relational and logical symbols become Python
+    operators. Bindings become nested functions, which are passed to the
+    implementation of the binder: fns1.lambda returns them as they are, so
+    lambdas are real callables. Attributions are ignored.
+
+    The symbols are looked up by their CD and name, whatever their cdbase.
+    Compiled functions are cached by the structure of the objects, the
+    least recently used first evicted, and the cache is cleared when an
+    implementation changes.
+
+    Arguments:
+        symbols -- dictionary from (cd, name) to the implementations
+            (default=SYMBOLS)
+        maxEntries -- size of the cache of compiled functions (default=1024)
+    """
+
+    def __init__(self, symbols=None, maxEntries=1024):
+        self.symbols = dict(SYMBOLS if symbols is None else symbols)
+        self.maxEntries = maxEntries
+        self._cache = OrderedDict()  # (hash, variables) -> [(frozen copy, function)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, cd, name, implementation):
+        """Set the implementation of a symbol
+
+        Arguments:
+            cd -- name of the content dictionary
+            name -- name of the symbol
+            implementation -- function for the symbols that are applied or
+                that bind variables, value for the constants
+        """
+        with self._lock:
+            self.symbols[(cd, name)] = implementation
+            self._cache.clear()
+
+    def compile(self, obj: OMBase, variables=None):
+        """Get a Python function that evaluates an object
+
+        The function takes the values of the free variables as positional
+        arguments, in the order of its variables attribute, and its source
+        is in its source attribute.
+
+        Arguments:
+            obj -- object to compile
+            variables -- names of the free variables, in the order of the
+                arguments (default=the names of the free variables, sorted)
+        """
+        variables = None if variables is None else tuple(variables)
+        key = (hash(obj), variables)
+        with self._lock:
+            for copy, function in self._cache.get(key, ()):
+                if copy == obj:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return function
+            self.misses += 1
+
+        function = _Translation(obj, variables, self.symbols).function()
+        with self._lock:
+            self._cache.setdefault(key, []).append((obj.clone().freeze(), function))
+            while len(self._cache) > self.maxEntries:
+                self._cache.popitem(last=False)
+        return function
+
+    def evaluate(self, obj: OMBase, **values):
+        """Evaluate an object with the values of its free variables, by name"""
+        function = self.compile(obj)
+        return function(*(values[x] for x in function.variables))
+
+    def stats(self) -> dict:
+        """Get the counters of the cache"""
+        with self._lock:
+            return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+class _Scope:
+    """Function being generated, with the identifiers of its variables"""
+
+    def __init__(self, parent, variables):
+        self.parent = parent
+        self.variables = variables  # OMV name -> identifier
+        self.lines = []
+
+    def lookup(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.variables:
+                return scope.variables[name]
+            scope = scope.parent
+        return None
+
+
+class _Translation:
+    """Translation of an object to the source of a Python function"""
+
+    def __init__(self, obj, variables, symbols):
+        self.symbols = symbols
+        self.namespace = {}  # identifier -> value
+        self.values = {}  # id of a value -> identifier in namespace
+        self.counter = 0
+        self.free = {}  # name of a free variable -> identifier
+        self.fixed = variables is not None
+        if self.fixed:
+            for name in variables:
+                self.free[name] = self.identifier("v")
+        self.scope = _Scope(None, {})
+        self.result = self.translate(obj)
+
+    def identifier(self, prefix):
+        self.counter += 1
+        return "%s%d" % (prefix, self.counter)
+
+    def constant(self, value, prefix="c"):
+        """Get the identifier of a value in the namespace of the function"""
+        key = id(value)
+        if key not in self.values:
+            self.values[key] = self.identifier(prefix)
+            self.namespace[self.values[key]] = value
+        return self.values[key]
+
+    def implementation(self, symbol):
+        try:
+            value = self.symbols[(symbol.cd, symbol.name)]
+        except KeyError:
+            raise ValueError("No implementation of %s.%s" % (symbol.cd, symbol.name)) from None
+        return value
+
+    def assign(self, scope, expression):
+        name = self.identifier("t")
+        scope.lines.append("%s = %s" % (name, expression))
+        return name
+
+    def translate(self, root):
+        """Translate an object bottom-up without recursion
+
+        Return the expression of its value, after adding the lines that
+        compute it to the scopes.
+        """
+        done = []  # expressions of the translated objects
+        pending = [(root, self.scope, False)]
+        while pending:
+            node, scope, expanded = pending.pop()
+            kind = node.kind
+
+            if kind in ("OMOBJ", "OMATTR"):
+                pending.append((node.object, scope, False))
+
+            elif kind == "OMI":
+                done.append(repr(node.integer) if node.integer >= 0 else "(%r)" % node.integer)
+
+            elif kind == "OMF":
+                value = node.float
+                literal = math.isfinite(value) and math.copysign(1, value) > 0
+                done.append(repr(value) if literal else self.constant(value))
+
+            elif kind == "OMSTR":
+                done.append(repr(node.string))
+
+            elif kind == "OMB":
+                done.append(self.constant(node.bytes))
+
+            elif kind == "OMS":
+                done.append(self.constant(self.implementation(node), "s"))
+
+            elif kind == "OMV":
+                done.append(self.variable(node.name, scope))
+
+            elif kind == "OMA" and not expanded:
+                pending.append((node, scope, True))
+                children = node.arguments if node.applicant.kind == "OMS" else node._children()
+                pending.extend((x, scope, False) for x in reversed(children))
+
+            elif kind == "OMA":
+                count = len(node.arguments)
+                arguments = done[len(done) - count:]
+                del done[len(done) - count:]
+                if node.applicant.kind == "OMS":
+                    done.append(self.assign(scope, self.application(node.applicant, arguments, scope)))
+                else:
+                    head = done.pop()
+                    done.append(self.assign(scope, "%s(%s)" % (head, ", ".join(arguments))))
+
+            elif kind == "OMBIND" and not expanded:
+                names = {}
+                for v in node.variables:
+                    if v.kind == "OMATTR":
+                        v = v.object
+                    names[v.name] = self.identifier("v")
+                inner = _Scope(scope, names)
+                pending.append((node, inner, True))
+                pending.append((node.object, inner, False))
+
+            elif kind == "OMBIND":
+                inner = scope
+                scope = inner.parent
+                name = self.identifier("f")
+                scope.lines.append("def %s(%s):" % (name, ", ".join(inner.variables.values())))
+                scope.lines.extend("    " + x for x in inner.lines)
+                scope.lines.append("    return " + done.pop())
+                binder = node.binder
+                if binder.kind != "OMS":
+                    raise ValueError("Only symbols can bind variables, not %s" % binder.kind)
+                implementation = self.implementation(binder)
+                if implementation is SYMBOLS[("fns1", "lambda")]:
+                    done.append(name)
+                else:
+                    done.append(self.assign(scope, "%s(%s)" % (
+                        self.constant(implementation, "s"), name
+                    )))
+
+            else:
+                raise ValueError("%s objects can't be evaluated" % kind)
+
+        return done.pop()
+
+    def application(self, symbol, arguments, scope):
+        implementation = self.implementation(symbol)
+        key = (symbol.cd, symbol.name)
+        if key in _OPERATORS and SYMBOLS.get(key) is implementation:
+            count, form = _OPERATORS[key]
+            if count is None and len(arguments) >= 2:
+                # long chains of operators are split, as the Python compiler
+                # recurses over them
+                while len(arguments) > _CHAIN:
+                    arguments = [self.assign(scope, form.join(arguments[:_CHAIN]))] + arguments[_CHAIN:]
+                if form in (" and ", " or "):  # they return an operand
+                    return "bool(%s)" % form.join(arguments)
+                return form.join(arguments)
+            if count == len(arguments):
+                return form.format(*arguments)
+        return "%s(%s)" % (self.constant(implementation, "s"), ", ".join(arguments))
+
+    def variable(self, name, scope):
+        identifier = scope.lookup(name) or self.free.get(name)
+        if identifier is not None:
+            return identifier
+        if self.fixed:
+            raise ValueError("Free variable %s is not in the variables" % name)
+        self.free[name] = identifier = self.identifier("v")
+        return identifier
+
+    def function(self):
+        """Build the function from the translation"""
+        free = sorted(self.free) if not self.fixed else list(self.free)
+        lines = ["def compiled(%s):" % ", ".join(self.free[x] for x in free)]
+        lines.extend("    " + x for x in self.scope.lines)
+        lines.append("    return " + self.result)
+        source = "\n".join(lines) + "\n"
+        namespace = dict(self.namespace)
+        exec(builtins.compile(source, "<openmath>", "exec"), namespace)
+        function = namespace["compiled"]
+        function.variables = tuple(free)
+        function.source = source
+        return function
+
+
+compiler = Compiler()  # used by default
+
+def compileExpression(obj: OMBase, variables=None):
+    """Compile an object with the default compiler, see Compiler.compile"""
+    return compiler.compile(obj, variables)
+
+
+def evaluate(obj: OMBase, **values):
+    """Evaluate an object with the default compiler, see Compiler.evaluate"""
+    return compiler.evaluate(obj, **values)
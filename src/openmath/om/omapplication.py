@@ -1,7 +1,7 @@
 from .ombase import OMBase
 from .omsymbol import OMSymbol
-from ..util import setattrType, setattrOM
-import xml.etree.ElementTree as ET
+from ..util import assertOM, jsonMember, setParent, setattrOM, setattrType, assertType
+from ..binary import writeBegin, TOKEN_APPLICATION, TOKEN_APPLICATION_END
 
 class OMApplication(OMBase):
     """Implementation of the OMApplication object
@@ -11,8 +11,12 @@ class OMApplication(OMBase):
 
     kind = "OMA"
     __match_args__ = ("applicant", "arguments")
+    __slots__ = ("cdbase", "applicant", "arguments")
+    _fields = ("applicant", "arguments", "cdbase", "id")
+    _scalars = ("id",)
 
     def __init__(self, applicant: OMSymbol, arguments, cdbase: str = None, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "cdbase", cdbase, (str, type(None)))
         self.setApplicant(applicant)
@@ -23,16 +27,41 @@ class OMApplication(OMBase):
         setattrOM(self, "applicant", applicant)
 
     def setArguments(self, arguments):
+        self._assertMutable()
         for arg in arguments:
             assertOM(arg)
-            arg.parent = self
+            setParent(arg, self)
+        old = getattr(self, "arguments", ())
         self.arguments = tuple(arguments)
+        self._changed(old, self.arguments)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("cdbase", self.__dict__.get("cdbase"))
-        el.append(self.applicant.toElement())
-        for a in self.arguments:
-            el.append(a.toElement())
-        return el
+    def _verify(self):
+        super()._verify()
+        assertType(self.cdbase, (str, type(None)))
+        assertOM(self.applicant)
+        for arg in self.arguments:
+            assertOM(arg)
+
+    def _children(self):
+        return (self.applicant, *self.arguments)
+
+    def _setChildren(self, children):
+        self.applicant = children[0]
+        self.arguments = tuple(children[1:])
+
+    def _xml(self):
+        attrib = (("id", self.id), ("cdbase", self.cdbase))
+        return attrib, None, (self.applicant, *self.arguments)
+
+    def _json(self):
+        parts = ['{"kind": "OMA", "applicant": ', self.applicant, ', "arguments": [']
+        for i, x in enumerate(self.arguments):
+            if i:
+                parts.append(", ")
+            parts.append(x)
+        parts.append("]" + jsonMember("cdbase", self.cdbase) + jsonMember("id", self.id) + "}")
+        return parts
+
+    def _binary(self, out, ids):
+        writeBegin(out, ids, TOKEN_APPLICATION, self.id, self.cdbase)
+        return [self.applicant, *self.arguments, bytes([TOKEN_APPLICATION_END])]
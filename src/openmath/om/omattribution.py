@@ -1,6 +1,12 @@
 from .ombase import OMBase
-from ..util import setattrType, setattrOM, assertType, valueAssert, assertOM
-import xml.etree.ElementTree as ET
+from ..util import assertOM, assertType, jsonMember, setParent, setattrOM, setattrType, valueAssert
+from ..binary import (
+    writeBegin,
+    TOKEN_ATTRIBUTION,
+    TOKEN_ATTRIBUTION_END,
+    TOKEN_ATTRIBUTEPAIRS,
+    TOKEN_ATTRIBUTEPAIRS_END,
+)
 
 class OMAttribution(OMBase):
     """Implementation of the OMAttribution object
@@ -10,8 +16,12 @@ class OMAttribution(OMBase):
 
     kind = "OMATTR"
     __match_args__ = ("attributes", "object")
+    __slots__ = ("cdbase", "attributes", "object")
+    _fields = ("attributes", "cdbase", "id", "object")
+    _scalars = ("id",)
 
     def __init__(self, attributes, object_, cdbase=None, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "cdbase", cdbase, (str, type(None)))
         self.setObject(object_)
@@ -21,23 +31,60 @@ class OMAttribution(OMBase):
         setattrOM(self, "object", object_)
 
     def setAttributes(self, attrs):
+        self._assertMutable()
         for attr in attrs:
             assertType(attr, tuple)
             valueAssert(len(attr) == 2, "Attributes must be two values")
             assertOM(attr[0], "OMS")
             assertOM(attr[1])
-            attr[0].parent = self
-            attr[1].parent = self
+            setParent(attr[0], self)
+            setParent(attr[1], self)
+        old = getattr(self, "attributes", ())
         self.attributes = tuple(attrs)
+        self._changed(
+            [x for pair in old for x in pair],
+            [x for pair in self.attributes for x in pair],
+        )
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("cdbase", self.__dict__.get("cdbase"))
-        attrs = ET.Element("OMATP")
-        for (a, b) in self.attributes:
-            attrs.append(a.toElement(), b.toElement())
-        el.append(attrs)
-        el.append(self.object.toElement())
-        return el
+    def _verify(self):
+        super()._verify()
+        assertType(self.cdbase, (str, type(None)))
+        assertOM(self.object)
+        for attr in self.attributes:
+            assertType(attr, tuple)
+            valueAssert(len(attr) == 2, "Attributes must be two values")
+            assertOM(attr[0], "OMS")
+            assertOM(attr[1])
+
+    def _children(self):
+        return (*(x for pair in self.attributes for x in pair), self.object)
+
+    def _setChildren(self, children):
+        self.attributes = tuple(zip(children[0:-1:2], children[1:-1:2]))
+        self.object = children[-1]
+
+    def _xml(self):
+        attrib = (("id", self.id), ("cdbase", self.cdbase))
+        pairs = [x for pair in self.attributes for x in pair]
+        return attrib, None, (("OMATP", pairs), self.object)
+
+    def _json(self):
+        parts = ['{"kind": "OMATTR", "attributes": [']
+        for i, (key, value) in enumerate(self.attributes):
+            parts += (", [" if i else "[", key, ", ", value, "]")
+        parts += (
+            "]" + jsonMember("cdbase", self.cdbase) + jsonMember("id", self.id) + ', "object": ',
+            self.object,
+            "}",
+        )
+        return parts
 
+    def _binary(self, out, ids):
+        writeBegin(out, ids, TOKEN_ATTRIBUTION, self.id, self.cdbase)
+        return [
+            bytes([TOKEN_ATTRIBUTEPAIRS]),
+            *(x for pair in self.attributes for x in pair),
+            bytes([TOKEN_ATTRIBUTEPAIRS_END]),
+            self.object,
+            bytes([TOKEN_ATTRIBUTION_END]),
+        ]
@@ -1,5 +1,5 @@
-from copy import deepcopy
-from xml.dom import minidom
+from ..profiling import instrumented, firstArgument
+import io
 import xml.etree.ElementTree as ET
 import json
 
@@ -7,44 +7,145 @@ class OMBase:
     """Base class for OpenMath objects"""
 
     kind = None
-    id = None
-    parent = None
+    __slots__ = ("id", "parent", "_frozen", "_hash", "_bases", "_index")
+    _fields = ()  # names of the attributes of the object, sorted
+    _scalars = ()  # attributes compared and hashed as plain values
+
+    def __init__(self):
+        self.id = None
+        self.parent = None
+        self._frozen = False  # shared, immutable and without parent
+        self._hash = None  # cached structural hash
+        self._bases = None  # hash of the cdbase attributes, cached with _hash
+        self._index = None  # ID index, only in roots
 
     def toDict(self) -> dict:
         """Get a dictionary with the attributes of the math object"""
-        d = self.__dict__
-        return {
-            "kind": self.kind,
-            **{
-                k: d[k].toDict() 
-                    if isOM(d[k]) 
-                    else [x.toDict() if isOM(x) else x for x in d[k]]
-                        if type(d[k]) is not str and hasattr(d[k], "__iter__")
-                        else d[k]
-                for k 
-                in sorted(d.keys()) 
-                if d[k] is not None and k != "parent"
-            },
-        }
-
-    def toJSON(self, *args, **kwargs) -> str:
+        root = {}
+        pending = [(self, root)]
+        while pending:
+            node, d = pending.pop()
+            d["kind"] = node.kind
+            for k in node._fields:
+                value = getattr(node, k)
+                if value is not None:
+                    d[k] = _dictValue(value, pending)
+        return root
+
+    @instrumented("toJSON", firstArgument)
+    def toJSON(self, *args, share=False, **kwargs) -> str:
         """Serialize the object to a JSON string
 
-        All arguments are passed directly to the json.dumps function
+        With share, repeated subtrees are written as references (see shared).
+        All other arguments are passed directly to the json.dumps function,
+        which is recursive: objects too deep for it are written by
+        util.jsonDumps instead, which takes only its options indent,
+        separators, sort_keys, ensure_ascii and allow_nan.
         """
-        return json.dumps(self, default=OMBase.toDict, *args, **kwargs)
+        obj = self._sharedFor(share)
+        if args or kwargs:
+            try:
+                return json.dumps(obj, default=OMBase.toDict, *args, **kwargs)
+            except RecursionError:
+                if args or any(k not in JSON_DUMPS_OPTIONS for k in kwargs):
+                    raise
+            return jsonDumps(obj.toDict(), **kwargs)
+        return "".join(obj._jsonChunks())
+
+    @instrumented("writeJSON", firstArgument)
+    def writeJSON(self, file, encoding="utf-8", share=False):
+        """Write the object to a file in the JSON encoding
+
+        The output is the same as toJSON, but it is written as the tree is
+        walked, without building the dictionaries of toDict. Binary files get
+        the text encoded with encoding.
+
+        Arguments:
+            file -- text or binary file object
+            encoding -- encoding for binary files
+            share -- write repeated subtrees as references (see shared)
+        """
+        if isinstance(file, io.TextIOBase):
+            write = file.write
+        else:
+            write = lambda x: file.write(x.encode(encoding))
+        for chunk in self._sharedFor(share)._jsonChunks():
+            write(chunk)
+
+    def _jsonChunks(self):
+        """Generate the JSON encoding of the object in chunks"""
+        chunk = []
+        pending = [self]
+        while pending:
+            item = pending.pop()
+            if type(item) is not str:
+                item = item._json()
+                if type(item) is not str:
+                    pending.extend(reversed(item))
+                    continue
+            chunk.append(item)
+            if len(chunk) >= 8192:
+                yield "".join(chunk)
+                chunk = []
+        yield "".join(chunk)
+
+    def _json(self):
+        """Get the JSON encoding of this node
+
+        Return either the whole string or a sequence with the strings and the
+        OM children in order, to be encoded later. The members are those of
+        toDict, in the same order.
+        """
+        parts = ['{"kind": "' + self.kind + '"']
+        for k in self._fields:
+            value = getattr(self, k)
+            if value is not None:
+                parts.append(', "' + k + '": ')
+                _jsonValue(value, parts)
+        parts.append("}")
+        return parts
 
     def toElement(self):
         """Return the object as an XML element from the xml.etree module"""
+        root = ET.Element(None)
+        pending = [(root, self)]
+        while pending:
+            container, item = pending.pop()
+            if isOM(item):
+                attrib, text, layout = item._xml()
+                el = ET.SubElement(container, item.kind)
+                for k, v in attrib:
+                    if v is not None:
+                        el.set(k, v)
+                el.text = text
+            elif type(item) is tuple:  # grouping element, such as OMATP
+                el = ET.SubElement(container, item[0])
+                layout = item[1]
+            else:  # foreign element
+                container.append(item)
+                continue
+            pending.extend((el, x) for x in reversed(layout))
+        return root[0]
+
+    def _xml(self):
+        """Get the XML attributes, text and children of this node
+
+        Return the (name, value) pairs of the attributes, with None for the
+        missing ones, the text or None, and the children in document order.
+        Each child is either an OM object, a (tag, children) tuple for a
+        grouping element such as OMATP, or an element to be written as it is.
+        """
         raise NotImplementedError("OpenMath XML encoding for " + self.kind)
 
-    def toXML(self, *args, **kwargs) -> str:
+    @instrumented("toXML", firstArgument)
+    def toXML(self, *args, share=False, **kwargs) -> str:
         """Serialize the object to a XML string
 
-        The arguments can be any of those accepted by either the
-        xml.etree.ElementTree.toString function or minidom.prettyxml
+        With share, repeated subtrees are written as references (see shared),
+        and with indent and newl, the output is pretty printed by writeXML.
+        The other arguments can be any of those accepted by the
+        xml.etree.ElementTree.tostring function.
         """
-        # First get the XML string itself
         tostringaccepted = [  # named args taken by ET.tostring
             "encoding",
             "method",
@@ -52,198 +153,779 @@ class OMBase:
             "default_namespace",
             "short_empty_elements",
         ]
-        tostringkwargs = {k: kwargs[k] for k in kwargs if k in tostringaccepted}
-        root = self.toElement()
-        root.set("xmlns", "http://www.openmath.org/OpenMath")
-        _removeNoneAttrib(root)
-        xmlstr = ET.tostring(root, *args, **tostringkwargs).decode("utf8")
-
-        # Then prettify it, if necessary
-        toprettyaccepted = [  # named args taken by minidom.toprettyxml
-            "indent",
-            "newl",
-            "encoding",
-            "standalone",
-        ]
-        toprettykwargs = {k: kwargs[k] for k in kwargs if k in toprettyaccepted}
-        if any(
-            x in kwargs for x in toprettykwargs if x != "encoding"
-        ):  # because encoding is named arg in common with ET.tostring
-            if type(kwargs.get("indent")) is int:
-                toprettykwargs["indent"] *= " "
-            xmlstr = minidom.parseString(xmlstr).toprettyxml(**toprettykwargs)
-
+        obj = self._sharedFor(share)
+        if args or any(k in tostringaccepted for k in kwargs):
+            root = obj.toElement()
+            root.set("xmlns", "http://www.openmath.org/OpenMath")
+            tostringkwargs = {k: kwargs[k] for k in kwargs if k in tostringaccepted}
+            return ET.tostring(root, *args, **tostringkwargs).decode("utf8")
+
+        out = io.StringIO()
+        obj.writeXML(out, **kwargs)
+        xmlstr = out.getvalue()
+        if not kwargs and not xmlstr.isascii():
+            # as ET.tostring, whose default encoding is us-ascii
+            xmlstr = xmlstr.encode("ascii", "xmlcharrefreplace").decode("ascii")
         return xmlstr
 
+    @instrumented("writeXML", firstArgument)
+    def writeXML(self, file, indent=None, newl="\n", encoding="utf-8", share=False):
+        """Write the object to a file in the XML encoding
+
+        The tree is walked once and written as it goes, without building the
+        elements. Binary files get the text encoded with encoding. With indent,
+        the output is pretty printed with an XML declaration, one element per
+        line and newl after each line. This is the layout of
+        minidom.toprettyxml, but not the same output: attributes keep their
+        order, text is escaped as by ElementTree and the foreign elements of
+        OMFOREIGN are written on one line.
+
+        Arguments:
+            file -- text or binary file object
+            indent -- string or number of spaces to indent each level
+            newl -- end of line of the pretty printed output
+            encoding -- encoding for binary files
+            share -- write repeated subtrees as references (see shared)
+        """
+        if isinstance(file, io.TextIOBase):
+            write = file.write
+        else:
+            write = lambda x: file.write(x.encode(encoding, "xmlcharrefreplace"))
+        if type(indent) is int:
+            indent *= " "
+        if indent is None:  # as ET.tostring
+            indent = newl = ""
+            close = " />"
+        else:  # laid out as minidom.toprettyxml
+            close = "/>"
+            write('<?xml version="1.0" ?>' + newl)
+
+        chunk = []
+        size = 0
+        pending = [(0, self._sharedFor(share))]
+        while pending:
+            depth, item = pending.pop()
+            if type(item) is str:  # end tag
+                line = indent * depth + item + newl
+            elif isOM(item):
+                attrib, text, layout = item._xml()
+                if depth == 0:
+                    attrib = {k: v for k, v in attrib if v is not None}
+                    attrib["xmlns"] = "http://www.openmath.org/OpenMath"
+                    attrib = attrib.items()
+                line = indent * depth + "<" + item.kind + "".join(
+                    " %s=\"%s\"" % (k, _escapeAttrib(v)) for k, v in attrib if v is not None
+                )
+                if layout:
+                    line += ">" + newl
+                    pending.append((depth, "</" + item.kind + ">"))
+                    pending.extend((depth + 1, x) for x in reversed(layout))
+                elif text:
+                    line += ">" + _escapeText(text) + "</" + item.kind + ">" + newl
+                else:
+                    line += close + newl
+            elif type(item) is tuple:  # grouping element, such as OMATP
+                tag, layout = item
+                if layout:
+                    line = indent * depth + "<" + tag + ">" + newl
+                    pending.append((depth, "</" + tag + ">"))
+                    pending.extend((depth + 1, x) for x in reversed(layout))
+                else:
+                    line = indent * depth + "<" + tag + close + newl
+            else:  # foreign element
+                line = indent * depth + ET.tostring(item, encoding="unicode") + newl
+
+            chunk.append(line)
+            size += len(line)
+            if size >= 65536:
+                write("".join(chunk))
+                chunk.clear()
+                size = 0
+        write("".join(chunk))
+
+    @instrumented("toBinary", firstArgument)
+    def toBinary(self, share=False) -> bytes:
+        """Serialize the object to the OpenMath binary encoding
+
+        With share, repeated subtrees are written as references (see shared).
+
+        Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_binary
+        """
+        out = bytearray()
+        ids = {}  # index of every id written, for internal references
+        pending = [self._sharedFor(share)]
+        while pending:
+            item = pending.pop()
+            if type(item) is bytes:  # end tokens
+                out += item
+            else:
+                pending.extend(reversed(item._binary(out, ids)))
+        return bytes(out)
+
+    def _binary(self, out, ids):
+        """Write the tokens of this node that precede its children
+
+        Return the children and the byte strings that follow them, in order.
+        """
+        raise NotImplementedError("OpenMath binary encoding for " + self.kind)
+
+    def iterNodes(self, order="pre"):
+        """Iterate over the object and all its descendants
+
+        Every node is yielded once, even if it is shared by several parents.
+        In pre-order a node comes before its descendants, which are read only
+        after the node is yielded, so it can still be modified. In post-order
+        the descendants come first.
+
+        Arguments:
+            order -- "pre" or "post" (default="pre")
+        """
+        return self._walk(order, {})
+
+    def _walk(self, order, visited):
+        """Implementation of iterNodes
+
+        Arguments:
+            order -- "pre" or "post"
+            visited -- dictionary of the nodes to skip, by id(); the yielded
+                nodes are added to it
+        """
+        if order == "pre":
+            pending = [self]
+            while pending:
+                node = pending.pop()
+                if id(node) in visited:
+                    continue
+                visited[id(node)] = node
+                yield node
+                pending.extend(reversed(node._children()))
+
+        elif order == "post":
+            pending = [(self, False)]
+            while pending:
+                node, expanded = pending.pop()
+                if expanded:
+                    yield node
+                elif id(node) not in visited:
+                    visited[id(node)] = node
+                    pending.append((node, True))
+                    pending.extend((x, False) for x in reversed(node._children()))
+
+        else:
+            raise ValueError("Unknown traversal order: %s" % order)
+
     def apply(self, f, accumulator=None) -> None:
         """Traverse the object tree and apply a function to each node
 
+        The nodes are visited in pre-order, see iterNodes.
+
         Arguments:
             f -- function to be applied
             accumulator -- list of visited nodes (used to prevent cycles)
         """
         if accumulator is None:
-            accumulator = []
-
-        if self in accumulator:
+            for node in self._walk("pre", {}):
+                f(node)
             return
 
-        accumulator.append(self)
-        # First apply to self and then to attributes
-        f(self)
-        d = {**self.__dict__}
-        d["parent"] = None
-
-        for k in list(d.keys())[::-1]:  # reversed keys
-            value = d[k]
-            if isOM(value):  # level of depth 0
-                value.apply(f, accumulator)
-
-            elif type(value) is not str and hasattr(value, "__iter__"):  # level of depth 1
-                for subval in value:
-                    if isOM(subval):
-                        subval.apply(f, accumulator)
-                    elif type(subval) is not str and hasattr(subval, "__iter__"):  # level of depth 2 (for OMATTR)
-                        for subsubval in subval:
-                            if isOM(subsubval):
-                                subsubval.apply(f, accumulator)
+        for node in self._walk("pre", {id(x): x for x in accumulator}):
+            accumulator.append(node)
+            f(node)
+
+    def _children(self):
+        """Get the OM objects directly below this one, in document order"""
+        return ()
+
+    def _changed(self, removed=(), added=()):
+        """Update the cached data after a modification of the object
+
+        Setters must call it after modifying the object. It drops the cached
+        hashes of the object and its ancestors, updates the ID index of the
+        root, if it has been built, and unlinks the removed children, which
+        become roots of their own.
+
+        Arguments:
+            removed -- children detached from the object
+            added -- children attached to the object
+        """
+        # A cached hash implies that all the descendants have one, so the
+        # walk stops at the first ancestor without it
+        node = self
+        while node is not None and node._hash is not None:
+            node._hash = None
+            node = node.parent
+
+        for child in added:
+            child._index = None  # it is not a root anymore
+        kept = {id(x) for x in added}
+        for child in removed:
+            if child.parent is self and id(child) not in kept:
+                child.parent = None
+
+        # The index is dropped, to be built again by getByID, if it is out of
+        # sync, as with ids set directly, or if shared objects are involved
+        root = self.getRoot()
+        index = root._index
+        if index is None:
+            return
+        for child in removed:
+            for node in child._walk("pre", {}):
+                if node.id is not None:
+                    nodes = index.get(node.id, ())
+                    i = next((i for i, x in enumerate(nodes) if x is node), None)
+                    if i is None or node._frozen:
+                        root._index = None
+                        return
+                    del nodes[i]
+                    if len(nodes) == 0:
+                        del index[node.id]
+        for child in added:
+            for node in child._walk("pre", {}):
+                if node.id is not None:
+                    if node._frozen:
+                        root._index = None
+                        return
+                    index.setdefault(node.id, []).append(node)
 
     def getCDBase(self) -> str:
         """Get a valid cdbase attribute from an object or its ancestors"""
-        if "cdbase" not in dir(self) or self.cdbase is None:
-            if self.parent is None:
-                return None
-            return self.parent.getCDBase()
-        return self.cdbase
+        node = self
+        while node is not None:
+            if getattr(node, "cdbase", None) is not None:
+                return node.cdbase
+            node = node.parent
+        return None
 
     def getRoot(self):
         """Get the root object"""
-        if self.parent is None:
-            return self
-        return self.parent.getRoot()
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
 
     def getByID(self, id):
-        """Get an object by its ID"""
-
-        def checkID(object_):
-            if object_.id == id:
-                raise _OMFound(object_)
-            
-        try:
-            self.apply(checkID)
-        except _OMFound as e:
-            return e.object
+        """Get an object by its ID
 
+        The lookup uses the ID index of the root, which is built on the first
+        call and then kept up to date by the setters.
+        """
+        nodes = self._getIndex().get(id)
+        if nodes is None:
+            return None
+        if self._index is not None:  # this is the root
+            return nodes[0]
+
+        # The object must be a descendant of this one
+        for node in nodes:
+            ancestor = node
+            while ancestor is not None and ancestor is not self:
+                ancestor = ancestor.parent
+            if ancestor is self:
+                return node
+
+        # Shared objects don't know their ancestors
+        for node in self._walk("pre", {}):
+            if node.id == id:
+                return node
         return None
 
-    def clone(self):
-        """Return a deep copy of the object."""
-        return deepcopy(self)
+    def getDuplicateIDs(self) -> dict:
+        """Get the IDs used by more than one object in the whole tree
 
-    def dereference(self, derefStack=None):
-        """Resolve all references in the object"""
+        Return a dictionary with the list of objects for each duplicate ID.
+        """
+        return {k: list(v) for k, v in self._getIndex().items() if len(v) > 1}
+
+    def _getIndex(self) -> dict:
+        """Get the ID index of the root, building it if necessary
+
+        The index maps every ID to the list of objects that have it.
+        """
+        root = self.getRoot()
+        if root._index is None:
+            index = {}
+            for node in root._walk("pre", {}):
+                if node.id is not None:
+                    index.setdefault(node.id, []).append(node)
+            root._index = index
+        return root._index
+
+    def clone(self, thaw=False):
+        """Return a deep copy of the object
+
+        Only the object and its descendants are copied: the cdbase inherited
+        from its ancestors is set in the copy. Frozen subtrees are immutable,
+        so they are shared instead of copied, and cloning a frozen object is
+        free. With thaw, they are copied too, and the copy is entirely mutable.
+        """
+        if self._frozen and not thaw:
+            return self
+
+        # Copy the nodes bottom-up, so their children are already copied
+        copies = {}
+        pending = [(self, False)]
+        while pending:
+            node, expanded = pending.pop()
+            if id(node) in copies:
+                continue
+            if not expanded:
+                pending.append((node, True))
+                pending.extend(
+                    (x, False) for x in node._children() if thaw or not x._frozen
+                )
+                continue
+            new = node._copy()
+            new._hash = node._hash
+            new._bases = node._bases
+            children = [copies.get(id(x), x) for x in node._children()]
+            new._setChildren(children)
+            for child in children:
+                setParent(child, new)
+            copies[id(node)] = new
+
+        # Keep the cdbase inherited from the ancestors, which are not copied
+        new = copies[id(self)]
+        if self.parent is not None:
+            new._inheritCDBase(self.parent.getCDBase())
+        return new
+
+    def _inheritCDBase(self, cdbase):
+        """Set the cdbase inherited from removed ancestors where it is missing"""
+        pending = [self] if cdbase is not None else []
+        while pending:
+            node = pending.pop()
+            if node._frozen:
+                continue
+            if "cdbase" not in node._fields:
+                pending.extend(node._children())
+            elif node.cdbase is None:
+                node.cdbase = cdbase
+                node._changed()  # the cached _bases of the copies
+
+    def freeze(self):
+        """Make the object and its descendants immutable
+
+        Frozen objects can be shared by many trees, so they keep no parent,
+        and they are never copied by clone. Their setters raise
+        AttributeError. Use a Cursor to navigate them with their context and
+        to derive modified trees. Return the object itself.
+        """
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            if not node._frozen:
+                node._frozen = True
+                node.parent = None
+                pending.extend(node._children())
+        return self
+
+    def _assertMutable(self):
+        if self._frozen:
+            raise AttributeError("Frozen %s objects can't be modified" % self.kind)
+
+    def _copy(self):
+        """Get a mutable copy of this node alone, which shares the children"""
+        new = object.__new__(type(self))
+        OMBase.__init__(new)
+        for k in self._fields:
+            setattr(new, k, getattr(self, k))
+        return new
+
+    @classmethod
+    def _make(cls, **fields):
+        """Build an object from the values of its fields, without checking them
+
+        It is the trusted constructor of the parsers, which already check the
+        structure of the input: the fields must have the types that the
+        public constructor expects, and the sequences must be tuples. The
+        children are linked to the new object. See verify.
+        """
+        new = object.__new__(cls)
+        OMBase.__init__(new)
+        for k in cls._fields:
+            setattr(new, k, fields.get(k))
+        for child in new._children():
+            if not child._frozen:
+                child.parent = new
+        return new
+
+    def verify(self):
+        """Check the fields of the object and its descendants
+
+        The objects built with _make skip the checks of the public
+        constructors. This makes them all in a single pass, raising the same
+        TypeError or ValueError. Return the object itself.
+        """
+        for node in self._walk("pre", {}):
+            node._verify()
+        return self
+
+    def _verify(self):
+        """Check the fields of this node alone, as its constructor does"""
+        assertType(self.id, (str, type(None)))
+
+    def _setChildren(self, children):
+        """Set the children from a sequence in the order of _children
+
+        It doesn't check nor link them, and it doesn't update the caches.
+        """
+        pass
+
+    def _withChild(self, index, child):
+        """Get a frozen copy of this node with one child replaced"""
+        children = list(self._children())
+        children[index] = child
+        new = self._copy()
+        new._setChildren(children)
+        new._frozen = True
+        return new
+
+    @instrumented("dereference", firstArgument)
+    def dereference(self, derefStack=None, cache=None, workers=None):
+        """Resolve all references in the object
+
+        With workers, the external documents are fetched concurrently before
+        splicing the targets, instead of one after another, and they are not
+        revalidated again during the walk (see DocumentCache.walk).
+
+        Arguments:
+            derefStack -- hrefs being resolved, to detect cycles
+            cache -- DocumentCache for external documents
+            workers -- maximum number of simultaneous fetches
+        """
         if derefStack is None:
             derefStack = []
 
-        def singleDereference(object_):
-            if object_.kind != "OMR":
-                return
-            href = object_.href
+        if workers is not None:
+            if cache is None:
+                from ..cache import documentCache as cache
+            with cache.walk():
+                self._dereference(derefStack, cache, workers)
+        else:
+            self._dereference(derefStack, cache, workers)
+
+    def _dereference(self, derefStack, cache, workers):
+        # Collect them first, as resolving them modifies the tree
+        references = [x for x in self._walk("pre", {}) if x.kind == "OMR"]
+        if workers is not None:
+            urls = [x.href.split("#")[0] for x in references if x.parent is not None]
+            cache.prefetch([x for x in urls if x != ""], workers)
+        for reference in references:
+            if reference.parent is None:
+                continue  # nothing to replace, and the target may be shared
+            href = reference.href
             if href in derefStack:
                 raise RuntimeError(
                     "Cycle reference: " + " > ".join(derefStack) + " > " + href
                 )
-            target = object_.resolve()
+            target = reference.resolve(cache)
             derefStack.append(href)
-            target.dereference(derefStack)
+            target.dereference(derefStack, cache, workers)
             derefStack.pop()
 
-        self.apply(singleDereference)
+    def shared(self, minSize=4):
+        """Return a copy where repeated subtrees are replaced by references
+
+        The subtrees with at least minSize nodes that appear more than once
+        are kept only the first time, in document order, with an id, and
+        their other occurrences become references to it. This is the inverse
+        of dereference.
+
+        Arguments:
+            minSize -- minimum number of nodes of the shared subtrees
+        """
+        obj = self.clone(thaw=True)
+        sizes = {}
+        for node in obj._walk("post", {}):
+            sizes[id(node)] = 1 + sum(sizes[id(x)] for x in node._children())
+
+        first = {}  # first occurrence of every subtree
+        repeated = []  # (occurrence, first occurrence) pairs
+        pending = [obj]
+        while pending:
+            node = pending.pop()
+            if (
+                sizes[id(node)] >= minSize
+                and node.parent is not None
+                and node.kind not in _UNSHARED
+                and not (
+                    node.parent.kind == "OMBIND"
+                    and any(x is node for x in node.parent.variables)
+                )
+            ):
+                original = first.setdefault(node, node)
+                if original is not node:
+                    repeated.append((node, original))
+                    continue
+            pending.extend(reversed(node._children()))
+        if not repeated:
+            return obj
+
+        from .omreference import OMReference
+
+        used = set(obj._getIndex())
+        counter = 0
+        for node, original in repeated:
+            if original.id is None:
+                counter += 1
+                while "s%d" % counter in used:
+                    counter += 1
+                original.id = "s%d" % counter
+                original._changed()
+            node.parent._replace(node, OMReference("#" + original.id))
+        obj._index = None  # ids were assigned behind its back
+        return obj
+
+    def _sharedFor(self, share):
+        """Apply the share option of the writers
+
+        It can be False, True for the default minimum size, or the minimum size.
+        """
+        if share is False or share is None:
+            return self
+        if share is True:
+            return self.shared()
+        return self.shared(share)
 
-    def _replace(self, obj1, obj2) -> None:
+    def _replace(self, obj1, obj2) -> list:
         """Replace the instances of an object with another one
 
-        Identical instances are replaced, not equivalent ones
+        Identical instances are replaced, not equivalent ones. Return the
+        copies of obj2 that were inserted.
 
         Arguments:
         obj1 -- object to be replaced
         obj2 -- object to replace
         """
-        d = self.__dict__
-        for k in d:
-            if obj1 is d[k]:  # depth level 1
-                d[k] = obj2.clone()
-                d[k].parent = self
-            elif type(d[k]) is tuple:  # depth level 1
-                attr = list(d[k])
-                for i, elem in enumerate(attr):
-                    if obj1 is elem:
-                        attr[i] = obj2.clone()
-                        attr[i].parent = self
-                    elif type(elem) is tuple:  # depth level 2 (for OMATTR)
-                        elem = tuple(
-                            obj2.clone() if subelem is obj1 else subelem
-                            for subelem in elem
-                        )
-                d[k] = tuple(attr)
+        self._assertMutable()
+        inserted = []
+        removed = []
+
+        def replacement(value):
+            if value is not obj1:
+                return value
+            removed.append(value)
+            value = obj2.clone()
+            setParent(value, self)
+            inserted.append(value)
+            return value
+
+        for k in self._fields:
+            value = getattr(self, k)
+            if value is obj1:  # depth level 1
+                setattr(self, k, replacement(value))
+            elif type(value) is tuple:  # depth level 1
+                setattr(self, k, tuple(
+                    tuple(replacement(x) for x in elem)  # depth level 2 (for OMATTR)
+                    if type(elem) is tuple
+                    else replacement(elem)
+                    for elem in value
+                ))
+        self._changed(removed, inserted)
+        return inserted
 
     def __contains__(self, item) -> bool:
-        def checkItem(object_):
-            if object_ == item:
-                raise _OMFound(object_)
-
-        try:
-            self.apply(checkItem)
-        except _OMFound as e:
-            return True
-
-        return False
+        if not isOM(item):
+            return False
+        # Equal objects have equal hashes, which are computed only once
+        h = hash(item)
+        return any(
+            hash(node) == h and node == item for node in self._walk("pre", {})
+        )
 
     def __eq__(self, other) -> bool:
-        """Return true if all attributes are present and equal in both instances"""
+        """Return true if both objects have the same structure and values
+
+        The cdbase attributes are not compared as such: instead, every pair of
+        symbols must have the same effective cdbase.
+        """
+        if self is other:
+            return True
         # The object must be OM
         if not isOM(other):
             return False
+        context = lambda x: x.parent.getCDBase() if x.parent is not None else None
+        return self._equal(other, context(self), context(other))
+
+    def _equal(self, other, cdbaseA, cdbaseB) -> bool:
+        """Compare two objects in the context of the given inherited cdbases"""
+        pending = [(self, other, cdbaseA, cdbaseB)]
+        while pending:
+            a, b, cdbaseA, cdbaseB = pending.pop()
+            if a is b and cdbaseA == cdbaseB:
+                continue
+            if a.kind != b.kind:
+                return False
+            if a._hash is not None and b._hash is not None and a._hash != b._hash:
+                return False
+            for k in a._scalars:
+                if getattr(a, k) != getattr(b, k):
+                    return False
+
+            # The cdbase is inherited from the ancestors
+            if getattr(a, "cdbase", None) is not None:
+                cdbaseA = a.cdbase
+            if getattr(b, "cdbase", None) is not None:
+                cdbaseB = b.cdbase
+            if a.kind == "OMS" and cdbaseA != cdbaseB:
+                return False
+
+            childrenA = a._children()
+            childrenB = b._children()
+            if len(childrenA) != len(childrenB):
+                return False
+            pending.extend(
+                (x, y, cdbaseA, cdbaseB) for x, y in zip(childrenA, childrenB)
+            )
 
-        a = self.toDict()
-        b = other.toDict()
-        allkeys = set([*a, *b])
+        return True
 
-        # The cdbase must be the same
-        if "cdbase" in allkeys:
-            allkeys.remove("cdbase")
-        if self.getCDBase() != self.getCDBase():
-            return False
+    def __hash__(self):
+        """Get a hash of the structure and values of the object
 
-        def compare(x, y):
-            """Compare a single value that may be a list"""
-            ret = None
-            if hasattr(x, "__iter__") and hasattr(y, "__iter__"):
-                ret = len(x) == len(y) and all(
-                    compare(x[i], y[i]) for i in range(len(x))
-                )
-            else:
-                ret = x == y
-            return ret
-
-        return all(compare(a.get(k), b.get(k)) for k in allkeys)
+        The hash is cached in every node, until a setter modifies the node or
+        its descendants. The cdbase attributes are not part of it, as equal
+        objects can place them differently: they are hashed apart, in
+        _bases, which is None if there are none in the object.
+        """
+        pending = [self]
+        while self._hash is None:
+            node = pending[-1]
+            children = node._children()
+            missing = [x for x in children if x._hash is None]
+            if missing:  # hash the children first
+                pending.extend(missing)
+                continue
+
+            pending.pop()
+            node._hashNode(children)
+        return self._hash
+
+    def _hashNode(self, children):
+        """Cache the hash of this node, from those of its children"""
+        bases = (getattr(self, "cdbase", None), *[x._bases for x in children])
+        self._bases = hash(bases) if bases.count(None) < len(bases) else None
+        scalars = [getattr(self, k) for k in self._scalars]
+        try:
+            self._hash = hash((self.kind, *scalars, *[x._hash for x in children]))
+        except TypeError:  # such as the foreign objects
+            scalars = [
+                x if getattr(type(x), "__hash__", None) else type(x).__name__
+                for x in scalars
+            ]
+            self._hash = hash((self.kind, *scalars, *[x._hash for x in children]))
 
     def __repr__(self):
-        return "%s(%s)" % (
-            self.__class__.__name__,
-            " ".join(
-                "=".join(str(x) for x in kv)
-                for kv in self.__dict__.items()
-                if kv[1] is not None
-            ),
-        )
+        return self._describe(True)
 
     def __str__(self):
-        return "%s(%s)" % (
-            self.__class__.__name__,
-            " ".join(
-                "=".join(str(x) for x in kv)
-                for kv in self.__dict__.items()
-                if kv[1] is not None and kv[0] != "parent"
-            )
-        )
+        return self._describe(False)
+
+    def _describe(self, withParent):
+        """Write the class and the fields of the object and its descendants
+
+        Only the object itself shows its parent, with withParent. The tree
+        is walked with an explicit stack, so there is no limit on its depth.
+        """
+        parts = []
+        pending = [self]
+        while pending:
+            item = pending.pop()
+            if type(item) is _Text:
+                parts.append(item)
+            elif isOM(item):
+                fields = [(k, getattr(item, k)) for k in item._fields]
+                if withParent:
+                    fields.append(("parent", item.parent))
+                    withParent = False
+                layout = [_Text(item.__class__.__name__ + "(")]
+                for k, v in fields:
+                    if v is not None:
+                        layout += (_Text((" " if len(layout) > 1 else "") + k + "="), v)
+                layout.append(_Text(")"))
+                pending.extend(reversed(layout))
+            elif type(item) is tuple:
+                layout = [_Text("(")]
+                for i, x in enumerate(item):
+                    layout += (_Text(", ") if i else _Text(""), x)
+                layout.append(_Text(",)" if len(item) == 1 else ")"))
+                pending.extend(reversed(layout))
+            else:
+                parts.append(str(item))
+        return "".join(parts)
+
+
+class _Text(str):
+    """Text already written by OMBase._describe"""
+
+
+def _dictValue(value, pending):
+    """Convert an attribute value for toDict
+
+    OM objects are replaced by empty dictionaries that are queued in pending
+    to be filled later, and sequences are converted to lists.
+    """
+    if isOM(value):
+        d = {}
+        pending.append((value, d))
+        return d
+    if type(value) in (tuple, list, bytes):
+        return [_dictValue(x, pending) for x in value]
+    return value
+
+
+def _jsonValue(value, parts):
+    """Append the JSON encoding of an attribute value to parts
+
+    OM objects are appended as they are, to be encoded later, as in toDict.
+    """
+    kind = type(value)
+    if kind is str:
+        parts.append(jsonString(value))
+    elif kind is int:
+        parts.append(int.__repr__(value))
+    elif kind is float:
+        parts.append(jsonFloat(value))
+    elif kind is bytes:
+        parts.append("[" + ", ".join(map(str, value)) + "]")
+    elif kind is tuple or kind is list:
+        parts.append("[")
+        for i, x in enumerate(value):
+            if i:
+                parts.append(", ")
+            _jsonValue(x, parts)
+        parts.append("]")
+    elif isOM(value):
+        parts.append(value)
+    else:
+        parts.append(json.dumps(value, default=OMBase.toDict))
+
+def _escapeText(text):
+    """Escape the character data of an XML element"""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def _escapeAttrib(text):
+    """Escape the value of an XML attribute"""
+    text = _escapeText(text)
+    if '"' in text:
+        text = text.replace('"', "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+
+_UNSHARED = ("OMS", "OMV", "OMR")  # kinds that are never replaced by references
+
+
+# imported at the end to avoid the circular dependency with the util module
+from ..util import JSON_DUMPS_OPTIONS, assertType, isOM, jsonDumps, jsonFloat, jsonString, setParent
@@ -1,6 +1,12 @@
 from .ombase import OMBase
-from ..util import setattrType, setattrOM, assertOM
-import xml.etree.ElementTree as ET
+from ..util import assertOM, jsonMember, setParent, setattrOM, setattrType, valueAssert, assertType
+from ..binary import (
+    writeBegin,
+    TOKEN_BINDING,
+    TOKEN_BINDING_END,
+    TOKEN_VARIABLES,
+    TOKEN_VARIABLES_END,
+)
 
 class OMBinding(OMBase):
     """Implementation of the OMBinding object
@@ -10,16 +16,17 @@ class OMBinding(OMBase):
 
     kind = "OMBIND"
     __match_args__ = ("binder", "variables", "object")
+    __slots__ = ("cdbase", "binder", "variables", "object")
+    _fields = ("binder", "cdbase", "id", "object", "variables")
+    _scalars = ("id",)
 
     def __init__(self, binder, variables, object_, cdbase=None, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "cdbase", cdbase, (str, type(None)))
         self.setObject(object_)
         self.setBinder(binder)
         self.setVariables(variables)
-        self.variables = variables
-        for v in self.variables:
-            v.parent = self
 
     def setObject(self, object_):
         setattrOM(self, "object", object_)
@@ -28,25 +35,66 @@ class OMBinding(OMBase):
         setattrOM(self, "binder", binder)
 
     def setVariables(self, variables):
+        self._assertMutable()
         for v in variables:
             assertOM(v, ["OMV", "OMATTR"])
             if v.kind == "OMATTR":
-                _valueAssert(
+                valueAssert(
                     v.object.kind == "OMV",
                     "Attributed variable binding must be a variable",
                 )
-            v.parent = self
+            setParent(v, self)
+        old = getattr(self, "variables", ())
         self.variables = tuple(variables)
+        self._changed(old, self.variables)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("cdbase", self.__dict__.get("cdbase"))
-        el.append(self.binder.toElement())
-        variables = ET.Element("OMBVAR")
+    def _verify(self):
+        super()._verify()
+        assertType(self.cdbase, (str, type(None)))
+        assertOM(self.binder)
+        assertOM(self.object)
         for v in self.variables:
-            variables.append(v.toElement())
-        el.append(variables)
-        el.append(self.object.toElement())
+            assertOM(v, ["OMV", "OMATTR"])
+            if v.kind == "OMATTR":
+                valueAssert(
+                    v.object.kind == "OMV",
+                    "Attributed variable binding must be a variable",
+                )
+
+    def _children(self):
+        return (self.binder, *self.variables, self.object)
+
+    def _setChildren(self, children):
+        self.binder = children[0]
+        self.variables = tuple(children[1:-1])
+        self.object = children[-1]
+
+    def _xml(self):
+        attrib = (("id", self.id), ("cdbase", self.cdbase))
+        return attrib, None, (self.binder, ("OMBVAR", self.variables), self.object)
+
+    def _json(self):
+        parts = [
+            '{"kind": "OMBIND", "binder": ',
+            self.binder,
+            jsonMember("cdbase", self.cdbase) + jsonMember("id", self.id) + ', "object": ',
+            self.object,
+            ', "variables": [',
+        ]
+        for i, x in enumerate(self.variables):
+            if i:
+                parts.append(", ")
+            parts.append(x)
+        parts.append("]}")
+        return parts
 
-        return el
+    def _binary(self, out, ids):
+        writeBegin(out, ids, TOKEN_BINDING, self.id, self.cdbase)
+        return [
+            self.binder,
+            bytes([TOKEN_VARIABLES]),
+            *self.variables,
+            bytes([TOKEN_VARIABLES_END]),
+            self.object,
+            bytes([TOKEN_BINDING_END]),
+        ]
@@ -1,7 +1,7 @@
 from .ombase import OMBase
-from ..util import setattrType
+from ..util import setattrType, assertType
+from ..binary import writeToken, TOKEN_BYTEARRAY
 from base64 import b64encode
-import xml.etree.ElementTree as ET
 
 class OMBytearray(OMBase):
     """Implementation of the OMBytearray object
@@ -11,13 +11,22 @@ class OMBytearray(OMBase):
 
     kind = "OMB"
     __match_args__ = ("bytes",)
+    __slots__ = ("bytes",)
+    _fields = ("bytes", "id")
+    _scalars = ("bytes", "id")
 
     def __init__(self, bytes_: list, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         self.bytes = bytes(bytes_)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.text = b64encode(self.bytes).decode("ascii")
+    def _verify(self):
+        super()._verify()
+        assertType(self.bytes, (bytes,))
 
+    def _xml(self):
+        return (("id", self.id),), b64encode(self.bytes).decode("ascii"), ()
+
+    def _binary(self, out, ids):
+        writeToken(out, ids, TOKEN_BYTEARRAY, (self.bytes,), self.id)
+        return ()
@@ -1,6 +1,6 @@
 from .ombase import OMBase
-from ..util import setattrType, setattrOM
-import xml.etree.ElementTree as ET
+from ..util import setattrType, setattrOM, assertOM, setParent
+from ..binary import writeBegin, TOKEN_ERROR, TOKEN_ERROR_END
 
 class OMError(OMBase):
     """Implementation of the OMError object
@@ -10,8 +10,12 @@ class OMError(OMBase):
 
     kind = "OME"
     __match_args__ = ("error", "arguments")
+    __slots__ = ("error", "arguments")
+    _fields = ("arguments", "error", "id")
+    _scalars = ("id",)
 
     def __init__(self, error, arguments, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         self.setError(error)
         self.setArguments(arguments)
@@ -20,15 +24,30 @@ class OMError(OMBase):
         setattrOM(self, "error", error, "OMS")
 
     def setArguments(self, arguments):
+        self._assertMutable()
         for arg in arguments:
             assertOM(arg)
-            arg.parent = self
+            setParent(arg, self)
+        old = getattr(self, "arguments", ())
         self.arguments = tuple(arguments)
+        self._changed(old, self.arguments)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.append(self.error.toElement())
-        for a in self.arguments:
-            el.append(a.toElement())
-        return el
+    def _verify(self):
+        super()._verify()
+        assertOM(self.error, "OMS")
+        for arg in self.arguments:
+            assertOM(arg)
+
+    def _children(self):
+        return (self.error, *self.arguments)
+
+    def _setChildren(self, children):
+        self.error = children[0]
+        self.arguments = tuple(children[1:])
+
+    def _xml(self):
+        return (("id", self.id),), None, (self.error, *self.arguments)
+
+    def _binary(self, out, ids):
+        writeBegin(out, ids, TOKEN_ERROR, self.id)
+        return [self.error, *self.arguments, bytes([TOKEN_ERROR_END])]
@@ -1,6 +1,7 @@
 from .ombase import OMBase
-from ..util import setattrType
-import xml.etree.ElementTree as ET
+from ..util import jsonFloat, jsonMember, setattrType, assertType
+from ..binary import writeFixed, TOKEN_FLOAT
+from struct import pack
 
 class OMFloat(OMBase):
     """Implementation of the OMFloat object
@@ -10,13 +11,25 @@ class OMFloat(OMBase):
 
     kind = "OMF"
     __match_args__ = ("float",)
+    __slots__ = ("float",)
+    _fields = ("float", "id")
+    _scalars = ("float", "id")
 
     def __init__(self, float_: float, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "float", float_, float)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.text = str(self.float)
-        return el
+    def _verify(self):
+        super()._verify()
+        assertType(self.float, (float,))
+
+    def _xml(self):
+        return (("id", self.id), ("dec", repr(self.float))), None, ()
+
+    def _json(self):
+        return '{"kind": "OMF", "float": ' + jsonFloat(self.float) + jsonMember("id", self.id) + "}"
+
+    def _binary(self, out, ids):
+        writeFixed(out, ids, TOKEN_FLOAT, pack(">d", self.float), self.id)
+        return ()
@@ -1,7 +1,9 @@
 from .ombase import OMBase
-from ..util import setattrType
+from ..util import setattrType, valueAssert, assertType
+from ..binary import writeToken, TOKEN_FOREIGN
 import xml.etree.ElementTree as ET
 import json
+from copy import deepcopy
 
 class OMForeign(OMBase):
     """Implementation of OMFOREIGN objects
@@ -11,20 +13,42 @@ class OMForeign(OMBase):
 
     kind = "OMFOREIGN"
     __match_args__ = ("foreign", "encoding")
+    __slots__ = ("foreign", "encoding")
+    _fields = ("encoding", "foreign", "id")
+    _scalars = ("encoding", "foreign", "id")
 
     def __init__(self, foreign, encoding=None, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "encoding", encoding, (str, type(None)))
-        _valueAssert(foreign is not None, "Foreign object can't be None")
+        valueAssert(foreign is not None, "Foreign object can't be None")
+        self.foreign = foreign
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("encoding", self.__dict__.get("encoding"))
+    def _copy(self):
+        new = super()._copy()
+        new.foreign = deepcopy(self.foreign)  # it may be a mutable element
+        return new
+
+    def _verify(self):
+        super()._verify()
+        assertType(self.encoding, (str, type(None)))
+        valueAssert(self.foreign is not None, "Foreign object can't be None")
+
+    def _xml(self):
+        attrib = (("id", self.id), ("encoding", self.encoding))
+        if isinstance(self.foreign, ET.Element):
+            return attrib, None, (self.foreign,)
+        elif type(self.foreign) is dict:
+            return attrib, json.dumps(self.foreign), ()
+        return attrib, str(self.foreign), ()
+
+    def _binary(self, out, ids):
         if isinstance(self.foreign, ET.Element):
-            el.append(self.foreign)
+            foreign = ET.tostring(self.foreign)
         elif type(self.foreign) is dict:
-            el.text = json.dumps(self.foreign)
+            foreign = json.dumps(self.foreign).encode("utf8")
         else:
-            el.text = str(self.foreign)
-        return el
+            foreign = str(self.foreign).encode("utf8")
+        encoding = (self.encoding or "").encode("utf8")
+        writeToken(out, ids, TOKEN_FOREIGN, (encoding, foreign), self.id)
+        return ()
@@ -1,6 +1,6 @@
 from .ombase import OMBase
-from ..util import setattrType
-import xml.etree.ElementTree as ET
+from ..util import jsonMember, setattrType, assertType
+from ..binary import writeInteger
 
 class OMInteger(OMBase):
     """Implementation of the OMInteger object
@@ -10,14 +10,25 @@ class OMInteger(OMBase):
 
     kind = "OMI"
     __match_args__ = ("integer",)
+    __slots__ = ("integer",)
+    _fields = ("id", "integer")
+    _scalars = ("id", "integer")
 
     def __init__(self, integer: int, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "integer", integer, int)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.text = str(self.integer)
-        return el
+    def _verify(self):
+        super()._verify()
+        assertType(self.integer, (int,))
 
+    def _xml(self):
+        return (("id", self.id),), str(self.integer), ()
+
+    def _json(self):
+        return '{"kind": "OMI"' + jsonMember("id", self.id) + ', "integer": ' + int.__repr__(self.integer) + "}"
+
+    def _binary(self, out, ids):
+        writeInteger(out, ids, self.integer, self.id)
+        return ()
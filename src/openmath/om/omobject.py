@@ -1,6 +1,6 @@
 from .ombase import OMBase
-from ..util import setattrType, setattrOM
-import xml.etree.ElementTree as ET
+from ..util import setattrOM, assertOM, assertType
+from ..binary import writeToken, TOKEN_CDBASE, TOKEN_OBJECT, TOKEN_OBJECT_END, FLAG_ID
 
 class OMObject(OMBase):
     """Implementation of the OpenMath object constructor OMOBJ
@@ -12,27 +12,56 @@ class OMObject(OMBase):
         xmlns -- XML namespace, usually "http://www.openmath.org/OpenMath"
         version -- OpenMath version (default="2.0")
         cdbase -- Base CD URI (default=None)
+        id -- Identifier of the object (default=None)
     """
 
     kind = "OMOBJ"
     __match_args__ = ("object",)
+    __slots__ = ("xmlns", "version", "cdbase", "object")
+    _fields = ("cdbase", "id", "object", "version", "xmlns")
+    _scalars = ("id", "version", "xmlns")
 
     def __init__(self, object_, **kwargs):
+        super().__init__()
         self.xmlns = None
         self.version = "2.0"
         self.cdbase = None
-        self.__dict__.update(kwargs)
+        for k in kwargs:
+            if k == "object" or k not in self._fields:
+                raise TypeError("OMObject got an unexpected keyword argument " + k)
+            setattr(self, k, kwargs[k])
         self.setObject(object_)
 
     def setObject(self, object_):
         setattrOM(self, "object", object_)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("xmlns", self.__dict__.get("xmlns"))
-        el.set("version", self.__dict__.get("version"))
-        el.set("cdbase", self.__dict__.get("cdbase"))
-        el.set("id", self.__dict__.get("id"))
-        el.append(self.object.toElement())
-        return el
+    def _verify(self):
+        super()._verify()
+        for k in ("xmlns", "version", "cdbase"):
+            assertType(getattr(self, k), (str, type(None)))
+        assertOM(self.object)
 
+    def _children(self):
+        return (self.object,)
+
+    def _setChildren(self, children):
+        self.object = children[0]
+
+    def _xml(self):
+        attrib = (
+            ("xmlns", self.xmlns),
+            ("version", self.version),
+            ("cdbase", self.cdbase),
+            ("id", self.id),
+        )
+        return attrib, None, (self.object,)
+
+    def _binary(self, out, ids):
+        if self.cdbase is not None:
+            writeToken(out, ids, TOKEN_CDBASE, (self.cdbase.encode("utf8"),))
+        version = (self.version or "").split(".")
+        if len(version) == 2 and all(x.isdigit() and int(x) < 256 for x in version):
+            out += bytes([TOKEN_OBJECT | FLAG_ID, *(int(x) for x in version)])
+        else:
+            out.append(TOKEN_OBJECT)
+        return [self.object, bytes([TOKEN_OBJECT_END])]
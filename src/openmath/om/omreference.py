@@ -1,8 +1,9 @@
 
 from .ombase import OMBase
-from ..util import setattrType
-import xml.etree.ElementTree as ET
-import urllib.request, urllib.error
+from ..util import setattrType, assertType
+from ..profiling import instrumented
+from ..binary import writeToken, TOKEN_REFERENCE_INTERNAL, TOKEN_REFERENCE_EXTERNAL, FLAG_LONG
+from struct import pack
 
 class OMReference(OMBase):
     """Implementation of references for structure sharing
@@ -11,63 +12,73 @@ class OMReference(OMBase):
     """
 
     kind = "OMR"
+    __slots__ = ("href",)
+    _fields = ("href", "id")
+    _scalars = ("href", "id")
 
     def __init__(self, href, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "href", href, str)
 
-    def resolve(self):
+    @instrumented("resolve")
+    def resolve(self, cache=None):
+        """Resolve the reference, replacing it with a copy of its target
+
+        External documents are read through a DocumentCache, the shared one
+        by default, which keeps them frozen: the targets of references without
+        parent are returned as they are, and the others are spliced as
+        mutable copies.
+
+        Arguments:
+            cache -- DocumentCache for external documents
+        """
         # Decompose URI into URL and ID
         target = None
         uri = self.href.split("#")
         url = uri[0]
         id = uri[1] if len(uri) == 2 else None
 
-        # Get the whole mathematical object first
+        # Get the sub-object by ID in the whole mathematical object
         if url == "":  # relative reference
             target = self.getRoot()
             if target is None:
                 raise RuntimeError("Could not resolve " + self.href)
-
+            if id:
+                target = target.getByID(id)
+            cdbase = None
         else:  # external reference
-            objectStr = None
-
-            if url.startswith("http"):  # remote reference
-                try:
-                    with urllib.request.open(url) as urlh:
-                        objectStr = urlh.read()
-                except urllib.error.URLError as e:
-                    raise RuntimeError("Could not resolve %s (%s)" % (self.href, e))
-
-            else:  # local reference
-                try:
-                    with open(url, "r") as fh:
-                        objectStr = fh.read()
-                except (FileNotFoundError, IsADirectoryError) as e:
-                    raise RuntimeError("Could not resolve %s (%s)" % (self.href, e))
-
-            if url.endswith(".om") or url.endswith(".xml"):
-                target = parseXML(objectStr)
-            elif url.endswith(".json"):
-                target = parseJSON(objectStr)
-            else:
-                target = parse(objectStr)
-
-        # Now, with the mathematical object, get the sub-object by ID
-        if id:
-            target = target.getByID(id)
-            if target is None:
-                raise RuntimeError("Could not resolve ID " + id)
+            target, cdbase = (documentCache if cache is None else cache).getTarget(url, id)
+        if target is None:
+            raise RuntimeError("Could not resolve ID " + id)
 
         # Finally, resolve it and return it
         if self.parent is not None:
-            self.parent._replace(self, target)
+            if target._frozen:  # shared by the cache
+                target = target.clone(thaw=True)
+                target._inheritCDBase(cdbase)
+            inserted = self.parent._replace(self, target)
+            if inserted:
+                target = inserted[0]
 
         return target
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("href", self.href)
-        return el
-
+    def _verify(self):
+        super()._verify()
+        assertType(self.href, (str,))
+
+    def _xml(self):
+        return (("id", self.id), ("href", self.href)), None, ()
+
+    def _binary(self, out, ids):
+        index = ids.get(self.href[1:].encode("utf8")) if self.href[:1] == "#" else None
+        if index is None or self.id is not None:
+            writeToken(out, ids, TOKEN_REFERENCE_EXTERNAL, (self.href.encode("utf8"),), self.id)
+        elif index < 256:
+            out += bytes([TOKEN_REFERENCE_INTERNAL, index])
+        else:
+            out.append(TOKEN_REFERENCE_INTERNAL | FLAG_LONG)
+            out += pack(">I", index)
+        return ()
+
+from ..cache import documentCache
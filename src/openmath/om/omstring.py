@@ -1,6 +1,6 @@
 from .ombase import OMBase
-from ..util import setattrType
-import xml.etree.ElementTree as ET
+from ..util import jsonMember, jsonString, setattrType, assertType
+from ..binary import writeToken, TOKEN_STRING, TOKEN_STRING_UTF16
 
 class OMString(OMBase):
     """Implementation of the OMString object
@@ -10,14 +10,28 @@ class OMString(OMBase):
 
     kind = "OMSTR"
     __match_args__ = ("string",)
+    __slots__ = ("string",)
+    _fields = ("id", "string")
+    _scalars = ("id", "string")
 
     def __init__(self, string, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "string", string, str)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.text = self.string
-        return el
+    def _verify(self):
+        super()._verify()
+        assertType(self.string, (str,))
 
+    def _xml(self):
+        return (("id", self.id),), self.string, ()
+
+    def _json(self):
+        return '{"kind": "OMSTR"' + jsonMember("id", self.id) + ', "string": ' + jsonString(self.string) + "}"
+
+    def _binary(self, out, ids):
+        try:
+            writeToken(out, ids, TOKEN_STRING, (self.string.encode("latin1"),), self.id)
+        except UnicodeEncodeError:
+            writeToken(out, ids, TOKEN_STRING_UTF16, (self.string.encode("utf-16-be"),), self.id)
+        return ()
@@ -1,6 +1,6 @@
 from .ombase import OMBase
-from ..util import setattrType
-import xml.etree.ElementTree as ET
+from ..util import jsonMember, jsonString, setattrType, assertType
+from ..binary import writeToken, TOKEN_CDBASE, TOKEN_SYMBOL
 
 class OMSymbol(OMBase):
     """Implementation of the OMSymbol object
@@ -10,18 +10,38 @@ class OMSymbol(OMBase):
 
     kind = "OMS"
     __match_args__ = ("name", "cd")
+    __slots__ = ("cdbase", "cd", "name", "__weakref__")  # weakly interned, see internOM
+    _fields = ("cd", "cdbase", "id", "name")
+    _scalars = ("cd", "id", "name")
 
     def __init__(self, name: str, cd: str, cdbase=None, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "cdbase", cdbase, (str, type(None)))
         setattrType(self, "cd", cd, str)
         setattrType(self, "name", name, str)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("name", self.name)
-        el.set("cd", self.cd)
+    def _verify(self):
+        super()._verify()
+        assertType(self.cdbase, (str, type(None)))
+        assertType(self.cd, (str,))
+        assertType(self.name, (str,))
+
+    def _xml(self):
+        attrib = (("id", self.id), ("name", self.name), ("cd", self.cd), ("cdbase", self.cdbase))
+        return attrib, None, ()
+
+    def _json(self):
+        return (
+            '{"kind": "OMS", "cd": ' + jsonString(self.cd)
+            + jsonMember("cdbase", self.cdbase)
+            + jsonMember("id", self.id)
+            + ', "name": ' + jsonString(self.name) + "}"
+        )
+
+    def _binary(self, out, ids):
         if self.cdbase is not None:
-            el.set("cdbase", self.cdbase)
-        return el
+            writeToken(out, ids, TOKEN_CDBASE, (self.cdbase.encode("utf8"),))
+        fields = (self.cd.encode("utf8"), self.name.encode("utf8"))
+        writeToken(out, ids, TOKEN_SYMBOL, fields, self.id)
+        return ()
@@ -1,6 +1,6 @@
 from .ombase import OMBase
-from ..util import setattrType
-import xml.etree.ElementTree as ET
+from ..util import jsonMember, jsonString, setattrType, assertType
+from ..binary import writeToken, TOKEN_VARIABLE
 
 class OMVariable(OMBase):
     """Implementation of the OMVariable object
@@ -10,14 +10,25 @@ class OMVariable(OMBase):
 
     kind = "OMV"
     __match_args__ = ("name",)
+    __slots__ = ("name", "__weakref__")  # weakly interned, see internOM
+    _fields = ("id", "name")
+    _scalars = ("id", "name")
 
     def __init__(self, name: str, id=None):
+        super().__init__()
         setattrType(self, "id", id, (str, type(None)))
         setattrType(self, "name", name, str)
 
-    def toElement(self):
-        el = ET.Element(self.kind)
-        el.set("id", self.__dict__.get("id"))
-        el.set("name", self.name)
-        return el
+    def _verify(self):
+        super()._verify()
+        assertType(self.name, (str,))
 
+    def _xml(self):
+        return (("id", self.id), ("name", self.name)), None, ()
+
+    def _json(self):
+        return '{"kind": "OMV"' + jsonMember("id", self.id) + ', "name": ' + jsonString(self.name) + "}"
+
+    def _binary(self, out, ids):
+        writeToken(out, ids, TOKEN_VARIABLE, (self.name.encode("utf8"),), self.id)
+        return ()
@@ -1,7 +1,23 @@
-import openmath
+from .om.omapplication import OMApplication
+from .om.omattribution import OMAttribution
+from .om.ombinding import OMBinding
+from .om.ombytearray import OMBytearray
+from .om.omerror import OMError
+from .om.omfloat import OMFloat
+from .om.omforeign import OMForeign
+from .om.ominteger import OMInteger
+from .om.omobject import OMObject
+from .om.omreference import OMReference
+from .om.omstring import OMString
+from .om.omsymbol import OMSymbol
+from .om.omvariable import OMVariable
+from . import binary
+from .profiling import instrumented
+from .util import assertType, internOM, internTable, jsonLoads, valueAssert
 from base64 import b64decode
+from io import BytesIO
+from struct import error as StructError, unpack, unpack_from
 import xml.etree.ElementTree as ET
-import json
 
 def parse(text):
     """Parse either JSON or XML strings into a mathematical object
@@ -15,220 +31,715 @@ def parse(text):
     
     raise ValueError("Unable to detect encoding")
 
-def parseJSON(text):
+@instrumented("parseJSON")
+def parseJSON(text, intern=None, hashed=False):
     """Parse a JSON string into a mathematical object
 
+    There is no limit on the depth of the object, see util.jsonLoads.
+
     Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_json-the-json-encoding
     """
-    return fromDict(json.loads(text))
+    return fromDict(jsonLoads(text), intern, hashed)
+
+
+@instrumented("iterparseJSON")
+def iterparseJSON(source, chunkSize=65536, onError=None, intern=None, hashed=False):
+    """Parse a stream of newline delimited JSON objects, yielding them one by one
+
+    The source can be a file object, in text or binary mode, or an iterable
+    of bytes or str chunks. It is read in chunks of at most chunkSize
+    characters, so only the record being parsed is kept in memory. Bytes
+    are decoded as UTF-8, record by record. Blank lines are ignored.
+
+    An invalid record, including one that is not valid UTF-8, raises a
+    ValueError that aborts the stream, unless an onError function is given:
+    then it is called with the line number and the exception, and the
+    parsing goes on with the next record.
 
+    See fromDict for the intern and hashed arguments, the table of intern
+    being shared by all the records.
 
-def parseXML(text):
+    Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_json-the-json-encoding
+    """
+    table = _internTable(intern)
+    if hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunkSize), source.read(0))
+    else:
+        chunks = iter(source)
+
+    def lines():
+        # bytes are decoded line by line, so an invalid record fails alone:
+        # the newline byte is never part of a multibyte character
+        pending = []  # pieces of the current, incomplete line
+        for chunk in chunks:
+            parts = chunk.split("\n" if type(chunk) is str else b"\n")
+            if len(parts) > 1:
+                pending.append(parts[0])
+                yield parts[0][:0].join(pending)
+                yield from parts[1:-1]
+                pending = []
+            pending.append(parts[-1])
+        yield pending[0][:0].join(pending) if pending else ""
+
+    for lineno, line in enumerate(lines(), 1):
+        try:
+            if type(line) is not str:
+                line = line.decode("utf-8")
+            if len(line.strip()) == 0:
+                continue
+            obj = fromDict(jsonLoads(line), table, hashed)
+        except (ValueError, TypeError, KeyError, IndexError) as e:
+            if onError is None:
+                raise ValueError("Invalid record at line %d: %s" % (lineno, e)) from e
+            onError(lineno, e)
+            continue
+        yield obj
+
+
+@instrumented("parseXML")
+def parseXML(text, intern=None, hashed=False):
     """Parse a XML string into a mathematical object
 
     Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_xml
     """
-    return fromElement(ET.fromstring(text))
+    return fromElement(ET.fromstring(text), intern, hashed)
+
+
+@instrumented("iterparseXML")
+def iterparseXML(source, intern=None, hashed=False):
+    """Parse a XML stream, yielding its top-level OMOBJ objects one by one
 
+    The source can be a file name, a binary file object or a bytes-like
+    object. Each object is built as soon as its end tag arrives, and the
+    consumed elements are discarded afterwards, so the memory usage does not
+    depend on the size of the whole document.
 
-def fromDict(dictionary):
+    See fromDict for the intern and hashed arguments, the table of intern
+    being shared by all the objects.
+
+    Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_xml
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(source)
+
+    table = _internTable(intern)
+    parents = []  # currently open elements
+    depth = 0  # nesting level of OMOBJ elements
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        isObject = _localName(elem.tag) == "OMOBJ"
+        if event == "start":
+            depth += isObject
+            parents.append(elem)
+            continue
+
+        parents.pop()
+        if depth > int(isObject):  # inside an object still being read
+            depth -= isObject
+            continue
+
+        obj = fromElement(elem, table, hashed) if isObject else None
+        depth -= isObject
+        # drop the consumed element, so the tree above doesn't grow
+        elem.clear()
+        if len(parents) > 0:
+            parents[-1].remove(elem)
+
+        if obj is not None:
+            yield obj
+
+
+@instrumented("parseBinary")
+def parseBinary(data, intern=None, hashed=False):
+    """Parse a bytes-like object in the binary encoding into a mathematical object
+
+    The data is read in place through a memoryview, without copying it. See
+    fromDict for the intern and hashed arguments and for the checks of the
+    nodes. Truncated or corrupt data raises ValueError, with the offset of
+    the token that can't be read.
+
+    Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_binary
+    """
+    buf = memoryview(data)
+    table = _internTable(intern)
+    pos = 0
+    size = 1  # size of the length fields of the current token
+    ids = []  # ids in order of appearance, for internal references
+    cdbase = None  # cdbase that applies to the next object
+    opened = []  # (token, id, cdbase) of the open compound objects
+    children = [[]]  # children of the open compound objects, and the result
+
+    def advance(n):
+        nonlocal pos
+        pos += n
+        if pos > len(buf):
+            raise ValueError("Truncated data at byte %d" % start)
+
+    def readLengths(count):
+        advance(size * count)
+        if size == 1:
+            return buf[pos - count:pos].tolist()
+        return unpack_from(">%dI" % count, buf, pos - 4 * count)
+
+    def readStr(n, encoding="utf8"):
+        advance(n)
+        return str(buf[pos - n:pos], encoding)
+
+    def readID(k):
+        id = readStr(k)
+        if id not in ids:
+            ids.append(id)
+        return id
+
+    start = 0  # offset of the token being read
+    try:
+        while pos < len(buf):
+            start = pos
+            byte = buf[pos]
+            pos += 1
+            token = byte & binary.TOKEN_MASK
+            size = 4 if byte & binary.FLAG_LONG else 1
+            hasID = byte & binary.FLAG_ID
+            id = None
+            node = None
+
+            match token:
+                case binary.TOKEN_APPLICATION | binary.TOKEN_ATTRIBUTION | binary.TOKEN_ERROR | binary.TOKEN_BINDING:
+                    if hasID:
+                        id = readID(*readLengths(1))
+                    opened.append((token, id, cdbase))
+                    children.append([])
+
+                case binary.TOKEN_ATTRIBUTEPAIRS | binary.TOKEN_VARIABLES:
+                    # they are only the first child of an attribution, and the
+                    # second of a binding
+                    parent, position = (
+                        (binary.TOKEN_ATTRIBUTION, 0)
+                        if token == binary.TOKEN_ATTRIBUTEPAIRS
+                        else (binary.TOKEN_BINDING, 1)
+                    )
+                    if len(opened) == 0 or opened[-1][0] != parent or len(children[-1]) != position:
+                        raise ValueError("Unexpected token %d at byte %d" % (token, pos - 1))
+                    opened.append((token, None, None))
+                    children.append([])
+
+                case binary.TOKEN_OBJECT:
+                    version = None
+                    if hasID:
+                        version = "%d.%d" % (buf[pos], buf[pos + 1])
+                        pos += 2
+                    opened.append((token, version, cdbase))
+                    children.append([])
+
+                case binary.TOKEN_APPLICATION_END | binary.TOKEN_ATTRIBUTION_END | binary.TOKEN_ERROR_END \
+                        | binary.TOKEN_BINDING_END | binary.TOKEN_ATTRIBUTEPAIRS_END \
+                        | binary.TOKEN_VARIABLES_END | binary.TOKEN_OBJECT_END:
+                    if len(opened) == 0 or opened[-1][0] + 1 != token:
+                        raise ValueError("Unexpected end token %d at byte %d" % (token, pos - 1))
+                    begin, id, base = opened.pop()
+                    args = children.pop()
+                    if begin == binary.TOKEN_ATTRIBUTION:
+                        valueAssert(
+                            len(args) == 2 and type(args[0]) is list,
+                            "OMATTR objects must have attributes and an object",
+                        )
+                        _checkChildren("OMATTR", (*args[0], args[1]))
+                    elif begin == binary.TOKEN_BINDING:
+                        valueAssert(
+                            len(args) == 3 and type(args[1]) is list,
+                            "OMBIND objects must have a binder, variables and an object",
+                        )
+                        _checkChildren("OMBIND", (args[0], *args[1], args[2]))
+                    elif begin in _BINARY_KINDS:
+                        _checkChildren(_BINARY_KINDS[begin], args)
+                    match begin:
+                        case binary.TOKEN_APPLICATION:
+                            node = OMApplication._make(
+                                applicant=args[0], arguments=tuple(args[1:]), cdbase=base, id=id
+                            )
+                        case binary.TOKEN_ATTRIBUTION:
+                            node = OMAttribution._make(
+                                attributes=_pairs(args[0]), object=args[1], cdbase=base, id=id
+                            )
+                        case binary.TOKEN_ERROR:
+                            node = OMError._make(error=args[0], arguments=tuple(args[1:]), id=id)
+                        case binary.TOKEN_BINDING:
+                            node = OMBinding._make(
+                                binder=args[0], variables=tuple(args[1]), object=args[2],
+                                cdbase=base, id=id,
+                            )
+                        case binary.TOKEN_OBJECT:
+                            kwargs = {"cdbase": base}
+                            if id is not None:
+                                kwargs["version"] = id
+                            node = _object(args[0], kwargs)
+                        case _:  # attribute pairs and bound variables
+                            node = args
+
+                case binary.TOKEN_INTEGER:
+                    k = readLengths(1)[0] if hasID else None
+                    node = unpack_from(">b" if size == 1 else ">i", buf, pos)[0]
+                    pos += size
+                    node = OMInteger._make(integer=node, id=None if k is None else readID(k))
+
+                case binary.TOKEN_BIGINTEGER:
+                    n = readLengths(1)[0]
+                    sign, base = buf[pos], buf[pos + 1]
+                    pos += 2
+                    k = readLengths(1)[0] if hasID else None
+                    node = int(readStr(n, "ascii"), 16 if base == binary.BASE_16 else 10)
+                    if sign == ord("-"):
+                        node = -node
+                    node = OMInteger._make(integer=node, id=None if k is None else readID(k))
+
+                case binary.TOKEN_FLOAT:
+                    k = readLengths(1)[0] if hasID else None
+                    node = unpack_from(">d", buf, pos)[0]
+                    pos += 8
+                    node = OMFloat._make(float=node, id=None if k is None else readID(k))
+
+                case binary.TOKEN_BYTEARRAY:
+                    n, *k = readLengths(2 if hasID else 1)
+                    advance(n)
+                    node = OMBytearray._make(bytes=bytes(buf[pos - n:pos]), id=readID(*k) if k else None)
+
+                case binary.TOKEN_VARIABLE:
+                    n, *k = readLengths(2 if hasID else 1)
+                    node = OMVariable._make(name=readStr(n), id=readID(*k) if k else None)
+
+                case binary.TOKEN_STRING | binary.TOKEN_STRING_UTF16:
+                    n, *k = readLengths(2 if hasID else 1)
+                    encoding = "latin1" if token == binary.TOKEN_STRING else "utf-16-be"
+                    node = OMString._make(string=readStr(n, encoding), id=readID(*k) if k else None)
+
+                case binary.TOKEN_SYMBOL:
+                    n, m, *k = readLengths(3 if hasID else 2)
+                    cd = readStr(n)
+                    node = OMSymbol._make(
+                        name=readStr(m), cd=cd, cdbase=cdbase, id=readID(*k) if k else None
+                    )
+
+                case binary.TOKEN_CDBASE:
+                    cdbase = readStr(*readLengths(1))
+                    continue
+
+                case binary.TOKEN_FOREIGN:
+                    n, m, *k = readLengths(3 if hasID else 2)
+                    encoding = readStr(n)
+                    node = OMForeign._make(
+                        foreign=readStr(m), encoding=encoding or None, id=readID(*k) if k else None
+                    )
+
+                case binary.TOKEN_REFERENCE_INTERNAL:
+                    index = buf[pos] if size == 1 else unpack_from(">I", buf, pos)[0]
+                    pos += size
+                    node = OMReference._make(href="#" + ids[index])
+
+                case binary.TOKEN_REFERENCE_EXTERNAL:
+                    n, *k = readLengths(2 if hasID else 1)
+                    node = OMReference._make(href=readStr(n), id=readID(*k) if k else None)
+
+                case _:
+                    raise ValueError("Unknown token %d at byte %d" % (byte, pos - 1))
+
+            cdbase = None
+            if node is not None:
+                if table is not None and token in (binary.TOKEN_SYMBOL, binary.TOKEN_VARIABLE):
+                    node = internOM(node, table)
+                if hashed and type(node) is not list and node._hash is None:
+                    node._hashNode(node._children())
+                children[-1].append(node)
+    except (StructError, IndexError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid data at byte %d: %s" % (start, e)) from e
+
+    if len(opened) > 0 or len(children[0]) != 1:
+        raise ValueError("The data must hold exactly one complete object")
+    return children[0][0]
+
+
+_BINARY_KINDS = {  # begin tokens of the other compound objects -> kind
+    binary.TOKEN_APPLICATION: "OMA",
+    binary.TOKEN_ERROR: "OME",
+    binary.TOKEN_OBJECT: "OMOBJ",
+}
+
+
+def fromDict(dictionary, intern=None, hashed=False):
     """Build a mathematical object from a python dictionary
 
+    The dictionary is traversed with an explicit stack, so there is no limit
+    on the depth of the object.
+
+    If intern is True, symbols and variables are shared through the global
+    table of util.internOM, and if it is a dictionary, through that table:
+    equal leaves are then the same frozen instance.
+
+    If hashed is true, the structural hash of every node is computed as it
+    is built, which costs less than hashing the object afterwards. It is
+    meant for the objects checked with a validator.ValidationMemo, which
+    only looks up the subtrees that are hashed already.
+
+    The nodes are built without the public constructors, but with their
+    checks of the structure and of the types of the members, which raise
+    ValueError and TypeError.
+
     Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_json-the-json-encoding
     """
+    return _build(dictionary, _dictChildren, _dictBuild, _internTable(intern), hashed)
+
+
+def fromElement(elem, intern=None, hashed=False):
+    """Build a mathematical object from a xml.etree.Element
+
+    The element is traversed with an explicit stack, so there is no limit on
+    the depth of the object. See fromDict for the intern and hashed
+    arguments and for the checks of the nodes.
+
+    Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_xml
+    """
+    return _build(elem, _elementChildren, _elementBuild, _internTable(intern), hashed)
+
+
+def _build(source, getChildren, build, table=None, hashed=False):
+    """Build an object bottom-up without recursion
+
+    Arguments:
+        source -- root of the encoded object
+        getChildren -- function returning the encoded children of a node
+        build -- function building a node from its encoding and its children
+        table -- dictionary to intern the leaves with, if any
+        hashed -- compute the structural hash of the nodes as they are built
+    """
+    built = []  # objects whose parent is not built yet
+    pending = [(source, None)]
+    while pending:
+        node, count = pending.pop()
+        if count is None:
+            # first visit: build the children before the node itself
+            children = getChildren(node)
+            pending.append((node, len(children)))
+            pending.extend((child, None) for child in reversed(children))
+        elif count == 0:
+            leaf = build(node, ())
+            built.append(leaf if table is None else internOM(leaf, table))
+        else:
+            children = built[-count:]
+            del built[-count:]
+            built.append(build(node, children))
+        if hashed and count is not None and built[-1]._hash is None:
+            built[-1]._hashNode(built[-1]._children() if count else ())
+    return built[0]
+
+
+def _dictChildren(dictionary):
+    """Get the encodings of the OM children of a dictionary"""
+    match (dictionary):
+        case {"kind": "OMOBJ", "object": object_}:
+            return [object_]
+
+        case {"kind": "OMA" | "OME" as kind, **kwargs}:
+            head = kwargs["applicant"] if kind == "OMA" else kwargs["error"]
+            return [head, *kwargs.get("arguments", [])]
+
+        case {"kind": "OMBIND", **kwargs}:
+            return [kwargs["binder"], *kwargs["variables"], kwargs["object"]]
+
+        case {"kind": "OMATTR", **kwargs}:
+            for pair in kwargs["attributes"]:
+                valueAssert(
+                    isinstance(pair, (list, tuple)) and len(pair) == 2,
+                    "Attributes must be two values",
+                )
+            return [*(x for pair in kwargs["attributes"] for x in pair), kwargs["object"]]
+
+        case dict():
+            return ()
+
+        case _:
+            raise ValueError("A valid dictionary is required")
+
+
+def _dictBuild(dictionary, children):
+    """Build an object from a dictionary and its already built children"""
     match (dictionary):
 
         case {"kind": "OMOBJ", **kwargs}:
-            return OMObject(
-                fromDict(kwargs["object"]),
-                cdbase=kwargs.get("cdbase"),
-                version=kwargs.get("version"),
-                xmlns=kwargs.get("xmlns"),
-                **kwargs
-            )
+            del kwargs["object"]
+            _checkChildren("OMOBJ", children)
+            for k in ("xmlns", "version", "cdbase"):
+                _member(kwargs, k)
+            return _object(children[0], kwargs)
 
         case {"kind": "OMI", "integer": x, **kwargs}:
-            return OMInteger(int(x), id=kwargs.get("id"))
+            assertType(x, (int,))
+            return OMInteger._make(integer=x, id=_member(kwargs, "id"))
 
         case {"kind": "OMI", "decimal": x, **kwargs}:
-            return OMInteger(int(x), id=kwargs.get("id"))
+            assertType(x, (str,))
+            return OMInteger._make(integer=int(x), id=_member(kwargs, "id"))
 
         case {"kind": "OMI", "hexadecimal": x, **kwargs}:
-            return OMInteger(int(x, 16), id=kwargs.get("id"))
+            assertType(x, (str,))
+            return OMInteger._make(integer=int(x, 16), id=_member(kwargs, "id"))
 
-        case {"kind": "OMF", "integer": x, **kwargs}:
-            return OMFloat(float(x), id=kwargs.get("id"))
+        case {"kind": "OMF", "float": x, **kwargs}:
+            assertType(x, (int, float))
+            return OMFloat._make(float=float(x), id=_member(kwargs, "id"))
 
         case {"kind": "OMF", "decimal": x, **kwargs}:
-            return OMFloat(float(x), id=kwargs.get("id"))
+            assertType(x, (str,))
+            return OMFloat._make(float=float(x), id=_member(kwargs, "id"))
 
         case {"kind": "OMF", "hexadecimal": x, **kwargs}:
-            return OMFloat(float(x, 16), id=kwargs.get("id"))
+            assertType(x, (str,))
+            return OMFloat._make(float=unpack(">d", bytes.fromhex(x))[0], id=_member(kwargs, "id"))
 
         case {"kind": "OMSTR", **kwargs}:
-            return OMBytearray(kwargs["string"], id=kwargs.get("id"))
+            return OMString._make(string=_member(kwargs, "string", (str,)), id=_member(kwargs, "id"))
 
         case {"kind": "OMB", **kwargs}:
-            return OMBytearray(kwargs["bytes"], id=kwargs.get("id"))
+            return OMBytearray._make(
+                bytes=bytes(_member(kwargs, "bytes", (list,))), id=_member(kwargs, "id")
+            )
 
         case {"kind": "OMA", **kwargs}:
-            return OMApplication(
-                fromDict(kwargs["applicant"]),
-                [fromDict(a) for a in kwargs.get("arguments", [])],
-                cdbase=kwargs.get("cdbase"),
-                id=kwargs.get("id"),
+            _checkChildren("OMA", children)
+            return OMApplication._make(
+                applicant=children[0],
+                arguments=tuple(children[1:]),
+                cdbase=_member(kwargs, "cdbase"),
+                id=_member(kwargs, "id"),
             )
 
         case {"kind": "OMV", **kwargs}:
-            return OMVariable(kwargs["name"], id=kwargs.get("id"))
+            return OMVariable._make(name=_member(kwargs, "name", (str,)), id=_member(kwargs, "id"))
 
         case {"kind": "OMS", **kwargs}:
-            return OMSymbol(
-                kwargs["name"],
-                kwargs["cd"],
-                cdbase=kwargs.get("cdbase"),
-                id=kwargs.get("id"),
+            return OMSymbol._make(
+                name=_member(kwargs, "name", (str,)),
+                cd=_member(kwargs, "cd", (str,)),
+                cdbase=_member(kwargs, "cdbase"),
+                id=_member(kwargs, "id"),
             )
 
         case {"kind": "OMBIND", **kwargs}:
-            return OMBinding(
-                fromDict(kwargs["binder"]),
-                [fromDict(v) for v in kwargs["variables"]],
-                fromDict(kwargs["object"]),
-                cdbase=kwargs.get("cdbase"),
-                id=kwargs.get("id"),
+            _checkChildren("OMBIND", children)
+            return OMBinding._make(
+                binder=children[0],
+                variables=tuple(children[1:-1]),
+                object=children[-1],
+                cdbase=_member(kwargs, "cdbase"),
+                id=_member(kwargs, "id"),
             )
 
         case {"kind": "OMATTR", **kwargs}:
-            recFromDict = (
-                lambda x: fromDict(x)
-                if type(x) is not list
-                else [recFromDict(xx) for xx in x]
-            )
-            return OMAttribution(
-                recFromDict(kwargs["attributes"]),
-                fromDict(kwargs["object"]),
-                kwargs.get("cdbase"),
-                id=kwargs.get("id"),
+            _checkChildren("OMATTR", children)
+            return OMAttribution._make(
+                attributes=_pairs(children[:-1]),
+                object=children[-1],
+                cdbase=_member(kwargs, "cdbase"),
+                id=_member(kwargs, "id"),
             )
 
         case {"kind": "OME", **kwargs}:
-            return OMError(
-                kwargs["error"], kwargs.get("arguments"), id=kwargs.get("id")
+            _checkChildren("OME", children)
+            return OMError._make(
+                error=children[0], arguments=tuple(children[1:]), id=_member(kwargs, "id")
             )
 
         case {"kind": "OMR", "href": href, **kwargs}:
-            return OMReference(href, id=kwargs.get("id"))
+            assertType(href, (str,))
+            return OMReference._make(href=href, id=_member(kwargs, "id"))
 
         case {"kind": "OMFOREIGN", "foreign": foreign, **kwargs}:
-            return OMForeign(
-                foreign, encoding=kwargs.get("encoding"), id=kwargs.get("id")
+            valueAssert(foreign is not None, "Foreign object can't be None")
+            return OMForeign._make(
+                foreign=foreign, encoding=_member(kwargs, "encoding"), id=_member(kwargs, "id")
             )
 
         case _:
             raise ValueError("A valid dictionary is required")
 
 
-def fromElement(elem):
-    """Build a mathematical object from a xml.etree.Element
+def _internTable(intern):
+    """Get the table for the intern argument of the parsing functions"""
+    if intern is True:
+        return internTable
+    if intern is None or intern is False:
+        return None
+    return intern
 
-    Reference: https://openmath.org/standard/om20-2019-07-01/omstd20.html#sec_xml
+
+def _member(members, key, types=(str, type(None))):
+    """Get a member of a JSON object, checking its type as the constructors do"""
+    value = members.get(key)
+    assertType(value, types)
+    return value
+
+
+def _checkChildren(kind, children):
+    """Check the number and the kinds of the children of a compound object
+
+    These are the structural checks of the public constructors, which the
+    parsers keep, as malformed trees can't even be walked: they raise
+    ValueError.
     """
-    # handle xml namespaces
-    if elem.tag[0] == "{":
-        [ns, tag] = elem.tag[1:].split("}")
-    else:
-        ns = None
-        tag = elem.tag
+    count = len(children)
+    if kind == "OMOBJ":
+        valueAssert(count == 1, "OMOBJ objects must have exactly one object")
+    elif kind == "OMA" or kind == "OME":
+        valueAssert(count >= 1, "%s objects must have a head" % kind)
+        valueAssert(kind == "OMA" or children[0].kind == "OMS", "The error of OME objects must be a symbol")
+    elif kind == "OMBIND":
+        valueAssert(count >= 2, "OMBIND objects must have a binder and an object")
+        for v in children[1:-1]:
+            valueAssert(
+                v.kind == "OMV" or (v.kind == "OMATTR" and v.object.kind == "OMV"),
+                "Bound variables must be variables or attributed variables",
+            )
+    elif kind == "OMATTR":
+        valueAssert(count % 2 == 1, "Attributes must be two values")
+        for key in children[0:-1:2]:
+            valueAssert(key.kind == "OMS", "Attribute keys must be symbols")
+
+
+def _pairs(items):
+    """Group a flat sequence of attribute keys and values into pairs"""
+    return tuple((items[i], items[i + 1]) for i in range(0, len(items), 2))
+
 
-    def qname(t):
-        return t if ns is None else ("{%s}%s" % (ns, t))
+def _object(object_, attributes):
+    """Build an OMObject from its optional attributes, with their defaults"""
+    for k in attributes:
+        if k == "object" or k not in OMObject._fields:
+            raise TypeError("OMObject got an unexpected keyword argument " + k)
+    return OMObject._make(
+        object=object_,
+        xmlns=attributes.get("xmlns"),
+        version=attributes.get("version", "2.0"),
+        cdbase=attributes.get("cdbase"),
+        id=attributes.get("id"),
+    )
 
-    match tag:
+
+def _localName(tag):
+    """Strip the namespace from a XML tag"""
+    return tag[tag.index("}") + 1:] if tag[0] == "{" else tag
+
+
+def _elementChildren(elem):
+    """Get the XML elements of the OM children of an element"""
+    match _localName(elem.tag):
+        case "OMOBJ" | "OMA" | "OME":
+            return list(elem)
+
+        case "OMBIND":
+            valueAssert(
+                len(elem) == 3 and _localName(elem[1].tag) == "OMBVAR",
+                "OMBIND elements must have a binder, an OMBVAR and an object",
+            )
+            return [elem[0], *elem[1], elem[2]]
+
+        case "OMATTR":
+            valueAssert(
+                len(elem) == 2 and _localName(elem[0].tag) == "OMATP",
+                "OMATTR elements must have an OMATP and an object",
+            )
+            return [*elem[0], elem[1]]
+
+        case _:
+            return ()
+
+
+def _elementBuild(elem, children):
+    """Build an object from a XML element and its already built children"""
+    match _localName(elem.tag):
         case "OMOBJ":
-            return OMObject(fromElement(elem[0]), **elem.attrib)
+            attrib = {k: v for k, v in elem.attrib.items() if k in OMObject._fields}
+            _checkChildren("OMOBJ", children)
+            return _object(children[0], attrib)
 
         case "OMI":
-            if elem.text.strip()[0] == "x":
-                return OMInteger(int(elem.text.strip()[1:]), id=elem.attrib.get("id"))
-            elif elem.text.strip()[:2] == "-x":
-                return OMInteger(-int(elem.text.strip()[2:]), id=elem.attrib.get("id"))
+            text = elem.text.strip()
+            if text[0] == "x":
+                integer = int(text[1:], 16)
+            elif text[:2] == "-x":
+                integer = -int(text[2:], 16)
             else:
-                return OMInteger(int(elem.text.strip()), id=elem.attrib.get("id"))
+                integer = int(text)
+            return OMInteger._make(integer=integer, id=elem.attrib.get("id"))
 
         case "OMF":
             if "dec" in elem.attrib:
-                return OMFloat(float(elem.attrib["dec"]), id=elem.attrib.get("id"))
+                return OMFloat._make(float=float(elem.attrib["dec"]), id=elem.attrib.get("id"))
             else:
-                return OMFloat(float(elem.attrib["hex"]), id=elem.attrib.get("id"))
+                return OMFloat._make(
+                    float=unpack(">d", bytes.fromhex(elem.attrib["hex"]))[0],
+                    id=elem.attrib.get("id"),
+                )
 
         case "OMS":
-            return OMSymbol(
-                elem.attrib["name"],
-                elem.attrib["cd"],
-                elem.attrib.get("cdbase"),
+            return OMSymbol._make(
+                name=elem.attrib["name"],
+                cd=elem.attrib["cd"],
+                cdbase=elem.attrib.get("cdbase"),
                 id=elem.attrib.get("id"),
             )
 
         case "OMV":
-            return OMVariable(elem.attrib["name"], id=elem.attrib.get("id"))
+            return OMVariable._make(name=elem.attrib["name"], id=elem.attrib.get("id"))
 
         case "OMSTR":
-            return OMString(elem.text, id=elem.attrib.get("id"))
+            return OMString._make(string=elem.text or "", id=elem.attrib.get("id"))
 
         case "OMB":
-            return OMBytearray(b64decode(elem.text), id=elem.attrib.get("id"))
+            return OMBytearray._make(bytes=b64decode(elem.text or ""), id=elem.attrib.get("id"))
 
         case "OMA":
-            return OMApplication(
-                fromElement(elem[0]),
-                [fromElement(x) for x in elem[1:]],
+            _checkChildren("OMA", children)
+            return OMApplication._make(
+                applicant=children[0],
+                arguments=tuple(children[1:]),
                 cdbase=elem.attrib.get("cdbase"),
                 id=elem.attrib.get("id"),
             )
 
         case "OMATTR":
-            obj = None
-            attrs = []
-            for child in elem:
-                if child.tag == "OMATP":
-                    key = None
-                    for i, x in enumerate(child):
-                        if i % 2 == 0 and key is not None:
-                            attrs.append([fromElement(key), fromElement(x)])
-                        else:
-                            key = x
-                else:
-                    obj = fromElement(child)
-            return OMAttribution(
-                attrs, obj, cdbase=elem.attrib.get("cdbase"), id=elem.attrib.get("id")
+            _checkChildren("OMATTR", children)
+            return OMAttribution._make(
+                attributes=_pairs(children[:-1]),
+                object=children[-1],
+                cdbase=elem.attrib.get("cdbase"),
+                id=elem.attrib.get("id"),
             )
 
         case "OME":
-            return OMError(
-                fromElement(elem[0]),
-                [fromElement(x) for x in elem[1:]],
-                id=elem.attrib.get("id"),
+            _checkChildren("OME", children)
+            return OMError._make(
+                error=children[0], arguments=tuple(children[1:]), id=elem.attrib.get("id")
             )
 
         case "OMBIND":
-            return OMBinding(
-                fromElement(elem[0]),
-                [fromElement(x) for x in elem.find(qname("OMBVAR"))],
-                fromElement(elem[2]),
+            _checkChildren("OMBIND", children)
+            return OMBinding._make(
+                binder=children[0],
+                variables=tuple(children[1:-1]),
+                object=children[-1],
+                cdbase=elem.attrib.get("cdbase"),
                 id=elem.attrib.get("id"),
             )
 
         case "OMR":
-            return OMReference(elem.attrib["href"], id=elem.attrib.get("id"))
+            return OMReference._make(href=elem.attrib["href"], id=elem.attrib.get("id"))
 
         case "OMFOREIGN":
-            childcount = len(list(elem))
+            childcount = len(elem)
             if childcount > 1:
                 raise ValueError("OMFOREIGN objects can't have multiple children")
-            return OMForeign(
-                elem[0] if childcount == 1 else elem.text,
-                elem.attrib.get("encoding"),
+            foreign = elem[0] if childcount == 1 else elem.text
+            valueAssert(foreign is not None, "Foreign object can't be None")
+            return OMForeign._make(
+                foreign=foreign,
+                encoding=elem.attrib.get("encoding"),
                 id=elem.attrib.get("id"),
             )
 
@@ -0,0 +1,174 @@
+"""Opt-in instrumentation of the main operations
+
+The parsers, the serializers, OMReference.resolve, OMBase.dereference and
+the validator record their number of calls, failures, wall time and number
+of nodes, but only while some profile or hook is active. Otherwise the
+instrumented functions only check that nothing is active, so the overhead
+is a function call.
+
+    with Profile() as profile:
+        obj = parseXML(text)
+        validate(obj)
+    profile.snapshot()  # {"parseXML": {"calls": 1, "seconds": ...}, ...}
+
+The times include those of the instrumented functions called inside, so
+toXML includes writeXML, and dereference includes resolve.
+"""
+from functools import wraps
+from inspect import isgeneratorfunction
+from threading import Lock
+from time import perf_counter
+
+_active = []  # sinks called with (name, seconds, nodes, failed)
+
+
+class Profile:
+    """Record of the instrumented calls made while it is active
+
+    It is a context manager, which can be nested with others and with
+    hooks: every active one records all the calls.
+    """
+
+    def __init__(self):
+        self._stats = {}  # name -> [calls, failures, seconds, nodes]
+        self._lock = Lock()
+
+    def __call__(self, name, seconds, nodes, failed):
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = [0, 0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += failed
+            entry[2] += seconds
+            entry[3] += nodes
+
+    def snapshot(self) -> dict:
+        """Get the counters of every operation as a plain dictionary
+
+        Each operation has its calls, failures (calls that raised an
+        exception), seconds and nodes (of the objects parsed, serialized,
+        resolved or validated).
+        """
+        with self._lock:
+            return {
+                name: {"calls": calls, "failures": failures, "seconds": seconds, "nodes": nodes}
+                for name, (calls, failures, seconds, nodes) in self._stats.items()
+            }
+
+    def reset(self):
+        """Clear the counters"""
+        with self._lock:
+            self._stats.clear()
+
+    def __enter__(self):
+        addHook(self)
+        return self
+
+    def __exit__(self, *exc):
+        removeHook(self)
+
+
+def addHook(hook):
+    """Call a function for every instrumented call from now on
+
+    It is called with the name of the operation, its seconds, its number of
+    nodes and whether it raised an exception.
+    """
+    _active.append(hook)
+
+
+def removeHook(hook):
+    """Stop calling a function added with addHook"""
+    _active.remove(hook)
+
+
+_global = Profile()
+
+def enable():
+    """Start recording the instrumented calls in the global profile"""
+    if _global not in _active:
+        addHook(_global)
+
+
+def disable():
+    """Stop recording in the global profile, keeping its counters"""
+    if _global in _active:
+        removeHook(_global)
+
+
+def snapshot() -> dict:
+    """Get the counters of the global profile, see Profile.snapshot"""
+    return _global.snapshot()
+
+
+def reset():
+    """Clear the counters of the global profile"""
+    _global.reset()
+
+
+def countNodes(obj) -> int:
+    """Get the number of nodes of an object, or 0 if it isn't one"""
+    walk = getattr(obj, "_walk", None)
+    return 0 if walk is None else sum(1 for _ in walk("pre", {}))
+
+
+def firstArgument(args, result):
+    """Target of instrumented for the methods of the objects and the validator"""
+    return args[0]
+
+
+def instrumented(name, target=None):
+    """Decorator of the functions that are recorded by the profiles
+
+    The calls of generator functions are recorded for every item, with the
+    time spent producing it.
+
+    Arguments:
+        name -- name of the operation
+        target -- function of the positional arguments and the result that
+            returns the object whose nodes are counted (default=the result)
+    """
+    def decorator(f):
+        if isgeneratorfunction(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if not _active:
+                    return f(*args, **kwargs)
+                return _iterate(name, f(*args, **kwargs))
+            return wrapper
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if not _active:
+                return f(*args, **kwargs)
+            start = perf_counter()
+            try:
+                result = f(*args, **kwargs)
+            except BaseException:
+                _record(name, perf_counter() - start, 0, True)
+                raise
+            seconds = perf_counter() - start
+            _record(name, seconds, countNodes(result if target is None else target(args, result)), False)
+            return result
+        return wrapper
+    return decorator
+
+
+def _iterate(name, iterator):
+    while True:
+        start = perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        except BaseException:
+            _record(name, perf_counter() - start, 0, True)
+            raise
+        _record(name, perf_counter() - start, countNodes(item), False)
+        yield item
+
+
+def _record(name, seconds, nodes, failed):
+    for hook in list(_active):
+        hook(name, seconds, nodes, failed)
@@ -1,16 +1,10 @@
 from .om.ombase import OMBase
-
-class _OMFound(BaseException):
-    def __init__(self, object_):
-        self.object = object_
-
-
-def removeNoneAttrib(elem):
-    """Remove None attributes from XML tree"""
-    elem.attrib = {k: elem.attrib[k] for k in elem.attrib if elem.attrib[k] is not None}
-    for subelem in elem:
-        removeNoneAttrib(subelem)
-
+from json.decoder import JSONDecodeError, scanstring
+from json.encoder import encode_basestring, encode_basestring_ascii as jsonString
+from json.scanner import NUMBER_RE
+from weakref import WeakValueDictionary
+import json
+import re
 
 def assertType(x, types):
     if not isinstance(x, types):
@@ -23,9 +17,201 @@ def setattrType(obj, attr, value, types):
 
 
 def setattrOM(obj, attr, value, kinds=None):
+    obj._assertMutable()
     assertOM(value, kinds)
+    old = getattr(obj, attr, None)
     setattr(obj, attr, value)
-    value.parent = obj
+    setParent(value, obj)
+    obj._changed(() if old is None else (old,), (value,))
+
+
+def setParent(obj, parent):
+    """Link an object to its parent, unless it is frozen
+
+    Frozen objects may be shared by many parents, so they keep none.
+    """
+    if not obj._frozen:
+        obj.parent = parent
+
+
+def jsonMember(key, value):
+    """Get the JSON encoding of an optional string member, after a comma
+
+    Return an empty string if the value is None.
+    """
+    if value is None:
+        return ""
+    return ', "' + key + '": ' + jsonString(value)
+
+
+def jsonFloat(value):
+    """Get the JSON encoding of a float, as json.dumps"""
+    if value != value:
+        return "NaN"
+    if value == float("inf"):
+        return "Infinity"
+    if value == -float("inf"):
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_INFINITY = float("inf")
+_CONSTANTS = (("null", None), ("true", True), ("false", False),
+              ("NaN", float("nan")), ("Infinity", _INFINITY), ("-Infinity", -_INFINITY))
+
+
+def jsonLoads(text):
+    """Decode a JSON document, whatever its depth
+
+    The decoder of the json module is recursive, so the documents that are
+    too deep for it are decoded again with an explicit stack, which is
+    slower. Both accept the same documents and raise JSONDecodeError.
+    """
+    try:
+        return json.loads(text)
+    except RecursionError:
+        pass
+    if not isinstance(text, str):
+        text = text.decode(json.detect_encoding(text), "surrogatepass")
+
+    space = _WHITESPACE.match
+    stack = []  # open containers, as [list] or [dict, key of the next value]
+    pos = space(text).end()
+    while True:
+        # read a value, or open a container
+        char = text[pos:pos + 1]
+        closer = "}" if char == "{" else "]" if char == "[" else None
+        if closer is not None:
+            pos = space(text, pos + 1).end()
+            if text[pos:pos + 1] == closer:
+                value = {} if closer == "}" else []
+                pos += 1
+            else:
+                stack.append([{}, None] if closer == "}" else [[]])
+                if closer == "}":
+                    pos = _jsonKey(text, pos, stack[-1])
+                continue
+        elif char == '"':
+            value, pos = scanstring(text, pos + 1)
+        else:
+            match = NUMBER_RE.match(text, pos)
+            if match is not None:
+                integer, fraction, exponent = match.groups()
+                value = float(integer + (fraction or "") + (exponent or "")) if fraction or exponent else int(integer)
+                pos = match.end()
+            else:
+                for name, value in _CONSTANTS:
+                    if text.startswith(name, pos):
+                        pos += len(name)
+                        break
+                else:
+                    raise JSONDecodeError("Expecting value", text, pos)
+
+        # add it to the open containers, closing those that end
+        while True:
+            pos = space(text, pos).end()
+            if not stack:
+                if pos != len(text):
+                    raise JSONDecodeError("Extra data", text, pos)
+                return value
+            top = stack[-1]
+            if len(top) == 1:
+                top[0].append(value)
+            else:
+                top[0][top[1]] = value
+            char = text[pos:pos + 1]
+            if char == ",":
+                pos = space(text, pos + 1).end()
+                if len(top) == 2:
+                    pos = _jsonKey(text, pos, top)
+                break
+            if char != ("]" if len(top) == 1 else "}"):
+                raise JSONDecodeError("Expecting ',' delimiter", text, pos)
+            value = stack.pop()[0]
+            pos += 1
+
+
+def _jsonKey(text, pos, container):
+    """Read the key of a member and its colon, return the position after them"""
+    if text[pos:pos + 1] != '"':
+        raise JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+    container[1], pos = scanstring(text, pos + 1)
+    pos = _WHITESPACE.match(text, pos).end()
+    if text[pos:pos + 1] != ":":
+        raise JSONDecodeError("Expecting ':' delimiter", text, pos)
+    return _WHITESPACE.match(text, pos + 1).end()
+
+
+JSON_DUMPS_OPTIONS = ("ensure_ascii", "allow_nan", "indent", "separators", "sort_keys")
+
+
+def jsonDumps(value, ensure_ascii=True, allow_nan=True, indent=None, separators=None, sort_keys=False):
+    """Encode dictionaries, lists and scalars in JSON, whatever their depth
+
+    The output is the same as json.dumps with the same options, but it is
+    written with an explicit stack instead of recursion. The keys must be
+    strings.
+    """
+    string = jsonString if ensure_ascii else encode_basestring
+    if type(indent) is int:
+        indent = " " * indent
+    if separators is None:
+        separators = (", ", ": ") if indent is None else (",", ": ")
+    itemSeparator, keySeparator = separators
+
+    parts = []
+    pending = [(value, 0)]
+    while pending:
+        item, depth = pending.pop()
+        kind = type(item)
+        if kind is _JSONText:
+            parts.append(item)
+        elif kind is str:
+            parts.append(string(item))
+        elif item is None or item is True or item is False:
+            parts.append("null" if item is None else "true" if item else "false")
+        elif kind is int:
+            parts.append(int.__repr__(item))
+        elif kind is float:
+            if not allow_nan and (item != item or item in (_INFINITY, -_INFINITY)):
+                raise ValueError("Out of range float values are not JSON compliant")
+            parts.append(jsonFloat(item))
+        elif kind in (list, tuple, dict):
+            opener, closer = ("{", "}") if kind is dict else ("[", "]")
+            if not item:
+                parts.append(opener + closer)
+                continue
+            if kind is dict:
+                items = sorted(item.items()) if sort_keys else item.items()
+                for k, _ in items:
+                    assertType(k, (str,))
+            else:
+                items = item
+            if indent is None:
+                newline = closing = ""
+            else:
+                newline = "\n" + indent * (depth + 1)
+                closing = "\n" + indent * depth
+            layout = [_JSONText(opener)]
+            for i, x in enumerate(items):
+                separator = (itemSeparator if i else "") + newline
+                if kind is dict:
+                    layout.append((_JSONText(separator + string(x[0]) + keySeparator), depth))
+                    x = x[1]
+                else:
+                    layout.append((_JSONText(separator), depth))
+                layout.append((x, depth + 1))
+            layout.append((_JSONText(closing + closer), depth))
+            parts.append(layout[0])
+            pending.extend(reversed(layout[1:]))
+        else:
+            raise TypeError("Object of type %s is not JSON serializable" % kind.__name__)
+    return "".join(parts)
+
+
+class _JSONText(str):
+    """Text already encoded by jsonDumps"""
 
 
 def valueAssert(condition, msg):
@@ -52,4 +238,45 @@ def assertOM(x, kinds=None):
     if kinds is not None and x.kind not in kinds:
         raise TypeError(
             "Expected %s object, but got %s" % (" or ".join(kinds), x.kind)
-        )
\ No newline at end of file
+        )
+
+
+internTable = WeakValueDictionary()  # global table used by internOM
+
+
+def internOM(obj, table=None):
+    """Get the shared instance of a symbol or a variable
+
+    The first object interned with a given value is frozen and stored in the
+    table, and later equal objects are replaced by it. Other kinds of objects,
+    and objects with an id, are returned as they are.
+
+    Frozen objects are immutable and have no parent, so the cdbase of a
+    shared symbol is only the one it carries itself.
+
+    The global table holds its objects weakly: they are dropped once no
+    object uses them, so the table doesn't grow with all the symbols and
+    variables ever parsed. A table given as a dictionary keeps its objects
+    as long as it lives itself.
+
+    Arguments:
+        obj -- object to intern
+        table -- dictionary of shared objects (default=internTable)
+    """
+    if obj.id is not None:
+        return obj
+    if obj.kind == "OMS":
+        key = ("OMS", obj.name, obj.cd, obj.cdbase)
+    elif obj.kind == "OMV":
+        key = ("OMV", obj.name)
+    else:
+        return obj
+
+    if table is None:
+        table = internTable
+    shared = table.get(key)
+    if shared is None:
+        obj.parent = None
+        obj._frozen = True
+        shared = table[key] = obj
+    return shared
@@ -2,13 +2,23 @@ from .om.ombase import OMBase
 from .om.omattribution import OMAttribution
 from .om.omapplication import OMApplication
 from .om.ombinding import OMBinding
+from .om.omerror import OMError
+from .om.omsymbol import OMSymbol
 from .cd.parser import parseXML as parseCD
+from .cd.registry import CDRegistry
+from .cd.cache import loadDirectory
+from .parser import parseBinary, parseJSON, parseXML
+from .profiling import instrumented, firstArgument
+from .util import isOM
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
 from enum import Enum
 import pathlib
 import os
 
 OM_CD_PATH_VAR="OM_CD_PATH"
-cds = []
+cdRegistry = CDRegistry()  # content dictionaries used by default
 
 class ValidationResult(Enum):
     OK = 0
@@ -16,73 +26,378 @@ class ValidationResult(Enum):
     ERROR = -2
 
 
-def validate(omobj: OMBase, **kargs):
-    
-    symbolsWithInvalidRole = []
-    symbolsFromExperimentalCD = []
-    symbolsNotFound = []
-    
-    def singleValidate(obj):
-        if obj.kind == OMSymbol.kind:
-            cd, symbolDefinition = getCDAndSymbolDefinition(obj)
-            
-            if symbolDefinition is None: 
-                symbolsNotFound.append(obj.applicant)
-                return
-
-            if cd.status == "experimental": symbolsFromExperimentalCD(obj.applicant)
-
-            if symbolDefinition.role is None or symbolDefinition.role == "":
-                return
-
-            if obj.parent.kind == OMApplication.kind and obj is obj.parent.applicant:
-                if symbolDefinition.role != "application":
-                    symbolsWithInvalidRole.append((obj, "application"))
-    
-            elif obj.parent.kind == OMAttribution.kind and obj is not obj.parent.object:
-                if symbolDefinition.role not in ("attribution", "semantic-attribution"): 
-                    symbolsWithInvalidRole.append((attr, "attribution"))
-
-            elif obj.parent.kind == OMBinding.kind and obj is obj.parent.binder:
-                if symbolDefinition.role != "binder":
-                    symbolsWithInvalidRole.append((obj, "binder"))
-            
-            elif obj.parent.kind == OMError.kind and obj is obj.parent.error:
-                if symbolDefinition.role != "error":
-                    symbolsWithInvalidRole.append((obj, "error"))
-
-    returnValues = {
-        "pass": ValidationResult.OK,
-        "warning": ValidationResult.WARNING,
-        "error": ValidationResult.ERROR
-    }
-
-    omobj.apply(singleValidate)
-    if len(symbolsWithInvalidRole) > 0:
-        return ValidationResult.ERROR
-    
-    if len(symbolsFromExperimentalCD) > 0:
-        return ValidationResult.WARNING
-    
-    return ValidationResult.OK
-
-
-def getCDAndSymbolDefinition(symbol):
-    for cd in cds:
-        if symbol in cd:
-            return cd, cd[symbol]
-    return (None, None)
-        
+@dataclass
+class ValidationReport:
+    """Outcome of the validation of an object, with the failing symbols
+
+    The symbols are copies, without their ancestors. They are frozen when
+    they come from a ValidationMemo, which shares them between reports.
+    """
+    result: ValidationResult = ValidationResult.OK
+    invalidRoles: list = field(default_factory=list)  # (symbol, role) pairs
+    experimental: list = field(default_factory=list)  # symbols from experimental CDs
+    notFound: list = field(default_factory=list)  # symbols without definition
+    index: int = None  # position of the object in validateMany
+
+    def failures(self) -> list:
+        """Get (symbol, reason) pairs for all the problems found"""
+        return [
+            *((x, "can't be used as %s" % role) for x, role in self.invalidRoles),
+            *((x, "is from an experimental CD") for x in self.experimental),
+            *((x, "is not defined in any CD") for x in self.notFound),
+        ]
+
+
+@instrumented("validate", firstArgument)
+def validate(omobj: OMBase, registry=None, memo=None, **kargs):
+    """Check the symbols of an object against the content dictionaries
+
+    Arguments:
+        omobj -- object to validate
+        registry -- CDRegistry with the content dictionaries (default=cdRegistry)
+        memo -- ValidationMemo to reuse the results of repeated subtrees
+            (default=None)
+    """
+    return check(omobj, registry, memo).result
+
+
+@instrumented("check", firstArgument)
+def check(omobj: OMBase, registry=None, memo=None) -> ValidationReport:
+    """Validate an object, getting a report with the failing symbols
+
+    See validate.
+    """
+    if registry is None:
+        registry = cdRegistry
+    if memo is not None:
+        return _checkMemo(omobj, registry, memo)
+
+    # The cdbase is passed down the walk, as shared nodes have no parent
+    report = ValidationReport()
+    inherited = omobj.parent.getCDBase() if omobj.parent is not None else None
+    pending = [(omobj, inherited)]
+    while pending:
+        node, inherited = pending.pop()
+        cdbase = getattr(node, "cdbase", None) or inherited
+        _checkNode(node, cdbase, registry, report)
+        pending.extend((x, cdbase) for x in reversed(node._children()))
+    return _finish(report)
+
+
+def _checkNode(obj, cdbase, registry, report):
+    """Check the symbols of a node, but not those of its descendants
+
+    The role of a symbol depends on its place in the parent, so it is
+    checked from the parent, which works for shared symbols too.
+
+    Arguments:
+        obj -- node to check
+        cdbase -- effective cdbase of the node
+        registry -- CDRegistry with the content dictionaries
+        report -- ValidationReport to add the failing symbols to
+    """
+    kind = obj.kind
+    if kind == OMSymbol.kind:
+        cd, symbolDefinition = registry.find(cdbase, obj.cd, obj.name)
+        if symbolDefinition is None:
+            report.notFound.append(_detached(obj, cdbase))
+        elif cd.status == "experimental":
+            report.experimental.append(_detached(obj, cdbase))
+        return
+
+    if kind == OMApplication.kind and obj.applicant.kind == OMSymbol.kind:
+        roles = [(obj.applicant, "application", ("application",))]
+    elif kind == OMAttribution.kind:
+        roles = [
+            (key, "attribution", ("attribution", "semantic-attribution"))
+            for key, _ in obj.attributes
+        ]
+    elif kind == OMBinding.kind and obj.binder.kind == OMSymbol.kind:
+        roles = [(obj.binder, "binder", ("binder",))]
+    elif kind == OMError.kind:
+        roles = [(obj.error, "error", ("error",))]
+    else:
+        return
+
+    for symbol, role, allowedRoles in roles:
+        symbolCDBase = symbol.cdbase or cdbase
+        _, symbolDefinition = registry.find(symbolCDBase, symbol.cd, symbol.name)
+        if symbolDefinition is None or symbolDefinition.role is None or symbolDefinition.role == "":
+            continue
+        if symbolDefinition.role not in allowedRoles:
+            report.invalidRoles.append((_detached(symbol, symbolCDBase), role))
+
+
+def _detached(symbol, cdbase):
+    """Copy a symbol without its ancestors, keeping its effective cdbase"""
+    copy = symbol._copy()
+    copy.cdbase = cdbase
+    return copy
+
+
+def _finish(report):
+    """Set the result of a report from its failing symbols"""
+    if len(report.invalidRoles) > 0:
+        report.result = ValidationResult.ERROR
+    elif len(report.experimental) > 0:
+        report.result = ValidationResult.WARNING
+    return report
+
+
+class ValidationMemo:
+    """Cache of the validation of subtrees, by their structure
+
+    The symbols found in a subtree only depend on its structure, on the
+    cdbase inherited from its ancestors and on the content dictionaries. So
+    the findings of every compound subtree are kept, by its structural hash,
+    the cdbase attributes inside it and the inherited cdbase, and a subtree
+    that matches one validated before is not visited again, even inside a
+    new parent. The entries are dropped when the content dictionaries
+    change, by the version of the registry.
+
+    Lookups only cost as much as validating the node itself if its hash is
+    known already: only the frozen subtrees and the mutable ones with a
+    cached hash are looked up, the others are checked directly. Parse the
+    objects with hashed=True (see parser.fromDict) to get their hashes on
+    the way, or hash them once to validate them many times.
+
+    Arguments:
+        maxEntries -- maximum number of subtrees, the least recently used
+            ones are evicted first (default=65536)
+    """
+
+    def __init__(self, maxEntries=65536):
+        self.maxEntries = maxEntries
+        self._entries = OrderedDict()  # (hash, cdbases, cdbase) -> ValidationReport
+        self._registry = None
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def clear(self):
+        """Remove all the entries"""
+        self._entries.clear()
+
+    def _bind(self, registry):
+        """Drop the entries computed with other content dictionaries"""
+        if self._registry is not registry or self._version != registry.version:
+            self._entries.clear()
+            self._registry = registry
+            self._version = registry.version
+
+    def _get(self, node, cdbase):
+        key = (hash(node), node._bases, cdbase)
+        findings = self._entries.get(key)
+        if findings is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return findings
+        self.misses += 1
+        return None
+
+    def _put(self, node, cdbase, findings):
+        self._entries[(hash(node), node._bases, cdbase)] = findings
+        while len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Get the counters of the memo"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _checkMemo(omobj, registry, memo):
+    """Validate an object bottom-up, reusing the findings of known subtrees"""
+    memo._bind(registry)
+    inherited = omobj.parent.getCDBase() if omobj.parent is not None else None
+
+    done = []  # findings of the visited subtrees, in order
+    pending = [(omobj, inherited, False)]
+    while pending:
+        node, inherited, expanded = pending.pop()
+        children = node._children()
+        cdbase = getattr(node, "cdbase", None) or inherited
+        known = node._hash is not None or node._frozen
+        if not expanded:
+            if not children:  # leaves are checked directly
+                findings = ValidationReport()
+                _checkNode(node, cdbase, registry, findings)
+                _freezeFindings(findings)
+                done.append(findings)
+                continue
+            findings = memo._get(node, inherited) if known else None
+            if findings is not None:
+                done.append(findings)
+                continue
+            pending.append((node, inherited, True))
+            pending.extend((x, cdbase, False) for x in reversed(children))
+            continue
+
+        # The findings of the node come before those of its descendants
+        parts = done[-len(children):]
+        del done[-len(children):]
+        findings = ValidationReport()
+        _checkNode(node, cdbase, registry, findings)
+        _freezeFindings(findings)
+        for part in parts:
+            findings.invalidRoles += part.invalidRoles
+            findings.experimental += part.experimental
+            findings.notFound += part.notFound
+        if known:
+            memo._put(node, inherited, findings)
+        done.append(findings)
+
+    findings = done.pop()
+    return _finish(ValidationReport(
+        invalidRoles=list(findings.invalidRoles),
+        experimental=list(findings.experimental),
+        notFound=list(findings.notFound),
+    ))
+
+
+def _freezeFindings(findings):
+    for symbol, _ in findings.invalidRoles:
+        symbol.freeze()
+    for symbol in (*findings.experimental, *findings.notFound):
+        symbol.freeze()
+
+
+@instrumented("validateMany")
+def validateMany(objects, workers=None, ordered=True, chunkSize=64, registry=None, memo=None):
+    """Validate many objects in a pool of processes
+
+    The registry is sent to every process once, when it starts, and the
+    objects in chunks, in the binary encoding. Objects that are already
+    encoded, as bytes in the binary encoding or as XML or JSON strings, are
+    sent as they are and only parsed by the processes, which saves encoding
+    them here. Only a few chunks per process are queued at a time, so
+    objects can come from a long stream. Generate the ValidationReport of
+    every object, with its position in index.
+
+    Arguments:
+        objects -- iterable of objects to validate, or of their encodings
+        workers -- number of processes (default=os.cpu_count()), or 1 to
+            validate in this process, which is also done with a single CPU
+        ordered -- generate the reports in the order of the objects, instead
+            of as soon as they are ready
+        chunkSize -- number of objects sent to a process at a time
+        registry -- CDRegistry with the content dictionaries (default=cdRegistry)
+        memo -- ValidationMemo to reuse the results of repeated subtrees
+            (default=None). Every process has its own, of the same size.
+    """
+    if registry is None:
+        registry = cdRegistry
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1 or os.cpu_count() == 1:
+        for i, obj in enumerate(objects):
+            if not isOM(obj):
+                obj = _decode(obj, memo is not None)
+            report = check(obj, registry, memo)
+            report.index = i
+            yield report
+        return
+
+    memoEntries = memo.maxEntries if memo is not None else None
+    executor = ProcessPoolExecutor(
+        workers, initializer=_initWorker, initargs=(registry, memoEntries)
+    )
+    try:
+        futures = deque()
+        for chunk in _chunks(objects, chunkSize):
+            futures.append(executor.submit(_checkChunk, *chunk))
+            while len(futures) >= 2 * workers:
+                yield from _collect(futures, ordered)
+        while futures:
+            yield from _collect(futures, ordered)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _chunks(objects, chunkSize):
+    """Split the objects in (index of the first one, encoded objects) pairs"""
+    chunk = []
+    start = 0
+    for i, obj in enumerate(objects):
+        chunk.append(obj.toBinary() if isOM(obj) else obj)
+        if len(chunk) == chunkSize:
+            yield start, chunk
+            chunk = []
+            start = i + 1
+    if chunk:
+        yield start, chunk
+
+
+def _collect(futures, ordered):
+    """Get the reports of the first chunk, or of any finished one"""
+    if ordered:
+        future = futures.popleft()
+    else:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        futures.remove(future)
+    return future.result()
+
+
+_workerRegistry = None
+_workerMemo = None
+
+def _initWorker(registry, memoEntries):
+    global _workerRegistry, _workerMemo
+    _workerRegistry = registry
+    _workerMemo = ValidationMemo(memoEntries) if memoEntries else None
+
+
+def _checkChunk(start, chunk):
+    reports = []
+    for i, data in enumerate(chunk):
+        obj = _decode(data, _workerMemo is not None)
+        report = check(obj, _workerRegistry, _workerMemo)
+        report.index = start + i
+        reports.append(report)
+    return reports
+
+
+def _decode(data, hashed):
+    """Parse an object in the binary encoding, or in XML or JSON if it is text"""
+    if isinstance(data, str):
+        parseText = parseJSON if data.lstrip()[:1] == "{" else parseXML
+        return parseText(data, hashed=hashed)
+    return parseBinary(data, hashed=hashed)
+
+
+def getCDAndSymbolDefinition(symbol, registry=None):
+    if registry is None:
+        registry = cdRegistry
+    return registry.lookup(symbol)
 
 
 def loadCDFromFile(filepath):
     with open(filepath) as fh:
-        cd.append(
-            parseCD(fh.read())
-        )
+        cdRegistry.add(parseCD(fh.read()))
+
 
+def _loadCDs(argPath=None, registry=None, cache=True):
+    """Load the content dictionaries of the default directories
 
-def _loadCDs(cd_paths, on_experimental, on_obsolete):
+    They are the ones given, those in the OM_CD_PATH environment variable,
+    separated by semicolons, ./cd and the current directory. Each directory
+    keeps a compiled cache of its dictionaries (see cd.cache.loadDirectory).
+    """
+    if registry is None:
+        registry = cdRegistry
     argPath = argPath if argPath is not None else []
     envPath = os.environ.get(OM_CD_PATH_VAR, "").split(";")
     routeNames = [
@@ -95,10 +410,7 @@ def _loadCDs(cd_paths, on_experimental, on_obsolete):
     routeNames = [x.strip() for x in routeNames if len(x.strip()) > 0]
 
     for routeName in routeNames:
-        route = pathlib.Path(route)
-    
-        if route.exists and route.is_dir:
-    
-            for filepath in route:
-                if filepath.suffix.lower() == ".ocd":
-                    loadCDFromFile(filepath)
\ No newline at end of file
+        route = pathlib.Path(routeName)
+
+        if route.is_dir():
+            loadDirectory(route, registry, cache)
@@ -7,49 +7,53 @@ def of(kind: str, **kargs):
     return map[kind](**kargs)
 
 def genOMobject():
-    return of(choice(map.keys()))
+    return of(choice(list(map)))
 
-def genOMinteger(value=randint(-1000, 1000)):
-    return OMInteger(value)
+def genOMinteger(value=None):
+    return OMInteger(randint(-1000, 1000) if value is None else value)
 
-def genOMstring(value=choice(["foo","bar","baz"])):
-    return OMString(value)
+def genOMstring(value=None):
+    return OMString(choice(["foo","bar","baz"]) if value is None else value)
 
-def genOMbytearray(value=randbytes(8)):
-    return OMBytearray(value)
+def genOMbytearray(value=None):
+    return OMBytearray(randbytes(8) if value is None else value)
 
-def genOMfloat(value=random()):
-    return OMFloat(value)
+def genOMfloat(value=None):
+    return OMFloat(random() if value is None else value)
 
-def genOMsymbol(name=choice([
-        "sym_foo",
-        "sym_bar",
-        "sym_baz",
-    ]), cd="test_cd"):
+def genOMsymbol(name=None, cd="test_cd"):
+    if name is None:
+        name = choice([
+            "sym_foo",
+            "sym_bar",
+            "sym_baz",
+        ])
     return OMSymbol(name, cd)
 
-def genOMvariable(name=choice([
-        "var_foo",
-        "var_bar",
-        "var_baz",
-    ])):
+def genOMvariable(name=None):
+    if name is None:
+        name = choice([
+            "var_foo",
+            "var_bar",
+            "var_baz",
+        ])
     return OMVariable(name)
 
-def genOMapplication(symbol=genOMsymbol(), args=()):
-    return OMApplication(symbol, args)
+def genOMapplication(symbol=None, args=()):
+    return OMApplication(genOMsymbol() if symbol is None else symbol, args)
 
-def genOMbinding(
-        symbol=genOMsymbol(), 
-        variables=(genOMvariable(), genOMvariable()),
-        object_=genOMsymbol()
-    ):
-    return OMBinding(symbol, variables, object_)
+def genOMbinding(symbol=None, variables=None, object_=None):
+    return OMBinding(
+        genOMsymbol() if symbol is None else symbol,
+        (genOMvariable(), genOMvariable()) if variables is None else variables,
+        genOMsymbol() if object_ is None else object_,
+    )
 
-def genOMattribution(
-        object_=genOMsymbol(),
-        attributes=((genOMsymbol(), genOMstring()),)
-    ):
-    return OMAttribution(attributes, object_)
+def genOMattribution(object_=None, attributes=None):
+    return OMAttribution(
+        ((genOMsymbol(), genOMstring()),) if attributes is None else attributes,
+        genOMsymbol() if object_ is None else object_,
+    )
 
 map = {
     OMInteger.kind: genOMinteger,
@@ -59,10 +63,9 @@ map = {
     OMSymbol.kind: genOMsymbol,
     OMVariable.kind: genOMvariable,
     OMApplication.kind: genOMapplication,
-    OMVariable.kind: genOMvariable,
     OMBinding.kind: genOMbinding,
     OMAttribution.kind: genOMattribution,
     # OMReference.kind: genOMreference,
     # OMError.kind: genOMerror,
     # OMForeign.kind: genOMforeign,
-}
\ No newline at end of file
+}
@@ -0,0 +1,20 @@
+import unittest
+from openmath import *
+from benchmark import run, compare, makeTree, countNodes
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_trees(self):
+        tree = makeTree(3, 2)
+        self.assertIsInstance(tree, OMObject)
+        self.assertGreaterEqual(countNodes(tree), 1 + 7 * 2 + 8)  # with the applicants
+        self.assertEqual(makeTree(3, 2), makeTree(3, 2))
+        self.assertEqual(countNodes(makeTree(100, 1)), countNodes(makeTree(100, 1)))
+
+    def test_run(self):
+        results = run(["deep"], ["toJSON", "validate"], repeat=1, minTime=0)
+        self.assertEqual(sorted(results), ["deep/toJSON", "deep/validate"])
+        self.assertIn("MBPerSecond", results["deep/toJSON"])
+        slower = {k: dict(v, seconds=v["seconds"] / 2) for k, v in results.items()}
+        self.assertEqual(compare(results, results), [])
+        self.assertEqual([k for k, _ in compare(results, slower)], ["deep/toJSON", "deep/validate"])
@@ -0,0 +1,252 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
+from openmath import *
+from openmath.cache import DocumentCache
+
+LIBRARY = OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+    OMInteger(1, id="one"), OMVariable("x", id="x"),
+]))
+
+def referring(href, n=3):
+    return OMObject(OMApplication(OMSymbol("times", "arith1"), [
+        OMReference(href) for _ in range(n)
+    ]))
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "library.xml")
+        with open(self.path, "w") as fh:
+            fh.write(LIBRARY.toXML())
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_parsed_once(self):
+        cache = DocumentCache()
+        obj = referring(self.path + "#one")
+        obj.dereference(cache=cache)
+        self.assertEqual(cache.stats()["misses"], 1)
+        self.assertEqual(cache.stats()["hits"], 2)
+        args = obj.object.arguments
+        self.assertEqual(list(args), [OMInteger(1, id="one")] * 3)
+        # every reference gets its own copy, the cached document is untouched
+        self.assertIsNot(args[0], args[1])
+        self.assertIs(args[0].parent, obj.object)
+        self.assertEqual(cache.get(self.path), LIBRARY)
+
+    def test_frozen_documents(self):
+        cache = DocumentCache()
+        with self.assertRaises(AttributeError):
+            cache.get(self.path).setObject(OMInteger(2))
+        target = OMReference(self.path + "#one").resolve(cache)  # without parent
+        self.assertIs(target, cache.get(self.path).getByID("one"))
+        obj = referring(self.path + "#x", 1)
+        obj.dereference(cache=cache)
+        obj.object.arguments[0].name = "y"  # a copy, the document is untouched
+        self.assertEqual(cache.get(self.path), LIBRARY)
+
+    def test_inherited_cdbase(self):
+        path = os.path.join(self.dir.name, "cdbase.xml")
+        with open(path, "w") as fh:
+            fh.write(OMObject(OMApplication(OMSymbol("plus", "arith1", id="plus"), []),
+                              cdbase="http://example.org/cd").toXML())
+        obj = referring(path + "#plus", 1)
+        obj.dereference(cache=DocumentCache())
+        symbol = obj.object.arguments[0]
+        self.assertIs(symbol.parent, obj.object)
+        self.assertEqual(symbol.getCDBase(), "http://example.org/cd")
+
+    def test_modified_file(self):
+        cache = DocumentCache()
+        cache.get(self.path)
+        changed = OMObject(OMInteger(2, id="one"))
+        with open(self.path, "w") as fh:
+            fh.write(changed.toXML())
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual(cache.get(self.path), changed)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_eviction(self):
+        cache = DocumentCache(maxEntries=2)
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(self.dir.name, "%d.json" % i))
+            with open(paths[-1], "w") as fh:
+                fh.write(OMObject(OMInteger(i)).toJSON())
+        for path in paths:
+            cache.get(path)
+        cache.get(paths[1])  # most recently used
+        cache.get(paths[0])
+        self.assertNotIn(paths[2], cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_size_bound(self):
+        cache = DocumentCache(maxSize=1)
+        cache.get(self.path)
+        self.assertEqual(len(cache), 1)  # the newest entry is always kept
+        cache.invalidate(self.path)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_missing_file(self):
+        with self.assertRaises(RuntimeError):
+            DocumentCache().get(os.path.join(self.dir.name, "missing.xml"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    body = LIBRARY.toJSON().encode("utf8")
+    etag = '"v1"'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+class TestHTTPCache(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/library.json" % self.server.server_port
+        _Handler.requests = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        _Handler.etag = '"v1"'
+
+    def test_etag_revalidation(self):
+        cache = DocumentCache()
+        first = cache.get(self.url)
+        self.assertIs(cache.get(self.url), first)
+        self.assertEqual(_Handler.requests, [None, '"v1"'])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_modified_document(self):
+        cache = DocumentCache()
+        first = cache.get(self.url)
+        _Handler.etag = '"v2"'
+        second = cache.get(self.url)
+        self.assertIsNot(second, first)
+        self.assertEqual(cache._entries[self.url].validator[0], '"v2"')
+        self.assertEqual(_Handler.requests, [None, '"v1"'])
+        self.assertIs(cache.get(self.url), second)
+
+    def test_max_age(self):
+        cache = DocumentCache(maxAge=60)
+        referring(self.url + "#x").dereference(cache=cache)
+        self.assertEqual(len(_Handler.requests), 1)
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.1)
+        n = int(self.path.strip("/").split(".")[0])
+        body = OMObject(OMInteger(n, id="n")).toJSON().encode("utf8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with cls.lock:
+            cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+class _QuietServer(ThreadingHTTPServer):
+    """Server that ignores the clients disconnecting before the answer"""
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+class TestConcurrentDereference(unittest.TestCase):
+
+    def setUp(self):
+        self.server = _QuietServer(("127.0.0.1", 0), _SlowHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = "http://127.0.0.1:%d/" % self.server.server_port
+        _SlowHandler.active = _SlowHandler.peak = 0
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sample(self, n):
+        return OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMReference("%s%d.json#n" % (self.base, i)) for i in range(n)
+        ] + [OMReference("%s0.json#n" % self.base)]))
+
+    def test_concurrent(self):
+        cache = DocumentCache()
+        obj = self.sample(8)
+        obj.dereference(cache=cache, workers=4)
+        self.assertEqual(
+            list(obj.object.arguments),
+            [OMInteger(i, id="n") for i in range(8)] + [OMInteger(0, id="n")],
+        )
+        self.assertGreater(_SlowHandler.peak, 1)
+        self.assertLessEqual(_SlowHandler.peak, 4)
+        self.assertEqual(cache.stats()["misses"], 8)
+
+    def test_sequential(self):
+        self.sample(3).dereference(cache=DocumentCache())
+        self.assertEqual(_SlowHandler.peak, 1)
+
+    def test_no_revalidation_during_walk(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        _Handler.requests = []
+        base = "http://127.0.0.1:%d/" % server.server_port
+        sample = lambda: OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMReference("%s%d.json#%s" % (base, i % 3, name))
+            for i in range(6) for name in ("one", "x")
+        ]))
+        cache = DocumentCache()
+        sample().dereference(cache=cache, workers=4)
+        self.assertEqual(_Handler.requests, [None] * 3)
+        # a later walk revalidates every document once, in the prefetch
+        sample().dereference(cache=cache, workers=4)
+        self.assertEqual(_Handler.requests, [None] * 3 + ['"v1"'] * 3)
+        self.assertEqual(cache.stats()["misses"], 3)
+
+    def test_timeout(self):
+        cache = DocumentCache(timeout=0.01)
+        with self.assertRaises(RuntimeError):
+            cache.get(self.base + "0.json")
+
+    def test_unreachable(self):
+        obj = OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMReference(self.base + "0.json#n"),
+            OMReference("http://127.0.0.1:1/missing.json#n"),
+        ]))
+        with self.assertRaises(RuntimeError):
+            obj.dereference(cache=DocumentCache(), workers=4)
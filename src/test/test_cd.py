@@ -0,0 +1,119 @@
+import unittest
+import os
+import pickle
+import tempfile
+from openmath import *
+from openmath.cd import CDRegistry, SymbolDefinition
+from openmath.cd.cache import loadDirectory, CACHE_NAME
+from openmath.cd.parser import parseXML
+
+CD = """<CD xmlns="http://www.openmath.org/OpenMathCD">
+<CDName>%s</CDName>
+<CDBase>http://www.openmath.org/cd</CDBase>
+<CDStatus>official</CDStatus>
+<Description> Test dictionary </Description>
+<CDDefinition>
+<Name>%s</Name>
+<Role>application</Role>
+<Description>A symbol</Description>
+<CMP>a + b = b + a</CMP>
+<FMP><OMOBJ xmlns="http://www.openmath.org/OpenMath"><OMS cd="logic1" name="true"/></OMOBJ></FMP>
+<Example>
+An example
+<OMOBJ xmlns="http://www.openmath.org/OpenMath"><OMA><OMS cd="arith1" name="plus"/><OMI>1</OMI><OMI>2</OMI></OMA></OMOBJ>
+</Example>
+</CDDefinition>
+</CD>
+"""
+
+class TestParseCD(unittest.TestCase):
+
+    def test_parse(self):
+        cd = parseXML(CD % ("arith1", "plus"))
+        self.assertEqual((cd.name, cd.status, cd.description), ("arith1", "official", "Test dictionary"))
+        self.assertIsNone(cd.review)
+        plus = cd["plus"]
+        self.assertEqual(plus.role, "application")
+        self.assertEqual(plus.cmp, ["a + b = b + a"])
+        self.assertEqual(plus.fmp, [OMObject(OMSymbol("true", "logic1"))])
+        text, objects = plus.examples[0]
+        self.assertEqual(text.strip(), "An example")
+        self.assertEqual(objects[0].object.arguments, (OMInteger(1), OMInteger(2)))
+
+    def test_lazy_objects(self):
+        definition = parseXML(CD % ("arith1", "plus"))["plus"]
+        self.assertIsNone(definition._fmp)
+        self.assertIsNone(definition._examples)
+        self.assertEqual(len(definition.examples), 1)
+        self.assertIsNone(definition._fmp)
+        self.assertIs(definition.fmp, definition.fmp)
+        definition.fmp = []
+        self.assertEqual(definition.fmp, [])
+        self.assertEqual(SymbolDefinition(name="x").examples, [])
+        self.assertIsNone(SymbolDefinition(name="x", fmp=None).fmp)
+
+    def test_repr_unparsed(self):
+        definition = parseXML(CD % ("arith1", "plus"))["plus"]
+        self.assertIn("name='plus'", repr(definition))
+        self.assertEqual(definition, parseXML(CD % ("arith1", "plus"))["plus"])
+        self.assertIsNone(definition._fmp)
+        self.assertIsNone(definition._examples)
+
+
+class TestCDCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        for name, symbol in (("arith1", "plus"), ("transc1", "sin")):
+            self.write(name, symbol)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, name, symbol):
+        path = os.path.join(self.dir.name, name + ".ocd")
+        with open(path, "w") as fh:
+            fh.write(CD % (name, symbol))
+        return path
+
+    def test_lazy_loading(self):
+        self.assertEqual(loadDirectory(self.dir.name, CDRegistry()), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, CACHE_NAME)))
+
+        registry = CDRegistry()
+        loadDirectory(self.dir.name, registry)
+        self.assertEqual(registry.stats()["cds"], 2)
+        self.assertEqual(registry.stats()["loaded"], 0)
+        # lazy registries can be sent to other processes
+        self.assertIn(OMSymbol("plus", "arith1"), pickle.loads(pickle.dumps(registry)))
+        cd, definition = registry.lookup(OMSymbol("sin", "transc1"))
+        self.assertEqual((cd.name, definition.role), ("transc1", "application"))
+        self.assertEqual(definition.fmp, [OMObject(OMSymbol("true", "logic1"))])
+        self.assertEqual(registry.stats()["loaded"], 1)
+        self.assertEqual(registry.lookup(OMSymbol("cos", "transc1")), (None, None))
+        self.assertEqual(len(list(registry)), 2)
+
+    def test_invalidation(self):
+        loadDirectory(self.dir.name, CDRegistry())
+        path = self.write("transc1", "cos")
+        os.utime(path, ns=(0, 0))
+        os.remove(os.path.join(self.dir.name, "arith1.ocd"))
+        self.write("set1", "in")
+
+        registry = CDRegistry()
+        self.assertEqual(loadDirectory(self.dir.name, registry), 2)
+        self.assertIn(OMSymbol("cos", "transc1"), registry)
+        self.assertNotIn(OMSymbol("plus", "arith1"), registry)
+
+        # the rewritten cache is used by the next registry
+        registry = CDRegistry()
+        loadDirectory(self.dir.name, registry)
+        self.assertEqual(registry.stats()["loaded"], 0)
+        self.assertIn(OMSymbol("in", "set1"), registry)
+        self.assertIn(OMSymbol("cos", "transc1"), registry)
+
+    def test_without_cache(self):
+        registry = CDRegistry()
+        loadDirectory(self.dir.name, registry, cache=False)
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, CACHE_NAME)))
+        self.assertEqual(registry.stats()["loaded"], 2)
@@ -0,0 +1,52 @@
+import unittest
+import os
+import tempfile
+from openmath import *
+from openmath.validator import check
+from benchmark.corpus import CorpusGenerator, makeRegistry, readCorpus, symbolsFromCDs
+
+class TestCorpus(unittest.TestCase):
+
+    def test_deterministic(self):
+        objects = list(CorpusGenerator(seed=3).generateMany(5))
+        self.assertEqual(objects, list(CorpusGenerator(seed=3).generateMany(5)))
+        self.assertNotEqual(objects, list(CorpusGenerator(seed=4).generateMany(5)))
+
+    def test_shape(self):
+        deep = CorpusGenerator(depth=3000, fanout=1, complete=True).generate()
+        self.assertEqual(sum(1 for x in deep.iterNodes() if x.kind == OMApplication.kind), 3000)
+        wide = CorpusGenerator(depth=1, fanout=500, complete=True).generate()
+        applications = [x for x in wide.iterNodes() if x.kind == OMApplication.kind]
+        self.assertEqual([len(x.arguments) for x in applications], [500])
+
+    def test_references(self):
+        obj = CorpusGenerator(depth=5, sharing=0.5).generate()
+        self.assertTrue(any(x.kind == OMReference.kind for x in obj.iterNodes()))
+        self.assertFalse(obj.getDuplicateIDs())
+        obj.dereference()
+        self.assertFalse(any(x.kind == OMReference.kind for x in obj.iterNodes()))
+
+    def test_symbols(self):
+        registry = makeRegistry()
+        for obj in CorpusGenerator(depth=4).generateMany(10):
+            self.assertEqual(check(obj, registry).failures(), [])
+        symbols = symbolsFromCDs(makeRegistry([("arith1", "plus", "application", 1)]))
+        obj = CorpusGenerator(depth=2, symbols=symbols).generate()
+        self.assertEqual({x.name for x in obj.iterNodes() if x.kind == OMSymbol.kind}, {"plus"})
+
+    def test_payloads(self):
+        obj = CorpusGenerator(bytesSize=100, integerDigits=50).generate()
+        for node in obj.iterNodes():
+            if node.kind == OMBytearray.kind:
+                self.assertEqual(len(node.bytes), 100)
+            elif node.kind == OMInteger.kind:
+                self.assertEqual(len(str(abs(node.integer))), 50)
+
+    def test_files(self):
+        objects = list(CorpusGenerator(depth=4).generateMany(20))
+        with tempfile.TemporaryDirectory() as directory:
+            for encoding, extension in (("xml", ".xml"), ("json", ".jsonl"), ("binary", ".bin")):
+                path = os.path.join(directory, "corpus" + extension)
+                with open(path, "wb") as fh:
+                    CorpusGenerator(depth=4).write(fh, 20, encoding)
+                self.assertEqual(list(readCorpus(path)), objects, encoding)
@@ -0,0 +1,76 @@
+import math
+import unittest
+from openmath import *
+from openmath.evaluator import Compiler, compileExpression, evaluate
+
+def apply(name, cd, *arguments):
+    return OMApplication(OMSymbol(name, cd), list(arguments))
+
+x = OMVariable("x")
+y = OMVariable("y")
+
+class TestEvaluator(unittest.TestCase):
+
+    def test_arithmetic(self):
+        obj = apply("plus", "arith1",
+            apply("times", "arith1", x, x),
+            apply("unary_minus", "arith1", OMInteger(3)),
+            apply("divide", "arith1", y, OMFloat(-2.0)),
+        )
+        f = compileExpression(obj)
+        self.assertEqual(f.variables, ("x", "y"))
+        self.assertEqual(f(4, 1), 16 - 3 - 0.5)
+        self.assertEqual(evaluate(obj, x=4, y=1), 12.5)
+        self.assertEqual(compileExpression(obj, ["y", "x"])(1, 4), 12.5)
+        self.assertIn(" * ", f.source)
+
+    def test_functions_and_constants(self):
+        obj = OMObject(apply("sin", "transc1", apply("divide", "arith1", OMSymbol("pi", "nums1"), OMInteger(2))))
+        self.assertAlmostEqual(evaluate(obj), 1.0)
+        self.assertTrue(evaluate(apply("lt", "relation1", x, OMInteger(2)), x=1))
+        self.assertFalse(evaluate(apply("and", "logic1", OMSymbol("true", "logic1"), OMSymbol("false", "logic1"))))
+        for name, operands, expected in (("and", (2, 3), True), ("or", (0, ""), False), ("and", [1] * 100, True)):
+            obj = apply(name, "logic1", *(OMVariable("v%d" % i) for i in range(len(operands))))
+            arguments = {"v%d" % i: x for i, x in enumerate(operands)}
+            self.assertIs(evaluate(obj, **arguments), expected)
+            self.assertIs(compileExpression(obj)(*operands), expected)
+        self.assertTrue(evaluate(OMAttribution([(OMSymbol("type", "sts"), OMString("a"))], OMSymbol("true", "logic1"))))
+
+    def test_lambda(self):
+        square = OMBinding(OMSymbol("lambda", "fns1"), [x], apply("power", "arith1", x, y))
+        f = evaluate(square, y=2)
+        self.assertTrue(callable(f))
+        self.assertEqual(f(5), 25)
+        self.assertEqual(evaluate(OMApplication(square, [OMInteger(3)]), y=3), 27)
+        total = apply("sum", "arith1", apply("integer_interval", "interval1", OMInteger(1), OMInteger(4)), square)
+        self.assertEqual(evaluate(total, y=2), 30)
+        self.assertEqual(compileExpression(total).variables, ("y",))
+
+    def test_deep(self):
+        obj = x
+        for i in range(5000):
+            obj = apply("plus", "arith1", obj, OMInteger(1))
+        self.assertEqual(evaluate(obj, x=1), 5001)
+        wide = apply("plus", "arith1", *(OMInteger(i) for i in range(3000)))
+        self.assertEqual(evaluate(wide), sum(range(3000)))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, evaluate, apply("foo", "bar", x), x=1)
+        self.assertRaises(ValueError, evaluate, OMError(OMSymbol("foo", "bar"), []))
+        self.assertRaises(ValueError, compileExpression, x, ["y"])
+
+    def test_cache(self):
+        compiler = Compiler()
+        obj = apply("plus", "arith1", x, OMInteger(1))
+        f = compiler.compile(obj)
+        self.assertIs(compiler.compile(apply("plus", "arith1", OMVariable("x"), OMInteger(1))), f)
+        self.assertIsNot(compiler.compile(obj, ["x"]), f)
+        self.assertEqual(compiler.stats(), {"entries": 2, "hits": 1, "misses": 2})
+
+        obj.arguments[1].integer = 2
+        self.assertEqual(compiler.compile(obj)(1), 3)
+
+        compiler.register("arith1", "plus", lambda *args: math.prod(args))
+        self.assertEqual(compiler.stats()["entries"], 0)
+        self.assertEqual(compiler.evaluate(obj, x=3), 6)
+        self.assertEqual(evaluate(obj, x=3), 5)
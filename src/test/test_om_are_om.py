@@ -22,6 +22,11 @@ class TestInteger(unittest.TestCase):
             self.assertTrue(isOM(mother.of(kind)), f"{kind} should be OM")
             self.assertTrue(isOM(mother.of(kind), kind), f"{kind} should be OM of kind {kind}")
     
+    def test_random_objects(self):
+        self.assertTrue(all(isOM(mother.genOMobject()) for _ in range(20)))
+        # the defaults are drawn on every call
+        self.assertGreater(len({mother.genOMinteger().integer for _ in range(20)}), 1)
+
     def test_is_not_om(self):
 
         self.assertFalse(isOM(1))
@@ -0,0 +1,340 @@
+import unittest
+from openmath import *
+from openmath.cursor import Cursor
+from openmath.parser import parseXML
+import test.om_mother as mother
+
+class TestFields(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        for kind in mother.map:
+            obj = mother.of(kind)
+            self.assertFalse(hasattr(obj, "__dict__"), f"{kind} should use slots")
+            with self.assertRaises(AttributeError):
+                obj.undeclared = None
+
+    def test_fields_are_set(self):
+        for kind in mother.map:
+            obj = mother.of(kind)
+            for field in (*obj._fields, "parent"):
+                getattr(obj, field)
+            self.assertEqual(list(obj._fields), sorted(obj._fields))
+
+    def test_object_keywords(self):
+        obj = OMObject(OMInteger(1), cdbase="http://example.org/cd", id="o")
+        self.assertEqual(obj.toDict()["cdbase"], "http://example.org/cd")
+        with self.assertRaises(TypeError):
+            OMObject(OMInteger(1), unknown="x")
+
+
+class TestEquality(unittest.TestCase):
+
+    def sample(self, n=2):
+        return OMApplication(OMSymbol("plus", "arith1"), [OMInteger(n), OMVariable("x")])
+
+    def test_equal(self):
+        self.assertEqual(self.sample(), self.sample())
+        self.assertNotEqual(self.sample(1), self.sample(2))
+        self.assertNotEqual(self.sample(), OMVariable("x"))
+        self.assertNotEqual(self.sample(), "x")
+
+    def test_hash(self):
+        self.assertEqual(hash(self.sample()), hash(self.sample()))
+        counts = {}
+        for obj in (self.sample(1), self.sample(2), self.sample(1)):
+            counts[obj] = counts.get(obj, 0) + 1
+        self.assertEqual(counts, {self.sample(1): 2, self.sample(2): 1})
+
+    def test_setter_invalidates_hash(self):
+        obj = OMObject(self.sample(1))
+        before = hash(obj)
+        obj.object.setArguments([OMInteger(2), OMVariable("x")])
+        self.assertNotEqual(hash(obj), before)
+        self.assertEqual(obj, OMObject(self.sample(2)))
+        self.assertEqual(hash(obj), hash(OMObject(self.sample(2))))
+
+    def test_cdbase(self):
+        a = OMApplication(OMSymbol("plus", "arith1"), [], cdbase="http://a")
+        b = OMApplication(OMSymbol("plus", "arith1", "http://a"), [])
+        c = OMApplication(OMSymbol("plus", "arith1"), [], cdbase="http://c")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        self.assertNotEqual(a.applicant, c.applicant)
+
+    def test_deep(self):
+        a, b = OMVariable("x"), OMVariable("x")
+        for i in range(5000):
+            a = OMApplication(OMSymbol("minus", "arith1"), [a])
+            b = OMApplication(OMSymbol("minus", "arith1"), [b])
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(a, b)
+        self.assertIn(b, {a})
+
+
+class TestTraversal(unittest.TestCase):
+
+    def sample(self):
+        return OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMInteger(1, id="one"),
+            OMBinding(OMSymbol("lambda", "fns1"), [OMVariable("x")], OMReference("#one")),
+        ]))
+
+    def kinds(self, nodes):
+        return [x.kind for x in nodes]
+
+    def test_pre_order(self):
+        self.assertEqual(
+            self.kinds(self.sample().iterNodes()),
+            ["OMOBJ", "OMA", "OMS", "OMI", "OMBIND", "OMS", "OMV", "OMR"],
+        )
+
+    def test_post_order(self):
+        self.assertEqual(
+            self.kinds(self.sample().iterNodes("post")),
+            ["OMS", "OMI", "OMS", "OMV", "OMR", "OMBIND", "OMA", "OMOBJ"],
+        )
+
+    def test_shared_nodes_once(self):
+        x = OMVariable("x")
+        obj = OMApplication(OMSymbol("plus", "arith1"), [x, x])
+        self.assertEqual(len(list(obj.iterNodes())), 3)
+
+    def test_get_by_id(self):
+        obj = self.sample()
+        self.assertIs(obj.getByID("one"), obj.object.arguments[0])
+        self.assertIsNone(obj.getByID("two"))
+
+    def test_contains(self):
+        obj = self.sample()
+        self.assertIn(OMVariable("x"), obj)
+        self.assertIn(OMSymbol("lambda", "fns1"), obj)
+        self.assertNotIn(OMVariable("y"), obj)
+
+    def test_dereference(self):
+        obj = self.sample()
+        obj.dereference()
+        binding = obj.object.arguments[1]
+        self.assertEqual(binding.object, OMInteger(1, id="one"))
+        self.assertIs(binding.object.parent, binding)
+
+    def test_cyclic_reference(self):
+        obj = OMApplication(OMSymbol("plus", "arith1"), [OMReference("#a")], id="a")
+        with self.assertRaises(RuntimeError):
+            OMObject(obj).dereference()
+
+
+class TestIDIndex(unittest.TestCase):
+
+    def sample(self):
+        return OMApplication(OMSymbol("plus", "arith1"), [
+            OMInteger(1, id="a"),
+            OMApplication(OMSymbol("times", "arith1"), [
+                OMVariable("x", id="b"), OMInteger(2, id="c"),
+            ], id="d"),
+        ])
+
+    def test_lookup(self):
+        obj = self.sample()
+        self.assertIs(obj.getByID("b"), obj.arguments[1].arguments[0])
+        self.assertIsNone(obj.getByID("z"))
+        # only descendants are found
+        self.assertIsNone(obj.arguments[1].getByID("a"))
+        self.assertIs(obj.arguments[1].getByID("c"), obj.arguments[1].arguments[1])
+
+    def test_setters_update_index(self):
+        obj = self.sample()
+        obj.getByID("a")  # build the index
+        inner = obj.arguments[1]
+        inner.setArguments([OMInteger(3, id="e")])
+        self.assertIsNone(obj.getByID("b"))
+        self.assertIs(obj.getByID("e"), inner.arguments[0])
+        inner.setApplicant(OMSymbol("minus", "arith1", id="f"))
+        self.assertIs(obj.getByID("f"), inner.applicant)
+
+    def test_detached_subtree(self):
+        obj = self.sample()
+        obj.getByID("a")
+        inner = obj.arguments[1]
+        obj.setArguments([OMInteger(1)])
+        self.assertIsNone(inner.parent)
+        self.assertIsNone(obj.getByID("b"))
+        self.assertIs(inner.getByID("b"), inner.arguments[0])
+
+        # children set again are still attached
+        kept = obj.arguments[0]
+        obj.setArguments([kept, OMInteger(2)])
+        self.assertIs(kept.parent, obj)
+
+    def test_replace_updates_index(self):
+        obj = self.sample()
+        obj.getByID("a")
+        old = obj.arguments[1]
+        obj._replace(old, OMString("s", id="g"))
+        self.assertIsNone(old.parent)
+        self.assertIsNone(obj.getByID("d"))
+        self.assertIs(obj.getByID("g"), obj.arguments[1])
+
+    def test_attached_subtree(self):
+        inner = self.sample()
+        inner.getByID("a")
+        outer = OMObject(inner)
+        self.assertIsNone(inner._index)
+        self.assertIs(outer.getByID("a"), inner.arguments[0])
+
+    def test_shared_subtree(self):
+        shared = OMApplication(OMSymbol("minus", "arith1"), [OMInteger(1, id="k")]).freeze()
+        obj = self.sample()
+        obj.setArguments([shared, shared, OMInteger(2)])
+        self.assertIs(obj.getByID("k"), shared.arguments[0])  # indexed once
+        obj.setArguments([shared, OMInteger(3)])
+        self.assertIs(obj.getByID("k"), shared.arguments[0])
+        obj.setArguments([OMInteger(4)])
+        self.assertIsNone(obj.getByID("k"))
+
+    def test_id_set_after_index(self):
+        obj = self.sample()
+        obj.getByID("a")
+        obj.arguments[1].arguments[1].id = "late"
+        obj.arguments[1].setArguments([OMInteger(5, id="h")])
+        self.assertIsNone(obj.getByID("late"))
+        self.assertIs(obj.getByID("h"), obj.arguments[1].arguments[0])
+        self.assertIs(obj.getByID("d"), obj.arguments[1])
+
+    def test_duplicate_ids(self):
+        obj = self.sample()
+        self.assertEqual(obj.getDuplicateIDs(), {})
+        obj.arguments[1].setArguments([OMInteger(3, id="a")])
+        duplicates = obj.getDuplicateIDs()
+        self.assertEqual(list(duplicates), ["a"])
+        self.assertEqual(len(duplicates["a"]), 2)
+
+
+class TestSharing(unittest.TestCase):
+
+    def expression(self, id=None):
+        return OMApplication(OMSymbol("plus", "arith1"), [
+            OMVariable("x"),
+            OMApplication(OMSymbol("sin", "transc1"), [OMVariable("y")]),
+        ], id=id)
+
+    def sample(self):
+        return OMObject(OMApplication(OMSymbol("times", "arith1"), [
+            self.expression(), OMInteger(1, id="s1"), self.expression(),
+        ]))
+
+    def test_shared(self):
+        obj = self.sample()
+        shared = obj.shared()
+        args = shared.object.arguments
+        self.assertEqual(args[0].id, "s2")  # s1 is already used
+        self.assertEqual(args[2], OMReference("#s2"))
+        self.assertIs(args[2].parent, shared.object)
+        self.assertEqual(obj, self.sample())  # the original is not modified
+
+    def test_threshold(self):
+        obj = self.sample()
+        self.assertEqual(obj.shared(minSize=7), obj)
+        # the inner application is shared, but not inside the repeated one
+        shared = obj.shared(minSize=2)
+        self.assertEqual(shared.object.arguments[0].arguments[1].id, None)
+        self.assertEqual(shared.object.arguments[2], OMReference("#s2"))
+
+    def test_existing_id(self):
+        obj = OMObject(OMApplication(OMSymbol("times", "arith1"), [
+            self.expression("e"), self.expression("e"),
+        ]))
+        self.assertEqual(obj.shared().object.arguments[1], OMReference("#e"))
+
+    def test_binding_variables(self):
+        var = OMAttribution(
+            [(OMSymbol("type", "sts"), OMSymbol("NumericalValue", "sts"))], OMVariable("x")
+        )
+        obj = OMBinding(OMSymbol("lambda", "fns1"), [var, var.clone()], OMInteger(1))
+        self.assertEqual(obj.shared(minSize=2), obj)
+
+    def test_writers(self):
+        obj = self.sample()
+        for shared in (obj.toXML(share=True), obj.toJSON(share=True)):
+            self.assertIn("#s2", shared)
+        self.assertLess(len(obj.toBinary(share=True)), len(obj.toBinary()))
+        self.assertNotIn("#", obj.toXML())
+
+    def test_round_trip(self):
+        obj = self.sample()
+        copy = parseXML(obj.toXML(share=True))
+        copy.dereference()
+        for node in (copy.object.arguments[0], copy.object.arguments[2]):
+            self.assertEqual(node.id, "s2")
+            node.id = None
+            node._changed()
+        self.assertEqual(copy, obj)
+
+
+class TestFrozen(unittest.TestCase):
+
+    def sample(self):
+        return OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMApplication(OMSymbol("sin", "transc1"), [OMVariable("x")]),
+            OMAttribution([(OMSymbol("type", "sts"), OMString("t"))], OMInteger(1)),
+            OMBinding(OMSymbol("lambda", "fns1"), [OMVariable("y")], OMVariable("y")),
+        ]), cdbase="http://example.org/cd")
+
+    def test_clone(self):
+        obj = self.sample()
+        subtree = obj.object.arguments[0]
+        copy = subtree.clone()
+        self.assertEqual(copy, subtree)
+        self.assertIsNone(copy.parent)
+        self.assertIs(copy.arguments[0].parent, copy)
+        self.assertIsNot(copy.arguments[0], subtree.arguments[0])
+        self.assertEqual(obj.clone(), obj)
+        # the inherited cdbase is kept
+        symbol = obj.object.arguments[0].applicant.clone()
+        self.assertEqual(symbol.cdbase, "http://example.org/cd")
+
+    def test_clone_shares_frozen(self):
+        obj = self.sample()
+        frozen = obj.object.arguments[1].freeze()
+        self.assertIs(frozen.clone(), frozen)
+        copy = obj.clone()
+        self.assertIs(copy.object.arguments[1], frozen)
+        self.assertIsNot(obj.clone(thaw=True).object.arguments[1], frozen)
+        thawed = frozen.clone(thaw=True)
+        self.assertFalse(thawed.object._frozen)
+        self.assertEqual(thawed, frozen)
+
+    def test_immutable(self):
+        obj = self.sample().freeze()
+        with self.assertRaises(AttributeError):
+            obj.setObject(OMInteger(1))
+        with self.assertRaises(AttributeError):
+            obj.object.setArguments([])
+        with self.assertRaises(AttributeError):
+            obj._replace(obj.object, OMInteger(1))
+        self.assertIsNone(obj.object.parent)
+
+    def test_cursor(self):
+        obj = self.sample()
+        root = Cursor(obj)
+        self.assertTrue(obj._frozen)
+        variable = root.down().down(3).down(1)
+        self.assertEqual(variable.node, OMVariable("y"))
+        self.assertEqual(variable.depth(), 3)
+        self.assertEqual(variable.getCDBase(), "http://example.org/cd")
+        self.assertIs(variable.up().up().up(), root)
+        self.assertEqual(len(list(root.walk())), 14)
+
+    def test_cursor_replace(self):
+        obj = self.sample()
+        original = obj.clone()
+        cursor = Cursor(obj).down().down(2).down(1)  # OMString("t")
+        edited = cursor.replace(OMString("u"))
+        self.assertEqual(edited.node, OMString("u"))
+        new = edited.root().node
+        self.assertEqual(obj, original)  # the old tree is unchanged
+        self.assertEqual(new.object.arguments[1].attributes[0][1], OMString("u"))
+        # only the path to the root is copied
+        self.assertIsNot(new.object, obj.object)
+        self.assertIs(new.object.arguments[0], obj.object.arguments[0])
+        self.assertIs(new.object.arguments[2], obj.object.arguments[2])
+        self.assertTrue(new._frozen)
@@ -0,0 +1,403 @@
+import unittest
+from io import BytesIO, StringIO
+import xml.etree.ElementTree as ET
+import gc
+import json
+from openmath import *
+from openmath.parser import *
+from openmath import util
+from openmath.util import internOM
+
+class TestIterparseXML(unittest.TestCase):
+
+    def feed(self, count):
+        return (
+            b'<feed xmlns="http://www.openmath.org/OpenMath"><meta/>'
+            + b"".join(b"<OMOBJ><OMI>%d</OMI></OMOBJ>" % i for i in range(count))
+            + b"</feed>"
+        )
+
+    def test_yields_every_object(self):
+        objects = list(iterparseXML(BytesIO(self.feed(10))))
+        self.assertEqual(len(objects), 10)
+        for i, obj in enumerate(objects):
+            self.assertEqual(obj.kind, OMObject.kind)
+            self.assertEqual(obj.object.integer, i)
+
+    def test_single_object_document(self):
+        [obj] = iterparseXML(b'<OMOBJ><OMV name="x"/></OMOBJ>')
+        self.assertEqual(obj.object.name, "x")
+
+    def test_is_lazy(self):
+        objects = iterparseXML(self.feed(3))
+        self.assertEqual(next(objects).object.integer, 0)
+        self.assertEqual(next(objects).object.integer, 1)
+
+
+class TestIterparseJSON(unittest.TestCase):
+
+    def records(self):
+        return [
+            OMObject(OMInteger(1)),
+            OMObject(OMApplication(OMSymbol("plus", "arith1"), [OMVariable("x"), OMFloat(0.5)])),
+            OMObject(OMString("café")),
+        ]
+
+    def ndjson(self):
+        return "\n".join(x.toJSON() for x in self.records()).encode("utf8")
+
+    def test_yields_every_record(self):
+        objects = list(iterparseJSON(BytesIO(self.ndjson()), chunkSize=7))
+        self.assertEqual(objects, self.records())
+
+    def test_byte_chunks(self):
+        data = self.ndjson()
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+        self.assertEqual(list(iterparseJSON(chunks)), self.records())
+
+    def test_error_aborts_by_default(self):
+        with self.assertRaises(ValueError):
+            list(iterparseJSON([b'{"kind": "OMI", "integer": 1}\n', b"{oops\n"]))
+
+    def test_error_callback(self):
+        errors = []
+        data = b'{"kind": "OMV", "name": "x"}\n{oops\n\n{"kind": "OMNOPE"}\n{"kind": "OMI", "integer": 2}'
+        objects = list(iterparseJSON(BytesIO(data), onError=lambda n, e: errors.append(n)))
+        self.assertEqual(objects, [OMVariable("x"), OMInteger(2)])
+        self.assertEqual(errors, [2, 4])
+
+    def test_invalid_records_go_on(self):
+        errors = []
+        data = [
+            b'{"kind": "OMSTR", "string": "\xff"}\n{"kind": "OMV", "name": "x"}\n',
+            b'{"kind": "OMATTR", "attributes": [[{"kind": "OMS", "cd": "a", "name": "b"}]],'
+            b' "object": {"kind": "OMI", "integer": 1}}\n',
+            b'{"kind": "OMI", "integer": 2}',
+        ]
+        objects = list(iterparseJSON(data, onError=lambda n, e: errors.append((n, type(e)))))
+        self.assertEqual(objects, [OMVariable("x"), OMInteger(2)])
+        self.assertEqual(errors, [(1, UnicodeDecodeError), (3, ValueError)])
+        self.assertRaises(ValueError, list, iterparseJSON(data))
+
+    def test_str_chunks(self):
+        data = "\n".join(x.toJSON() for x in self.records())
+        chunks = [data[i:i + 5] for i in range(0, len(data), 5)]
+        self.assertEqual(list(iterparseJSON(chunks)), self.records())
+        self.assertEqual(list(iterparseJSON(StringIO(data), chunkSize=4)), self.records())
+
+
+class TestDeepTrees(unittest.TestCase):
+
+    depth = 5000  # well beyond the default recursion limit
+
+    def deepObject(self):
+        obj = OMVariable("x")
+        for i in range(self.depth):
+            obj = OMApplication(OMSymbol("plus", "arith1"), [obj, OMInteger(i)])
+        return OMObject(obj)
+
+    def nodes(self, obj):
+        """Flatten an object into a list of its nodes (without recursion)"""
+        nodes = []
+        obj.apply(lambda x: nodes.append(str(x) if x.kind not in ("OMOBJ", "OMA") else x.kind))
+        return nodes
+
+    def test_dict_round_trip(self):
+        obj = self.deepObject()
+        self.assertEqual(self.nodes(fromDict(obj.toDict())), self.nodes(obj))
+
+    def test_element_round_trip(self):
+        obj = self.deepObject()
+        self.assertEqual(self.nodes(fromElement(obj.toElement())), self.nodes(obj))
+
+    def test_json_round_trip(self):
+        obj = self.deepObject()
+        self.assertEqual(self.nodes(parseJSON(obj.toJSON())), self.nodes(obj))
+        self.assertEqual(self.nodes(parseJSON(obj.toJSON(indent=1))), self.nodes(obj))
+
+    def test_json_options(self):
+        data = {"b": [1, -2.5e3, "é", None, True, False, {}, []], "a": {"c": 0.1}}
+        for options in ({}, {"indent": 2}, {"sort_keys": True}, {"separators": (",", ":")},
+                        {"ensure_ascii": False}):
+            self.assertEqual(util.jsonDumps(data, **options), json.dumps(data, **options))
+        text = json.dumps(data)
+        value = util.jsonLoads("[" * self.depth + text + "]" * self.depth)
+        for i in range(self.depth):
+            [value] = value
+        self.assertEqual(value, json.loads(text))
+        with self.assertRaises(json.JSONDecodeError):
+            util.jsonLoads("[" * self.depth + "1,]" + "]" * self.depth)
+
+    def test_repr(self):
+        self.assertTrue(repr(self.deepObject()).startswith("OMObject(object=OMApplication("))
+
+    def test_binary_round_trip(self):
+        obj = self.deepObject()
+        self.assertEqual(self.nodes(parseBinary(obj.toBinary())), self.nodes(obj))
+
+    def test_apply(self):
+        nodes = self.nodes(self.deepObject())
+        self.assertEqual(len(nodes), 3 * self.depth + 2)
+        self.assertEqual(nodes[:2], ["OMOBJ", "OMA"])
+
+    def test_ancestors(self):
+        obj = self.deepObject()
+        obj.cdbase = "http://example.org/cd"
+        leaf = obj.object
+        while leaf.kind == "OMA":
+            leaf = leaf.arguments[0]
+        self.assertIs(leaf.getRoot(), obj)
+        self.assertEqual(leaf.getCDBase(), "http://example.org/cd")
+
+
+class TestRoundTrip(unittest.TestCase):
+
+    def sample(self):
+        return OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMInteger(-12),
+            OMFloat(2.5),
+            OMString("text"),
+            OMBytearray(b"\x00\xff"),
+            OMBinding(
+                OMSymbol("lambda", "fns1"),
+                [OMAttribution([(OMSymbol("type", "sts"), OMVariable("T"))], OMVariable("x"))],
+                OMVariable("x"),
+            ),
+            OMError(OMSymbol("unhandled_symbol", "error"), [OMString("foo")]),
+            OMReference("#a"),
+        ], cdbase="http://example.org/cd"))
+
+    def test_xml(self):
+        obj = self.sample()
+        self.assertEqual(parseXML(obj.toXML()).toDict(), obj.toDict())
+
+    def test_xml_writer(self):
+        obj = self.sample()
+        obj.object.arguments[2].string = 'a<b & "c"\u00e9'
+        root = obj.toElement()
+        root.set("xmlns", "http://www.openmath.org/OpenMath")
+        self.assertEqual(obj.toXML(), ET.tostring(root).decode("utf8"))
+        text = StringIO()
+        obj.writeXML(text, indent=2)
+        self.assertEqual(parseXML(text.getvalue()).toDict(), obj.toDict())
+        self.assertIn("\n    <OMI>-12</OMI>\n", text.getvalue())
+        data = BytesIO()
+        obj.writeXML(data, encoding="latin1")
+        self.assertEqual(data.getvalue().decode("latin1"), obj.toXML().replace("&#233;", "\u00e9"))
+
+    def test_json(self):
+        obj = self.sample()
+        self.assertEqual(parseJSON(obj.toJSON()).toDict(), obj.toDict())
+
+    def test_hashed(self):
+        obj = self.sample()
+        for parsed in (
+            parseXML(obj.toXML(), hashed=True),
+            parseJSON(obj.toJSON(), intern={}, hashed=True),
+            parseBinary(obj.toBinary(), hashed=True),
+        ):
+            hashes = [x._hash for x in parsed.iterNodes()]
+            self.assertNotIn(None, hashes)
+            for node in parsed.iterNodes():
+                node._hash = None
+            self.assertEqual([hash(x) for x in parsed.iterNodes()], hashes)
+
+    def test_json_writer(self):
+        obj = self.sample()
+        obj.object.arguments[2].string = 'a<b & "c"\u00e9'
+        expected = json.dumps(obj, default=OMObject.toDict)
+        self.assertEqual(obj.toJSON(), expected)
+        text = StringIO()
+        obj.writeJSON(text)
+        self.assertEqual(text.getvalue(), expected)
+        data = BytesIO()
+        obj.writeJSON(data)
+        self.assertEqual(data.getvalue(), expected.encode("utf8"))
+        self.assertEqual(obj.toJSON(indent=2), json.dumps(obj, default=OMObject.toDict, indent=2))
+
+    def test_binary(self):
+        obj = self.sample()
+        self.assertEqual(parseBinary(obj.toBinary()).toDict(), obj.toDict())
+        self.assertEqual(parseBinary(obj.toBinary()).toXML(), obj.toXML())
+
+
+class TestBinary(unittest.TestCase):
+
+    def sample(self):
+        return TestRoundTrip().sample()
+
+    def test_integers(self):
+        for value in (0, -128, 127, 128, -(2 ** 31), 2 ** 31, -(10 ** 300)):
+            obj = OMInteger(value, id="i")
+            self.assertEqual(parseBinary(obj.toBinary()).integer, value)
+
+    def test_strings(self):
+        for value in ("", "latin: ñ", "utf-16: Ω 𝔸", "x" * 1000):
+            self.assertEqual(parseBinary(OMString(value).toBinary()).string, value)
+
+    def test_internal_reference(self):
+        obj = OMApplication(OMSymbol("plus", "arith1"), [
+            OMVariable("x", id="shared"),
+            OMReference("#shared"),
+            OMReference("#elsewhere"),
+        ])
+        data = obj.toBinary()
+        self.assertEqual(data.count(b"shared"), 1)
+        self.assertEqual(parseBinary(data).toDict(), obj.toDict())
+
+    def test_memoryview(self):
+        obj = OMObject(OMFloat(1.25), cdbase="http://example.org/cd")
+        data = memoryview(bytearray(b"\xff" + obj.toBinary()))[1:]
+        self.assertEqual(parseBinary(data).toDict(), obj.toDict())
+
+    def test_smaller_than_text_encodings(self):
+        obj = OMApplication(OMSymbol("plus", "arith1"), [
+            OMInteger(i * 1000) if i % 2 else OMBytearray(bytes(range(i)))
+            for i in range(100)
+        ])
+        size = len(obj.toBinary())
+        self.assertLess(size, len(obj.toXML()))
+        self.assertLess(size, len(obj.toJSON()))
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            parseBinary(OMObject(OMVariable("x")).toBinary()[:-1])
+        obj = self.sample()
+        obj.object.arguments[0].id = "i"
+        for data in (obj.toBinary(), OMObject(OMApplication(OMSymbol("plus", "arith1"), [
+            OMInteger(10 ** 30), OMFloat(1.5, id="f"), OMString("\u20ac" * 300), OMVariable("x" * 300),
+        ])).toBinary()):
+            for i in range(len(data)):
+                with self.assertRaises(ValueError, msg="truncated at byte %d" % i):
+                    parseBinary(data[:i])
+
+    def test_corrupt(self):
+        data = self.sample().toBinary()
+        for i in range(len(data)):
+            for value in (0x00, 0x7f, 0xff):
+                corrupt = data[:i] + bytes([value]) + data[i + 1:]
+                try:
+                    parseBinary(corrupt)
+                except ValueError:
+                    pass
+
+
+class TestIntern(unittest.TestCase):
+
+    def sample(self):
+        plus = lambda *args: OMApplication(OMSymbol("plus", "arith1"), list(args))
+        return OMObject(plus(plus(OMVariable("x"), OMInteger(1)), OMVariable("x", id="v")))
+
+    def check(self, obj):
+        outer = obj.object
+        inner = outer.arguments[0]
+        self.assertIs(outer.applicant, inner.applicant)
+        self.assertIs(inner.arguments[0], internOM(OMVariable("x"), self.table))
+        self.assertIsNone(inner.applicant.parent)
+        self.assertIsNot(outer.arguments[1], inner.arguments[0])  # has an id
+        self.assertEqual(obj.toDict(), self.sample().toDict())
+
+    def setUp(self):
+        self.table = {}
+
+    def test_dict(self):
+        self.check(fromDict(self.sample().toDict(), intern=self.table))
+
+    def test_xml(self):
+        self.check(parseXML(self.sample().toXML(), intern=self.table))
+
+    def test_binary(self):
+        self.check(parseBinary(self.sample().toBinary(), intern=self.table))
+
+    def test_shared_across_stream(self):
+        a, b = iterparseJSON([self.sample().toJSON() + "\n" + self.sample().toJSON()], intern=self.table)
+        self.assertIs(a.object.applicant, b.object.applicant)
+
+    def test_global_table(self):
+        a = parseJSON(self.sample().toJSON(), intern=True)
+        b = parseJSON(self.sample().toJSON(), intern=True)
+        self.assertIs(a.object.applicant, b.object.applicant)
+
+    def test_global_table_is_weak(self):
+        obj = parseJSON('{"kind": "OMV", "name": "unused_global_variable"}', intern=True)
+        self.assertIs(util.internTable[("OMV", "unused_global_variable")], obj)
+        del obj
+        gc.collect()
+        self.assertNotIn(("OMV", "unused_global_variable"), util.internTable)
+
+    def test_disabled(self):
+        obj = parseJSON(self.sample().toJSON())
+        self.assertIsNot(obj.object.applicant, obj.object.arguments[0].applicant)
+
+
+class TestVerify(unittest.TestCase):
+
+    def test_parsed_objects(self):
+        obj = OMObject(OMAttribution(
+            [(OMSymbol("type", "sts"), OMString("real"))],
+            OMBinding(OMSymbol("lambda", "fns1"), [OMVariable("x")], OMError(
+                OMSymbol("e", "error"), [OMFloat(1.5), OMBytearray(b"ab"), OMReference("#a")]
+            )),
+        ))
+        for parsed in (parseXML(obj.toXML()), parseJSON(obj.toJSON()), parseBinary(obj.toBinary())):
+            self.assertEqual(parsed, obj)
+            self.assertIs(parsed.verify(), parsed)
+            for node in parsed.iterNodes():
+                for child in node._children():
+                    self.assertIs(child.parent, node)
+
+    def test_deferred_checks(self):
+        obj = OMApplication._make(applicant=OMSymbol("plus", "arith1"), arguments=(OMInteger(1),))
+        obj.arguments[0].integer = "1"
+        self.assertRaises(TypeError, obj.verify)
+        self.assertRaises(TypeError, OMObject(OMInteger(1), version=2).verify)
+
+    def test_invalid_structures(self):
+        for text in (
+            "<OMA/>",
+            "<OME><OMI>1</OMI></OME>",
+            "<OMATTR><OMATP><OMI>1</OMI><OMI>2</OMI></OMATP><OMI>3</OMI></OMATTR>",
+            '<OMATTR><OMATP><OMS cd="a" name="b"/></OMATP><OMI>3</OMI></OMATTR>',
+            "<OMATTR><OMI>3</OMI></OMATTR>",
+            '<OMBIND><OMS cd="fns1" name="lambda"/><OMBVAR><OMI>1</OMI></OMBVAR><OMI>3</OMI></OMBIND>',
+            '<OMBIND><OMS cd="fns1" name="lambda"/><OMI>3</OMI></OMBIND>',
+            "<OMOBJ/>",
+        ):
+            self.assertRaises(ValueError, parseXML, text)
+
+        for data in (
+            {"kind": "OME", "error": {"kind": "OMI", "integer": 1}},
+            {"kind": "OMATTR", "attributes": [[{"kind": "OMI", "integer": 1}, {"kind": "OMI", "integer": 2}]],
+             "object": {"kind": "OMI", "integer": 3}},
+            {"kind": "OMATTR", "attributes": [[{"kind": "OMS", "cd": "a", "name": "b"}]],
+             "object": {"kind": "OMI", "integer": 3}},
+            {"kind": "OMBIND", "binder": {"kind": "OMS", "cd": "fns1", "name": "lambda"},
+             "variables": [{"kind": "OMI", "integer": 1}], "object": {"kind": "OMI", "integer": 3}},
+        ):
+            self.assertRaises(ValueError, fromDict, data)
+
+        for data in (
+            {"kind": "OMS", "cd": 5, "name": "plus"},
+            {"kind": "OMV", "name": "x", "id": 1},
+            {"kind": "OMI", "integer": "1"},
+            {"kind": "OMB", "bytes": 3},
+            {"kind": "OMOBJ", "object": {"kind": "OMI", "integer": 1}, "version": 2},
+        ):
+            self.assertRaises(TypeError, fromDict, data)
+
+        errors = []
+        stream = '{"kind": "OMS", "cd": 5, "name": "plus"}\n{"kind": "OMI", "integer": 1}'
+        self.assertEqual(list(iterparseJSON([stream], onError=lambda n, e: errors.append(n))), [OMInteger(1)])
+        self.assertEqual(errors, [1])
+
+    def test_invalid_binary_structures(self):
+        symbol = OMSymbol("a", "b").toBinary()
+        integer = OMInteger(1).toBinary()
+        for data in (
+            bytes([16, 17]),  # empty application
+            bytes([18, 20]) + integer + integer + bytes([21]) + integer + bytes([19]),
+            bytes([18]) + integer + bytes([19]),
+            bytes([26]) + symbol + bytes([28]) + integer + bytes([29]) + integer + bytes([27]),
+            bytes([16, 20]) + symbol + integer + bytes([21]) + bytes([17]),
+        ):
+            self.assertRaises(ValueError, parseBinary, data)
@@ -0,0 +1,56 @@
+import unittest
+from openmath import *
+from openmath import profiling
+from openmath.cd import CDRegistry
+from openmath.parser import parseXML, iterparseJSON
+from openmath.profiling import Profile
+from openmath.validator import validate
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.obj = OMObject(OMApplication(OMSymbol("plus", "arith1"), [OMInteger(1), OMInteger(2)]))
+
+    def test_profile(self):
+        with Profile() as profile:
+            obj = parseXML(self.obj.toXML())
+            validate(obj, CDRegistry())
+        stats = profile.snapshot()
+        self.assertEqual(set(stats), {"toXML", "writeXML", "parseXML", "validate", "check"})
+        self.assertEqual(stats["parseXML"]["calls"], 1)
+        self.assertEqual(stats["parseXML"]["nodes"], 5)
+        self.assertEqual(stats["validate"]["nodes"], 5)
+        self.assertGreater(stats["toXML"]["seconds"], 0)
+        self.obj.toXML()
+        self.assertEqual(profile.snapshot(), stats)
+
+    def test_nested_and_failures(self):
+        with Profile() as outer:
+            with Profile() as inner:
+                self.assertRaises(Exception, parseXML, "<OMOBJ>")
+            self.obj.toBinary()
+        self.assertEqual(set(inner.snapshot()), {"parseXML"})
+        self.assertEqual(inner.snapshot()["parseXML"]["failures"], 1)
+        self.assertEqual(set(outer.snapshot()), {"parseXML", "toBinary"})
+
+    def test_generators(self):
+        lines = [self.obj.toJSON() + "\n"] * 3
+        with Profile() as profile:
+            self.assertEqual(len(list(iterparseJSON(lines))), 3)
+        self.assertEqual(profile.snapshot()["iterparseJSON"]["calls"], 3)
+        self.assertEqual(profile.snapshot()["iterparseJSON"]["nodes"], 15)
+
+    def test_global(self):
+        profiling.reset()
+        records = []
+        profiling.addHook(lambda *record: records.append(record))
+        try:
+            profiling.enable()
+            self.obj.toJSON()
+            profiling.disable()
+            self.obj.toJSON()
+        finally:
+            profiling.removeHook(profiling._active[-1])
+        self.assertEqual(profiling.snapshot()["toJSON"]["calls"], 1)
+        self.assertEqual([x[0] for x in records], ["toJSON", "toJSON"])
+        self.assertEqual(profiling._active, [])
@@ -0,0 +1,278 @@
+import unittest
+from unittest import mock
+from openmath import *
+from openmath.cd import CDRegistry, ContentDictionary, SymbolDefinition
+from openmath import validator
+from openmath.parser import parseXML
+from openmath.validator import check, validate, validateMany, ValidationMemo, ValidationResult
+
+class TestValidate(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = validator.cdRegistry
+        validator.cdRegistry = CDRegistry([
+            ContentDictionary(name="arith1", status="official", definitions=[
+                SymbolDefinition(name="plus", role="application"),
+                SymbolDefinition(name="pi", role="constant"),
+            ]),
+            ContentDictionary(name="fns1", status="experimental", definitions=[
+                SymbolDefinition(name="lambda", role="binder"),
+            ]),
+        ])
+
+    def tearDown(self):
+        validator.cdRegistry = self.saved
+
+    def test_ok(self):
+        obj = OMApplication(OMSymbol("plus", "arith1"), [OMSymbol("pi", "arith1")])
+        self.assertEqual(validate(obj), ValidationResult.OK)
+
+    def test_invalid_role(self):
+        obj = OMApplication(OMSymbol("pi", "arith1"), [OMInteger(1)])
+        self.assertEqual(validate(obj), ValidationResult.ERROR)
+
+    def test_experimental(self):
+        obj = OMBinding(OMSymbol("lambda", "fns1"), [OMVariable("x")], OMVariable("x"))
+        self.assertEqual(validate(obj), ValidationResult.WARNING)
+
+    def test_shared_symbols(self):
+        pi = OMSymbol("pi", "arith1")
+        obj = OMApplication(OMSymbol("plus", "arith1"), [pi, OMApplication(pi, [])])
+        self.assertEqual(validate(obj), ValidationResult.ERROR)
+
+
+class TestCDRegistry(unittest.TestCase):
+
+    def cd(self, name, base=None, symbols=("a", "b")):
+        return ContentDictionary(
+            name=name, base=base, definitions=[SymbolDefinition(name=x) for x in symbols]
+        )
+
+    def test_lookup(self):
+        official = self.cd("arith1", "http://www.openmath.org/cd")
+        local = self.cd("arith1", "http://example.org/cd", ("c",))
+        registry = CDRegistry([official, local])
+        cd, definition = registry.lookup(OMSymbol("a", "arith1"))
+        self.assertIs(cd, official)
+        self.assertIs(definition, official.definitions[0])
+        self.assertIs(registry.lookup(OMSymbol("c", "arith1", "http://example.org/cd"))[0], local)
+        self.assertEqual(registry.lookup(OMSymbol("c", "arith1")), (None, None))
+        # the cdbase is inherited
+        obj = OMApplication(OMSymbol("c", "arith1"), [], cdbase="http://example.org/cd")
+        self.assertIn(obj.applicant, registry)
+        self.assertEqual(registry.stats()["lookups"], 4)
+        self.assertEqual(registry.stats()["misses"], 1)
+
+    def test_versions(self):
+        registry = CDRegistry()
+        registry.load([self.cd("a"), self.cd("b")])
+        self.assertEqual((len(registry), registry.version), (2, 1))
+        registry.add(self.cd("a", symbols=("x",)))
+        self.assertNotIn(OMSymbol("a", "a"), registry)
+        self.assertIn(OMSymbol("x", "a"), registry)
+        registry.remove("b")
+        self.assertEqual(registry.stats()["symbols"], 1)
+        self.assertEqual(registry.version, 3)
+        self.assertIs(registry.getCD("a"), list(registry)[0])
+
+    def test_content_dictionary_index(self):
+        cd = self.cd("arith1")
+        self.assertIn("a", cd)
+        self.assertIs(cd["b"], cd.definitions[1])
+        cd.definitions.append(SymbolDefinition(name="c"))
+        self.assertEqual(cd.symbol("c"), OMSymbol("c", "arith1"))
+        with self.assertRaises(KeyError):
+            cd.symbol("d")
+        self.assertIn(OMSymbol("a", "arith1", "http://www.openmath.org/cd"), cd)
+
+    def test_validate_with_registry(self):
+        registry = CDRegistry([self.cd("arith1", symbols=("plus",))])
+        obj = OMApplication(OMSymbol("plus", "arith1"), [OMInteger(1)])
+        self.assertEqual(validate(obj, registry=registry), ValidationResult.OK)
+        self.assertEqual(registry.stats()["lookups"], 2)
+
+
+class TestValidateMany(unittest.TestCase):
+
+    def setUp(self):
+        # the pool is skipped on machines with a single CPU
+        patch = mock.patch.object(validator.os, "cpu_count", return_value=4)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.registry = CDRegistry([
+            ContentDictionary(name="arith1", status="official", definitions=[
+                SymbolDefinition(name="plus", role="application"),
+                SymbolDefinition(name="pi", role="constant"),
+            ]),
+            ContentDictionary(name="fns1", status="experimental", definitions=[
+                SymbolDefinition(name="lambda", role="binder"),
+            ]),
+        ])
+
+    def objects(self, n):
+        samples = [
+            OMApplication(OMSymbol("plus", "arith1"), [OMSymbol("pi", "arith1")]),
+            OMApplication(OMSymbol("pi", "arith1"), [OMSymbol("e", "nums1")]),
+            OMBinding(OMSymbol("lambda", "fns1"), [OMVariable("x")], OMVariable("x")),
+        ]
+        return (samples[i % 3] for i in range(n))
+
+    def check(self, reports, n):
+        self.assertEqual(sorted(x.index for x in reports), list(range(n)))
+        for report in reports:
+            self.assertEqual(
+                report.result,
+                [ValidationResult.OK, ValidationResult.ERROR, ValidationResult.WARNING][report.index % 3],
+            )
+
+    def test_report(self):
+        report = check(list(self.objects(2))[1], self.registry)
+        self.assertEqual(report.result, ValidationResult.ERROR)
+        self.assertEqual(report.invalidRoles, [(OMSymbol("pi", "arith1"), "application")])
+        self.assertEqual(report.notFound, [OMSymbol("e", "nums1")])
+        self.assertIsNone(report.notFound[0].parent)
+        self.assertEqual(
+            [reason for _, reason in report.failures()],
+            ["can't be used as application", "is not defined in any CD"],
+        )
+
+    def test_ordered(self):
+        reports = list(validateMany(self.objects(50), workers=2, chunkSize=4, registry=self.registry))
+        self.assertEqual([x.index for x in reports], list(range(50)))
+        self.check(reports, 50)
+
+    def test_unordered(self):
+        reports = list(validateMany(
+            self.objects(50), workers=3, ordered=False, chunkSize=3, registry=self.registry
+        ))
+        self.check(reports, 50)
+
+    def test_single_process(self):
+        self.check(list(validateMany(self.objects(7), workers=1, registry=self.registry)), 7)
+
+    def test_single_cpu(self):
+        validator.os.cpu_count.return_value = 1
+        with mock.patch.object(validator, "ProcessPoolExecutor", side_effect=AssertionError):
+            self.check(list(validateMany(self.objects(7), workers=4, registry=self.registry)), 7)
+
+    def test_encoded(self):
+        encoders = [lambda x: x.toBinary(), lambda x: x.toXML(), lambda x: x.toJSON()]
+        objects = [encoders[i % 4 % 3](x) if i % 4 < 3 else x for i, x in enumerate(self.objects(24))]
+        for workers in (1, 2):
+            reports = list(validateMany(objects, workers=workers, chunkSize=5, registry=self.registry))
+            self.check(reports, 24)
+
+
+class TestValidationMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CDRegistry([
+            ContentDictionary(name="arith1", status="official", definitions=[
+                SymbolDefinition(name="plus", role="application"),
+                SymbolDefinition(name="pi", role="constant"),
+            ]),
+        ])
+
+    def term(self, n):
+        term = OMApplication(OMSymbol("plus", "arith1"), [
+            OMApplication(OMSymbol("pi", "arith1"), [OMInteger(n)]),
+            OMApplication(OMSymbol("plus", "arith1"), [OMSymbol("e", "nums1")]),
+        ])
+        hash(term)  # only hashed subtrees are looked up
+        return term
+
+    def test_same_reports(self):
+        memo = ValidationMemo()
+        for obj in (self.term(1), self.term(1), OMObject(self.term(2), cdbase="http://x.org")):
+            self.assertEqual(check(obj, self.registry, memo), check(obj, self.registry))
+        self.assertGreater(memo.stats()["hits"], 0)
+
+    def test_subtrees_in_new_parents(self):
+        memo = ValidationMemo()
+        check(self.term(1), self.registry, memo)
+        misses = memo.misses
+        obj = OMApplication(OMSymbol("plus", "arith1"), [self.term(1)])
+        hash(obj)
+        report = check(obj, self.registry, memo)
+        self.assertEqual(memo.misses, misses + 1)  # only the new parent
+        self.assertEqual(memo.hits, 1)
+        self.assertEqual(report.result, ValidationResult.ERROR)
+        self.assertEqual(report.notFound, [OMSymbol("e", "nums1")])
+        self.assertTrue(report.notFound[0]._frozen)
+
+    def test_inherited_cdbase(self):
+        memo = ValidationMemo()
+        check(self.term(1), self.registry, memo)
+        obj = OMObject(self.term(1), cdbase="http://x.org")
+        hash(obj)
+        report = check(obj, self.registry, memo)
+        self.assertEqual(len(report.notFound), 4)
+        self.assertEqual(report.notFound[0].cdbase, "http://x.org")
+
+    def test_inherited_cdbase_of_shared_symbols(self):
+        obj = OMObject(self.term(1), cdbase="http://x.org")
+        interned = parseXML(obj.toXML(), intern={})
+        self.assertIsNone(interned.object.applicant.parent)
+        for memo in (None, ValidationMemo()):
+            report = check(interned, self.registry, memo)
+            self.assertEqual(report, check(obj, self.registry))
+            self.assertEqual(len(report.notFound), 4)
+            self.assertEqual({x.cdbase for x in report.notFound}, {"http://x.org"})
+
+    def test_inner_cdbase(self):
+        memo = ValidationMemo()
+        plain = OMApplication(OMSymbol("plus", "arith1"), [OMInteger(1)]).freeze()
+        other = OMApplication(OMSymbol("plus", "arith1", "http://other"), [OMInteger(1)]).freeze()
+        self.assertEqual(hash(plain), hash(other))
+        self.assertEqual(check(plain, self.registry, memo).notFound, [])
+        report = check(other, self.registry, memo)
+        self.assertEqual(report, check(other, self.registry))
+        self.assertEqual(report.notFound, [OMSymbol("plus", "arith1", "http://other")])
+        self.assertEqual(memo.hits, 0)
+        # placed elsewhere, the same cdbase is still told apart
+        moved = OMApplication(OMSymbol("plus", "arith1"), [OMInteger(1)], cdbase="http://other")
+        hash(moved)
+        self.assertEqual(check(moved, self.registry, memo).notFound, report.notFound)
+
+    def test_unhashed_objects(self):
+        memo = ValidationMemo()
+        obj = OMObject(self.term(1))  # the root isn't hashed
+        check(obj, self.registry, memo)
+        self.assertIsNone(obj._hash)
+        self.assertEqual(memo.stats()["entries"], 3)
+        obj.object.setArguments([OMInteger(1)])  # drops the cached hashes
+        self.assertEqual(check(obj, self.registry, memo), check(obj, self.registry))
+        self.assertEqual(memo.hits, 0)
+
+    def test_parsed_objects(self):
+        data = OMObject(self.term(1)).toXML()
+        memo = ValidationMemo()
+        check(parseXML(data, hashed=True), self.registry, memo)
+        entries = len(memo)
+        for _ in range(3):
+            obj = parseXML(data, hashed=True)
+            self.assertEqual(check(obj, self.registry, memo), check(obj, self.registry))
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (3, entries, entries))
+
+    def test_invalidation(self):
+        memo = ValidationMemo()
+        self.assertEqual(len(check(self.term(1), self.registry, memo).notFound), 1)
+        self.registry.add(ContentDictionary(name="nums1", definitions=[SymbolDefinition(name="e")]))
+        self.assertEqual(check(self.term(1), self.registry, memo).notFound, [])
+        self.assertEqual(memo.hits, 0)
+
+    def test_eviction(self):
+        memo = ValidationMemo(maxEntries=2)
+        check(self.term(1), self.registry, memo)
+        self.assertEqual(len(memo), 2)
+        self.assertEqual(memo.stats()["evictions"], 1)
+        self.assertEqual(memo.stats()["hitRate"], 0.0)
+
+    def test_validate_many(self):
+        objects = [self.term(i % 2) for i in range(10)]
+        memo = ValidationMemo()
+        reports = list(validateMany(objects, workers=1, registry=self.registry, memo=memo))
+        self.assertEqual([x.result for x in reports], [ValidationResult.ERROR] * 10)
+        self.assertEqual(memo.hits, 9)  # the second term shares a subtree
+        reports = list(validateMany(objects, workers=2, registry=self.registry, memo=memo))
+        self.assertEqual(len(reports), 10)